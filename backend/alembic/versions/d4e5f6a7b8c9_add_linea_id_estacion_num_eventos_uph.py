@@ -0,0 +1,75 @@
+"""add linea_id and estacion_num to eventos_uph
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = 'd4e5f6a7b8c9'
+down_revision = 'c3d4e5f6a7b8'
+branch_labels = None
+depends_on = None
+
+# "L6", "HI-6", "hi6", "6" → 6
+_NUM_RE = r"^(L|HI)?-?\s*[0-9]+$"
+_NUM_CAP = r"([0-9]+)$"
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE eventos_uph
+        ADD COLUMN IF NOT EXISTS linea_id     SMALLINT REFERENCES lineas(id),
+        ADD COLUMN IF NOT EXISTS estacion_num SMALLINT
+    """)
+    # Líneas numeradas presentes en eventos pero sin fila en lineas (legacy L7–L11)
+    op.execute(f"""
+        INSERT INTO lineas (nombre)
+        SELECT DISTINCT 'HI-' || substring(e.linea from '{_NUM_CAP}')::int
+        FROM eventos_uph e
+        WHERE e.linea ~* '{_NUM_RE}'
+          AND NOT EXISTS (
+              SELECT 1 FROM lineas l
+              WHERE l.nombre ~* '{_NUM_RE}'
+                AND substring(l.nombre from '{_NUM_CAP}')::int = substring(e.linea from '{_NUM_CAP}')::int
+          )
+    """)
+    # Backfill por número de línea; nombres no numerados por coincidencia exacta
+    op.execute(f"""
+        WITH alias AS (
+            SELECT MIN(id) AS id, substring(nombre from '{_NUM_CAP}')::int AS num
+            FROM lineas
+            WHERE nombre ~* '{_NUM_RE}'
+            GROUP BY 2
+        )
+        UPDATE eventos_uph e
+        SET linea_id = a.id
+        FROM alias a
+        WHERE e.linea_id IS NULL
+          AND e.linea ~* '{_NUM_RE}'
+          AND substring(e.linea from '{_NUM_CAP}')::int = a.num
+    """)
+    op.execute("""
+        UPDATE eventos_uph e
+        SET linea_id = l.id
+        FROM lineas l
+        WHERE e.linea_id IS NULL AND lower(e.linea) = lower(l.nombre)
+    """)
+    op.execute(r"""
+        UPDATE eventos_uph
+        SET estacion_num = trim(estacion)::smallint
+        WHERE estacion_num IS NULL AND estacion ~ '^\s*[0-9]{1,4}\s*$'
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_eventos_uph_linea_ts ON eventos_uph(linea_id, timestamp)")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_eventos_uph_linea_est_ts
+        ON eventos_uph(linea_id, estacion_num, timestamp)
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_eventos_uph_linea_est_ts")
+    op.execute("DROP INDEX IF EXISTS ix_eventos_uph_linea_ts")
+    op.execute("ALTER TABLE eventos_uph DROP COLUMN IF EXISTS estacion_num")
+    op.execute("ALTER TABLE eventos_uph DROP COLUMN IF EXISTS linea_id")
@@ -0,0 +1,86 @@
+"""compact eventos_uph: integer keys only, evento smallint, compat view
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = 'e5f6a7b8c9d0'
+down_revision = 'd4e5f6a7b8c9'
+branch_labels = None
+depends_on = None
+
+_VISTA = r"""
+    CREATE OR REPLACE VIEW eventos_uph_texto AS
+    SELECT e.id,
+           CASE WHEN l.nombre ~* '^(L|HI)-?\s*[0-9]+$'
+                THEN 'L' || substring(l.nombre from '([0-9]+)$')::int
+                ELSE l.nombre END                AS linea,
+           e.estacion_num::text                  AS estacion,
+           CASE e.evento WHEN 1 THEN 'GOOD' END  AS evento,
+           e.contador,
+           e.timestamp,
+           e.timestamp                           AS created_at,
+           e.linea_id,
+           e.estacion_num
+    FROM eventos_uph e
+    JOIN lineas l ON l.id = e.linea_id
+"""
+
+
+def upgrade():
+    # Filas que el backfill de d4e5f6a7b8c9 no pudo resolver: apartar, no borrar.
+    # Tabla creada una vez y llenada con INSERT, para no perder filas si se reintenta
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS eventos_uph_descartados AS
+        SELECT * FROM eventos_uph WITH NO DATA
+    """)
+    op.execute("""
+        INSERT INTO eventos_uph_descartados
+        SELECT * FROM eventos_uph
+        WHERE linea_id IS NULL OR estacion_num IS NULL OR evento <> 'GOOD'
+    """)
+    op.execute("DELETE FROM eventos_uph WHERE linea_id IS NULL OR estacion_num IS NULL OR evento <> 'GOOD'")
+    op.execute("DROP INDEX IF EXISTS ix_eventos_uph_id")   # duplicaba la PK
+    # ALTER COLUMN TYPE reescribe la tabla e índices (recupera el espacio)
+    op.execute("""
+        ALTER TABLE eventos_uph
+            DROP COLUMN IF EXISTS created_at,
+            DROP COLUMN IF EXISTS linea,
+            DROP COLUMN IF EXISTS estacion,
+            ALTER COLUMN evento TYPE SMALLINT USING 1,
+            ALTER COLUMN linea_id SET NOT NULL,
+            ALTER COLUMN estacion_num SET NOT NULL
+    """)
+    op.execute(_VISTA)
+
+
+def downgrade():
+    op.execute("DROP VIEW IF EXISTS eventos_uph_texto")
+    op.execute("""
+        ALTER TABLE eventos_uph
+            ADD COLUMN linea VARCHAR,
+            ADD COLUMN estacion VARCHAR,
+            ADD COLUMN created_at TIMESTAMPTZ DEFAULT now(),
+            ALTER COLUMN evento TYPE VARCHAR USING 'GOOD',
+            ALTER COLUMN linea_id DROP NOT NULL,
+            ALTER COLUMN estacion_num DROP NOT NULL
+    """)
+    op.execute(r"""
+        UPDATE eventos_uph e
+        SET linea = CASE WHEN l.nombre ~* '^(L|HI)-?\s*[0-9]+$'
+                         THEN 'L' || substring(l.nombre from '([0-9]+)$')::int
+                         ELSE l.nombre END,
+            estacion   = e.estacion_num::text,
+            created_at = e.timestamp
+        FROM lineas l
+        WHERE l.id = e.linea_id
+    """)
+    op.execute("""
+        ALTER TABLE eventos_uph
+            ALTER COLUMN linea SET NOT NULL,
+            ALTER COLUMN estacion SET NOT NULL
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_eventos_uph_id ON eventos_uph(id)")
@@ -0,0 +1,51 @@
+"""add cantidad and contador_desde to eventos_uph (piece-count deltas)
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = 'f6a7b8c9d0e1'
+down_revision = 'e5f6a7b8c9d0'
+branch_labels = None
+depends_on = None
+
+_VISTA = r"""
+    CREATE OR REPLACE VIEW eventos_uph_texto AS
+    SELECT e.id,
+           CASE WHEN l.nombre ~* '^(L|HI)-?\s*[0-9]+$'
+                THEN 'L' || substring(l.nombre from '([0-9]+)$')::int
+                ELSE l.nombre END                AS linea,
+           e.estacion_num::text                  AS estacion,
+           CASE e.evento WHEN 1 THEN 'GOOD' END  AS evento,
+           e.contador,
+           e.timestamp,
+           e.timestamp                           AS created_at,
+           e.linea_id,
+           e.estacion_num{extra}
+    FROM eventos_uph e
+    JOIN lineas l ON l.id = e.linea_id
+"""
+
+
+def upgrade():
+    # DEFAULT constante: PostgreSQL 11+ no reescribe la tabla
+    op.execute("""
+        ALTER TABLE eventos_uph
+            ADD COLUMN IF NOT EXISTS cantidad SMALLINT NOT NULL DEFAULT 1,
+            ADD COLUMN IF NOT EXISTS contador_desde INTEGER
+    """)
+    op.execute(_VISTA.format(extra=",\n           e.cantidad"))
+
+
+def downgrade():
+    # CREATE OR REPLACE VIEW no puede quitar columnas
+    op.execute("DROP VIEW IF EXISTS eventos_uph_texto")
+    op.execute(_VISTA.format(extra=""))
+    op.execute("""
+        ALTER TABLE eventos_uph
+            DROP COLUMN IF EXISTS contador_desde,
+            DROP COLUMN IF EXISTS cantidad
+    """)
@@ -62,6 +62,15 @@ SSL_KEYFILE = os.getenv('SSL_KEYFILE', None)  # Ruta al archivo .key
 SSL_CERTFILE = os.getenv('SSL_CERTFILE', None)  # Ruta al archivo .crt o .pem
 FORCE_HTTPS = os.getenv('FORCE_HTTPS', 'false').lower() == 'true'  # Forzar HTTPS en producción
 
+# Instrumentación de consultas SQL
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))  # Umbral para loguear consulta lenta
+DB_SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'  # EXPLAIN automático
+
+# Profiling bajo demanda (X-Profile: 1, solo admin)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_HISTORIAL = int(os.getenv('PROFILING_HISTORIAL', 20))  # Perfiles guardados en memoria
+PROFILING_INTERVALO_MS = float(os.getenv('PROFILING_INTERVALO_MS', 1))  # Intervalo de muestreo
+
 # Validaciones de seguridad para producción
 if IS_PRODUCTION:
     # Verificar que SECRET_KEY no sea la default
@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, Float, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
 from ..database_uph import UphBase
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Operador(UphBase):
@@ -131,14 +135,97 @@ class PlanDiaLinea(UphBase):
     modelo = relationship("ModeloUPH")
 
 
+class TipoEvento(TypeDecorator):
+    """Tipo de evento guardado como SMALLINT ('GOOD' ↔ 1).
+
+    Las consultas siguen comparando contra el texto (`EventoUPH.evento == "GOOD"`).
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    CODIGOS = {"GOOD": 1}
+    NOMBRES = {v: k for k, v in CODIGOS.items()}
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            if value not in self.CODIGOS:
+                raise ValueError(f"Tipo de evento no soportado: {value!r} (válidos: {', '.join(self.CODIGOS)})")
+            return self.CODIGOS[value]
+        return value
+
+    def process_result_value(self, value, dialect):
+        return self.NOMBRES.get(value, value)
+
+
 class EventoUPH(UphBase):
+    """Evento de producción GOOD. Tabla de alto volumen: solo claves enteras,
+    columnas ordenadas para no dejar relleno de alineación.
+
+    Un registro puede cubrir varias piezas (`cantidad`, rango de contador
+    `contador_desde`..`contador`): las piezas se suman con PIEZAS, no con COUNT.
+
+    La vista `eventos_uph_texto` (PostgreSQL) expone las columnas de texto
+    anteriores (linea "L6", estacion "604", evento "GOOD") para consultas viejas.
+    """
     __tablename__ = "eventos_uph"
 
-    id = Column(Integer, primary_key=True, index=True)
-    linea = Column(String, nullable=False)        # "L6"
-    estacion = Column(String, nullable=False)     # "604"
-    evento = Column(String, nullable=False)       # "GOOD"
+    id = Column(Integer, primary_key=True)
     contador = Column(Integer, nullable=True)
     timestamp = Column(DateTime(timezone=True), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-
+    # Claves canónicas resueltas en la ingesta (lineas_service)
+    linea_id = Column(SmallInteger, ForeignKey("lineas.id"), nullable=False)
+    estacion_num = Column(SmallInteger, nullable=False)   # 604
+    evento = Column(TipoEvento, nullable=False, default="GOOD")
+    cantidad = Column(SmallInteger, nullable=False, default=1, server_default="1")   # piezas del registro
+    contador_desde = Column(Integer, nullable=True)   # primer contador del rango (None = solo `contador`)
+
+    __table_args__ = (
+        Index("ix_eventos_uph_linea_ts", "linea_id", "timestamp"),
+        Index("ix_eventos_uph_linea_est_ts", "linea_id", "estacion_num", "timestamp"),
+    )
+
+
+# Piezas de una consulta sobre eventos_uph (registros con cantidad > 1 cuentan
+# todas sus piezas). Usar en lugar de func.count(EventoUPH.id).
+PIEZAS = func.coalesce(func.sum(EventoUPH.cantidad), 0)
+
+
+# Vista de compatibilidad con las columnas de texto del layout anterior (PostgreSQL)
+VISTA_EVENTOS_TEXTO_SQL = r"""
+CREATE OR REPLACE VIEW eventos_uph_texto AS
+SELECT e.id,
+       CASE WHEN l.nombre ~* '^(L|HI)-?\s*[0-9]+$'
+            THEN 'L' || substring(l.nombre from '([0-9]+)$')::int
+            ELSE l.nombre END                AS linea,
+       e.estacion_num::text                  AS estacion,
+       CASE e.evento WHEN 1 THEN 'GOOD' END  AS evento,
+       e.contador,
+       e.timestamp,
+       e.timestamp                           AS created_at,
+       e.linea_id,
+       e.estacion_num,
+       e.cantidad
+FROM eventos_uph e
+JOIN lineas l ON l.id = e.linea_id
+"""
+
+
+def verificar_layout_eventos(engine) -> bool:
+    """Aviso crítico al arrancar si eventos_uph aún tiene el layout anterior
+    (linea/estacion de texto): el modelo no coincide y la ingesta falla hasta
+    migrar. No detiene el servidor (el despliegue no corre alembic y el resto de
+    endpoints sigue funcionando). La compactación reescribe la tabla con bloqueo
+    exclusivo, así que solo se hace con la revisión alembic e5f6a7b8c9d0, nunca
+    al arrancar. Devuelve False con el layout anterior."""
+    from sqlalchemy import inspect
+    try:
+        columnas = {c["name"] for c in inspect(engine).get_columns("eventos_uph")}
+    except Exception:
+        return True
+    if "linea" in columnas:
+        logger.critical(
+            "eventos_uph tiene el layout anterior (columnas linea/estacion de texto): "
+            "la ingesta de eventos UPH fallará. Ejecutar 'alembic upgrade head'."
+        )
+        return False
+    return True
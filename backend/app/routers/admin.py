@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
@@ -7,6 +8,8 @@ from ..models.models import Tecnico, SolicitudRegistro
 from ..schemas import Tecnico as TecnicoSchema, TecnicoCreate, SolicitudRegistroResponse, SolicitudRegistroUpdate, PaginatedResponse
 from ..auth import get_password_hash, get_current_user
 from ..services.notification_service import notification_service
+from ..services.profiling_service import profiling_service
+from ..services.version_service import version_service, JIGS, VALIDACIONES
 from ..utils.pagination import paginate_query
 from ..utils.logger import api_logger
 
@@ -335,6 +338,7 @@ async def delete_user(
         # Ahora eliminar el usuario
         db.delete(user)
         db.commit()
+        version_service.bump(VALIDACIONES, JIGS)
         
         logger.info(f"Usuario {user.usuario} (ID: {user_id}) eliminado correctamente")
         
@@ -597,3 +601,27 @@ async def rechazar_solicitud(
         "message": "Solicitud rechazada correctamente",
         "solicitud": solicitud
     }
+
+
+@router.get("/profiles")
+async def list_profiles(
+    limit: int = Query(20, ge=1, le=100),
+    admin_user: Tecnico = Depends(verify_admin)
+):
+    """Últimos perfiles de peticiones (X-Profile: 1 con PROFILING_ENABLED)"""
+    return profiling_service.listar()[:limit]
+
+
+@router.get("/profiles/{profile_id}", response_class=HTMLResponse)
+async def get_profile(
+    profile_id: int,
+    admin_user: Tecnico = Depends(verify_admin)
+):
+    """Reporte HTML de pyinstrument de un perfil"""
+    perfil = profiling_service.obtener(profile_id)
+    if not perfil:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado"
+        )
+    return HTMLResponse(perfil["html"])
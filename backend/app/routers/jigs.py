@@ -8,6 +8,7 @@ from ..schemas import Jig as JigSchema, JigCreate, JigHistorial, Validacion as V
 from ..auth import get_current_user
 from ..models.models import Tecnico
 from ..services.cache_service import cache_service
+from ..services.version_service import version_service, conditional_get, JIGS, VALIDACIONES
 from ..utils.pagination import paginate_query
 from ..utils.logger import get_logger
 
@@ -22,7 +23,8 @@ async def get_jigs(
     search: str = Query(None, description="Búsqueda por número, modelo, tipo o QR"),
     tipo: str = Query(None, description="Filtrar por tipo de jig"),
     db: Session = Depends(get_db),
-    current_user: Tecnico = Depends(get_current_user)
+    current_user: Tecnico = Depends(get_current_user),
+    _etag: None = Depends(conditional_get(JIGS))
 ):
     """
     Obtener lista paginada de jigs
@@ -256,6 +258,7 @@ async def create_jig(
     
     # Invalidar caché relacionado
     cache_service.delete_pattern("jig:*")
+    version_service.bump(JIGS)
     
     return JigSchema.from_orm(db_jig)
 
@@ -283,6 +286,7 @@ async def update_jig(
     # Invalidar caché relacionado
     cache_service.delete_pattern(f"jig:qr:{jig.codigo_qr}")
     cache_service.delete_pattern("jig:*")
+    version_service.bump(JIGS)
     
     return JigSchema.from_orm(jig)
 
@@ -325,6 +329,7 @@ async def delete_all_jigs(
         deleted_count = db.query(Jig).delete()
         
         db.commit()
+        version_service.bump(JIGS, VALIDACIONES)
         
         # Resetear la secuencia después del commit
         db.execute(text("SELECT setval('jigs_id_seq', 0, false)"))
@@ -372,6 +377,7 @@ async def delete_jig(
         # Finalmente eliminar el jig
         db.delete(jig)
         db.commit()
+        version_service.bump(JIGS, VALIDACIONES)
         
         return {"message": "Jig eliminado correctamente"}
         
@@ -5,6 +5,7 @@ from ..database import get_db
 from ..models.models import JigNG, Jig, Tecnico
 from ..schemas import JigNG as JigNGSchema, JigNGCreate, JigNGUpdate, PaginatedResponse
 from ..auth import get_current_user
+from ..services.version_service import version_service, JIGS
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -249,6 +250,7 @@ async def create_jig_ng(
                 detail=f"Error creando jig NG: {str(commit_error)}"
             )
     
+    version_service.bump(JIGS)
     return serialize_jig_ng(db_jig_ng)
 
 @router.put("/{jig_ng_id}", response_model=JigNGSchema)
@@ -286,6 +288,7 @@ async def update_jig_ng(
     
     db.commit()
     db.refresh(jig_ng)
+    version_service.bump(JIGS)
     
     return serialize_jig_ng(jig_ng, include_jig=True, db=db)
 
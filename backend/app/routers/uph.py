@@ -7,108 +7,87 @@ Router UPH/Andon - Sistema de producción Hisense
 - Gestión de operadores, modelos y asignaciones
 """
 
+import asyncio
 import csv
+import json
 import os
+import time
+from collections import deque
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, UploadFile, File
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, and_, or_, insert, false, case
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, timedelta, timezone
-from ..database_uph import get_uph_db
+from ..database_uph import get_uph_db, UphSessionLocal
 from ..database import get_db
-from ..models.uph_models import Operador, Linea, ModeloUPH, Turno, Asignacion, EventoUPH, PlanLinea, DescansoLinea, PlanDiaLinea
+from ..models.uph_models import Operador, Linea, ModeloUPH, Turno, Asignacion, EventoUPH, PlanLinea, DescansoLinea, PlanDiaLinea, PIEZAS
 from ..auth import get_current_user
 from ..models.models import Tecnico
+from ..services.descanso_service import descanso_service, turno_id_actual
+from ..services.fotos_service import fotos_service
+from ..services.lideres_service import lideres_service
+from ..services.lineas_service import lineas_service, nombre_evento, estacion_num
+from ..services.eventos_service import eventos_service, MAX_CANTIDAD
+from ..services.version_service import (
+    version_service, conditional_get, EVENTOS, ASIGNACIONES, PLANES, DESCANSOS, LIDERES,
+)
 
 # Directorio donde se guardan los CSV en el servidor
 UPH_CSV_DIR = Path(__file__).parent.parent.parent / "uph_logs"
 UPH_CSV_DIR.mkdir(exist_ok=True)
 
 
-def _append_csv(linea: str, estacion: str, evento: str, contador, ts: datetime):
+def _append_csv(linea: str, estacion: str, evento: str, contador, ts: datetime, cantidad: int = 1):
     fecha = ts.strftime("%Y%m%d")
     archivo = UPH_CSV_DIR / f"uph_backup_{fecha}.csv"
     escribir_header = not archivo.exists()
     with open(archivo, "a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         if escribir_header:
-            writer.writerow(["timestamp", "linea", "estacion", "evento", "contador"])
-        writer.writerow([ts.isoformat(), linea, estacion, evento, contador])
+            writer.writerow(["timestamp", "linea", "estacion", "evento", "contador", "cantidad"])
+        writer.writerow([ts.isoformat(), linea, estacion, evento, contador, cantidad])
 
 # ─────────────────────────────────────────────
-# Horarios de descanso fijos por turno
+# Descansos (fijos por turno + manuales por línea)
 # ─────────────────────────────────────────────
-# Cada entrada: (HH:MM inicio, HH:MM fin)
-# Turno B: el segundo descanso cruza medianoche (02:30-03:00)
-# Turno C viernes: igual que Turno A
-# Turno C sáb/dom: solo un descanso
-
-_DESCANSOS_TURNO = {
-    1: [("09:30", "10:00"), ("14:00", "14:30")],          # Turno A
-    2: [("21:10", "21:40"), ("02:30", "03:00")],          # Turno B
-    "C_finde": [("09:00", "09:30")],                      # Turno C sáb/dom
-    "C_viernes": [("09:30", "10:00"), ("14:00", "14:30")],# Turno C viernes (= A)
-}
-
-
-def _minutos(hhmm: str) -> int:
-    """'09:30' → 570 minutos desde medianoche."""
-    h, m = map(int, hhmm.split(":"))
-    return h * 60 + m
-
+# Los horarios fijos y el estado manual viven en descanso_service; estas
+# funciones se conservan como atajos para los endpoints.
 
 def _esta_en_descanso_fijo(turno_id: int) -> bool:
     """Devuelve True si la hora local actual cae dentro de un descanso fijo."""
-    ahora_loc = datetime.now()
-    ahora_min = ahora_loc.hour * 60 + ahora_loc.minute
-    wd = ahora_loc.weekday()  # 0=Lun…4=Vie, 5=Sab, 6=Dom
-
-    # Determinar clave de horario
-    if turno_id == 3:
-        clave = "C_viernes" if wd == 4 else "C_finde"
-    else:
-        clave = turno_id
-
-    ventanas = _DESCANSOS_TURNO.get(clave, [])
-    for ini_str, fin_str in ventanas:
-        ini_min = _minutos(ini_str)
-        fin_min = _minutos(fin_str)
-        if ini_min <= fin_min:
-            # Ventana normal (no cruza medianoche)
-            if ini_min <= ahora_min < fin_min:
-                return True
-        else:
-            # Cruza medianoche (ej. 02:30-03:00 en turno B)
-            if ahora_min >= ini_min or ahora_min < fin_min:
-                return True
-    return False
-
-
-def _descanso_manual_activo(db, linea_id: int) -> bool:
-    """Devuelve True si hay un descanso manual sin cerrar para esta línea."""
-    d = db.query(DescansoLinea).filter(
-        DescansoLinea.linea_id == linea_id,
-        DescansoLinea.activo   == True,
-        DescansoLinea.fin      == None,
-    ).first()
-    return d is not None
+    return descanso_service.en_descanso_fijo(turno_id)
 
 
 def _esta_en_descanso(db, linea_id: int, turno_id: int) -> bool:
     """Combina descanso manual + horario fijo."""
-    return _descanso_manual_activo(db, linea_id) or _esta_en_descanso_fijo(turno_id)
+    return descanso_service.en_descanso(db, linea_id, turno_id)
 
 
 # ─────────────────────────────────────────────
-# WebSocket — broadcast en tiempo real
+# WebSocket / SSE — broadcast en tiempo real
 # ─────────────────────────────────────────────
 
+SSE_HISTORIAL = 500        # cambios recientes que se pueden reanudar con Last-Event-ID
+SSE_COLA_MAX = 100         # cambios pendientes por suscriptor antes de forzar resync
+SSE_HEARTBEAT_SEG = 15
+
+
 class _ConnectionManager:
+    """Feed de cambios compartido por el WebSocket ('refresh') y el stream SSE.
+
+    Cada broadcast recibe un id de secuencia y queda en un historial circular para
+    que los clientes SSE puedan reanudar desde el último id visto.
+    """
+
     def __init__(self):
         self._clients: list[WebSocket] = []
+        self._suscriptores: list[asyncio.Queue] = []
+        self._historial: deque = deque(maxlen=SSE_HISTORIAL)
+        self._seq = 0
 
     async def connect(self, ws: WebSocket):
         await ws.accept()
@@ -117,7 +96,43 @@ class _ConnectionManager:
     def disconnect(self, ws: WebSocket):
         self._clients.remove(ws)
 
-    async def broadcast(self, msg: str):
+    def suscribir(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=SSE_COLA_MAX)
+        self._suscriptores.append(q)
+        return q
+
+    def desuscribir(self, q: asyncio.Queue):
+        if q in self._suscriptores:
+            self._suscriptores.remove(q)
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def pendientes_desde(self, ultimo_id: int) -> Optional[list]:
+        """Cambios posteriores a `ultimo_id`, o None si ya no están en el historial."""
+        if ultimo_id > self._seq:
+            return None   # id de otro proceso/reinicio
+        if ultimo_id == self._seq:
+            return []
+        if not self._historial or self._historial[0]["id"] > ultimo_id + 1:
+            return None
+        return [c for c in self._historial if c["id"] > ultimo_id]
+
+    async def broadcast(self, msg: str, cambio: Optional[dict] = None):
+        """Notifica a WS ('refresh') y SSE (delta `cambio` con id de secuencia)."""
+        self._seq += 1
+        item = {"id": self._seq, "tipo": msg, **(cambio or {})}
+        self._historial.append(item)
+        for q in list(self._suscriptores):
+            try:
+                q.put_nowait(item)
+            except asyncio.QueueFull:
+                # Cliente lento: descartar deltas y pedirle un snapshot completo
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait({"id": self._seq, "tipo": "resync"})
+
         dead = []
         for ws in self._clients:
             try:
@@ -141,6 +156,17 @@ class EventoIn(BaseModel):
     evento: str
     contador: Optional[int] = None
     timestamp: Optional[str] = None  # ISO 8601
+    # Varias piezas en un registro: rango contador_desde..contador (clientes viejos: 1 pieza)
+    cantidad: int = Field(1, ge=1, le=MAX_CANTIDAD)
+    contador_desde: Optional[int] = None
+
+
+class EventoLoteIn(EventoIn):
+    uid: str                         # id del evento en el outbox del cliente
+
+
+class LoteEventosIn(BaseModel):
+    eventos: List[EventoLoteIn] = Field(..., max_length=500)
 
 
 class AsignacionIn(BaseModel):
@@ -208,46 +234,87 @@ def _color_semaforo(uph_real: float, uph_meta: float) -> str:
     return "rojo"
 
 
+def _foto_operador(op: Optional[Operador]) -> Optional[str]:
+    """foto_url del operador o, si no tiene, la de uploads/operadores (índice)."""
+    if not op:
+        return None
+    return op.foto_url or fotos_service.operador(op.num_empleado)
+
+
 def _linea_evento(linea_nombre: str) -> str:
     """
     Mapea nombre BD ('HI-6') al nombre que usan los eventos ('L6').
     Si ya es 'L6' lo devuelve igual.
     """
-    import re
-    m = re.search(r'\d+', linea_nombre)
-    if m:
-        return f"L{m.group()}"
-    return linea_nombre
+    return nombre_evento(linea_nombre)
+
+
+def _ev_linea(linea: str):
+    """Filtro de eventos por línea ('L6' o 'HI-6'). Una línea desconocida no
+    tiene eventos (la ingesta rechaza lo que no resuelve a linea_id)."""
+    linea_id = lineas_service.id_linea(linea)
+    if linea_id is None:
+        return false()
+    return EventoUPH.linea_id == linea_id
+
+
+# Columnas SUM(CASE) por consulta en _piezas_por_ventana (límite de parámetros de SQLite)
+_VENTANAS_POR_CONSULTA = 200
+
+
+def _ev_estacion(estacion: str):
+    """Filtro de eventos por estación ('604' → estacion_num == 604)."""
+    num = estacion_num(estacion)
+    if num is None:
+        return false()
+    return EventoUPH.estacion_num == num
+
+
+def _piezas_por_ventana(db: Session, ventanas: list, desde: datetime, hasta: datetime) -> list:
+    """
+    Piezas GOOD de cada ventana (lista de condiciones sobre EventoUPH) dentro
+    de [desde, hasta]. Una consulta por bloque de ventanas: cada ventana es un
+    SUM(CASE ...) en lugar de una consulta por asignación.
+    """
+    totales: list = []
+    for i in range(0, len(ventanas), _VENTANAS_POR_CONSULTA):
+        bloque = ventanas[i:i + _VENTANAS_POR_CONSULTA]
+        fila = db.query(*[
+            func.coalesce(func.sum(case((and_(*cond), EventoUPH.cantidad), else_=0)), 0)
+            for cond in bloque
+        ]).filter(
+            EventoUPH.evento    == "GOOD",
+            EventoUPH.timestamp >= desde,
+            EventoUPH.timestamp <= hasta,
+        ).one()
+        totales.extend(int(n or 0) for n in fila)
+    return totales
 
 
 def _uph_hora_actual(db: Session, linea: str, estacion: Optional[str] = None) -> float:
-    """Cuenta eventos GOOD desde el inicio de la hora actual en punto (XX:00)."""
+    """Piezas GOOD desde el inicio de la hora actual en punto (XX:00)."""
     ahora = datetime.now(timezone.utc)
     inicio_hora = ahora.replace(minute=0, second=0, microsecond=0)
-    q = db.query(func.count(EventoUPH.id)).filter(
-        EventoUPH.linea == linea,
+    q = db.query(PIEZAS).filter(
+        _ev_linea(linea),
         EventoUPH.evento == "GOOD",
         EventoUPH.timestamp >= inicio_hora,
         EventoUPH.timestamp <= ahora,
     )
     if estacion:
-        q = q.filter(EventoUPH.estacion == estacion)
+        q = q.filter(_ev_estacion(estacion))
     return float(q.scalar() or 0)
 
 
-def _uph_turno(db: Session, linea: str, inicio_turno: datetime, estacion: Optional[str] = None) -> float:
-    """UPH real del turno: piezas desde inicio del turno ÷ horas transcurridas."""
-    ahora = datetime.now(timezone.utc)
-    horas = max((ahora - inicio_turno).total_seconds() / 3600, 0.01)
-    q = db.query(func.count(EventoUPH.id)).filter(
-        EventoUPH.linea == linea,
-        EventoUPH.evento == "GOOD",
-        EventoUPH.timestamp >= inicio_turno,
-        EventoUPH.timestamp <= ahora,
-    )
-    if estacion:
-        q = q.filter(EventoUPH.estacion == estacion)
-    return float(q.scalar() or 0) / horas
+def _horas_turno(inicio_turno: datetime, turno_id: Optional[int] = None) -> float:
+    """Horas transcurridas del turno (mínimo 0.01); con `turno_id`, sin los
+    minutos de descanso fijo."""
+    segundos = (datetime.now(timezone.utc) - inicio_turno).total_seconds()
+    if turno_id is not None:
+        segundos -= 60 * descanso_service.minutos_descanso(
+            turno_id, inicio_turno.astimezone().replace(tzinfo=None), datetime.now(),
+        )
+    return max(segundos / 3600, 0.01)
 
 
 # Alias para compatibilidad con código existente
@@ -255,6 +322,99 @@ def _uph_ultima_hora(db: Session, linea: str, estacion: Optional[str] = None) ->
     return _uph_hora_actual(db, linea, estacion)
 
 
+def _meta_linea(modelo, linea_nombre: str) -> float:
+    """UPH meta del modelo para la línea (uph_hiN) o uph_total como respaldo."""
+    if not modelo:
+        return 0
+    _num = ''.join(filter(str.isdigit, linea_nombre))
+    _val = getattr(modelo, f"uph_hi{_num}", None) if _num else None
+    return _val if _val else (modelo.uph_total or 0)
+
+
+class _ContextoHoy:
+    """Precarga del día para endpoints de resumen: un puñado de consultas en vez
+    de varias por línea/estación.
+
+    - asignaciones del día con operador, línea y modelo (joinedload)
+    - planes activos del día por línea y secuencia PlanDiaLinea por línea
+    - conteos de eventos GOOD agrupados por (linea_id, estacion_num) bajo demanda
+    """
+
+    def __init__(self, db: Session, hoy: str, linea_id: Optional[int] = None, solo_activas: bool = False):
+        self.db = db
+        self.hoy = hoy
+
+        q = db.query(Asignacion).options(
+            joinedload(Asignacion.operador),
+            joinedload(Asignacion.linea),
+            joinedload(Asignacion.modelo),
+        ).filter(Asignacion.fecha == hoy)
+        if solo_activas:
+            q = q.filter(Asignacion.hora_fin == None)
+        if linea_id is not None:
+            q = q.filter(Asignacion.linea_id == linea_id)
+        self.asignaciones: list = q.order_by(Asignacion.id).all()
+
+        self.asig_por_linea: dict = {}
+        for a in self.asignaciones:
+            self.asig_por_linea.setdefault(a.linea_id, []).append(a)
+
+        self.planes: dict = {}
+        qp = db.query(PlanLinea).options(joinedload(PlanLinea.modelo)).filter(
+            PlanLinea.fecha  == hoy,
+            PlanLinea.activo == True,
+        )
+        for p in qp.order_by(PlanLinea.id).all():
+            self.planes.setdefault(p.linea_id, p)
+
+        self.plan_dia: dict = {}
+        qd = db.query(PlanDiaLinea).filter(PlanDiaLinea.fecha == hoy)
+        for d in qd.order_by(PlanDiaLinea.id).all():
+            self.plan_dia.setdefault(d.linea_id, []).append(d)
+
+    def tiene_siguiente(self, linea_id: int, modelo_id: int) -> bool:
+        """¿Hay un modelo después del actual en la secuencia del día?"""
+        secuencia = self.plan_dia.get(linea_id, [])
+        actual = next((d for d in secuencia if d.modelo_id == modelo_id), None)
+        if actual is None:
+            return False
+        return any(d.orden > actual.orden for d in secuencia)
+
+    def conteos(self, linea_ids, desde: datetime, hasta: Optional[datetime] = None) -> dict:
+        """Piezas GOOD por (linea_id, estacion_num) en [desde, hasta]."""
+        linea_ids = list({l for l in linea_ids if l is not None})
+        if not linea_ids:
+            return {}
+        q = self.db.query(EventoUPH.linea_id, EventoUPH.estacion_num, PIEZAS).filter(
+            EventoUPH.linea_id.in_(linea_ids),
+            EventoUPH.evento    == "GOOD",
+            EventoUPH.timestamp >= desde,
+        )
+        if hasta is not None:
+            q = q.filter(EventoUPH.timestamp <= hasta)
+        return {(l, e): n for l, e, n in q.group_by(EventoUPH.linea_id, EventoUPH.estacion_num).all()}
+
+    @staticmethod
+    def clave(asig: Asignacion) -> tuple:
+        """Clave de `conteos` para una asignación."""
+        return (asig.linea_id, estacion_num(asig.estacion))
+
+    def conteos_linea_desde(self, desde_por_linea: dict, hasta: datetime) -> dict:
+        """Piezas GOOD por linea_id, cada una desde su propio inicio, en una consulta."""
+        if not desde_por_linea:
+            return {}
+        condiciones = [
+            and_(EventoUPH.linea_id == l, EventoUPH.timestamp >= desde)
+            for l, desde in desde_por_linea.items()
+        ]
+        q = self.db.query(EventoUPH.linea_id, PIEZAS).filter(
+            or_(*condiciones),
+            EventoUPH.evento    == "GOOD",
+            EventoUPH.timestamp <= hasta,
+        )
+        return dict(q.group_by(EventoUPH.linea_id).all())
+
+
 def _ensure_admin_or_jefa(current_user: Tecnico):
     if current_user.tipo_usuario not in ("admin", "superadmin", "ingeniero", "lider_linea"):
         raise HTTPException(status_code=403, detail="Sin permisos")
@@ -279,6 +439,7 @@ def seed_lineas(db):
         if not db.query(Linea).filter(Linea.nombre == nombre).first():
             db.add(Linea(nombre=nombre))
     db.commit()
+    lineas_service.cargar(db)
 
 
 def _ensure_gerencia(current_user: Tecnico):
@@ -287,6 +448,49 @@ def _ensure_gerencia(current_user: Tecnico):
         raise HTTPException(status_code=403, detail="Sin permisos")
 
 
+def _auto_avanzar_plan(db: Session, linea_id: int, ts: datetime):
+    """Auto-avance al 95%: si el PlanLinea activo de la línea llegó al 95% de su
+    plan, activar el siguiente modelo del PlanDiaLinea de hoy."""
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    plan_activo = db.query(PlanLinea).filter(
+        PlanLinea.linea_id == linea_id,
+        PlanLinea.fecha    == hoy,
+        PlanLinea.activo   == True,
+    ).first()
+    if plan_activo and plan_activo.plan_total:
+        piezas = db.query(PIEZAS).filter(
+            EventoUPH.linea_id   == linea_id,
+            EventoUPH.evento     == "GOOD",
+            EventoUPH.timestamp  >= plan_activo.creado_en,
+        ).scalar() or 0
+
+        if piezas >= plan_activo.plan_total * 0.95:
+            # Buscar siguiente modelo en PlanDiaLinea
+            orden_actual = db.query(PlanDiaLinea).filter(
+                PlanDiaLinea.linea_id  == linea_id,
+                PlanDiaLinea.modelo_id == plan_activo.modelo_id,
+                PlanDiaLinea.fecha     == hoy,
+            ).first()
+            if orden_actual:
+                siguiente = db.query(PlanDiaLinea).filter(
+                    PlanDiaLinea.linea_id == linea_id,
+                    PlanDiaLinea.fecha    == hoy,
+                    PlanDiaLinea.orden    >  orden_actual.orden,
+                ).order_by(PlanDiaLinea.orden).first()
+                if siguiente:
+                    plan_activo.activo = False
+                    db.add(PlanLinea(
+                        linea_id  = linea_id,
+                        modelo_id = siguiente.modelo_id,
+                        plan_total= siguiente.plan_piezas,
+                        fecha     = hoy,
+                        activo    = True,
+                        creado_en = ts,
+                    ))
+                    db.commit()
+                    version_service.bump(PLANES)
+
+
 # ─────────────────────────────────────────────
 # Endpoints
 # ─────────────────────────────────────────────
@@ -300,68 +504,73 @@ async def recibir_evento(evento: EventoIn, request: Request, db: Session = Depen
     if evento.evento != "GOOD":
         return {"ok": False, "detalle": "Evento ignorado (solo se registran GOOD)"}
 
-    ts = datetime.now(timezone.utc)
+    # evento.linea es "L6"; BD almacena "HI-6" → clave entera resuelta una vez aquí
+    est_num = estacion_num(evento.estacion)
+    linea_id = lineas_service.resolver(db, evento.linea) if est_num is not None else None
+    if linea_id is None or est_num is None:
+        raise HTTPException(status_code=422, detail="Línea o estación no reconocida")
 
+    ts = datetime.now(timezone.utc)
     registro = EventoUPH(
-        linea=evento.linea,
-        estacion=evento.estacion,
+        linea_id=linea_id,
+        estacion_num=est_num,
         evento=evento.evento,
         contador=evento.contador,
         timestamp=ts,
+        cantidad=evento.cantidad,
+        contador_desde=evento.contador_desde,
     )
     db.add(registro)
     db.commit()
+    version_service.bump(EVENTOS)
 
-    _append_csv(evento.linea, evento.estacion, evento.evento, evento.contador, ts)
+    _append_csv(evento.linea, evento.estacion, evento.evento, evento.contador, ts, evento.cantidad)
 
-    # ── Auto-avance al 95%: buscar PlanLinea activo para esta línea ──
-    # evento.linea es "L6"; BD almacena "HI-6"
-    num = ''.join(filter(str.isdigit, evento.linea))
-    if num:
-        hoy = datetime.now().strftime("%Y-%m-%d")
-        linea_obj = db.query(Linea).filter(Linea.nombre == f"HI-{num}").first()
-        if linea_obj:
-            plan_activo = db.query(PlanLinea).filter(
-                PlanLinea.linea_id == linea_obj.id,
-                PlanLinea.fecha    == hoy,
-                PlanLinea.activo   == True,
-            ).first()
-            if plan_activo and plan_activo.plan_total:
-                piezas = db.query(func.count(EventoUPH.id)).filter(
-                    EventoUPH.linea      == evento.linea,
-                    EventoUPH.evento     == "GOOD",
-                    EventoUPH.timestamp  >= plan_activo.creado_en,
-                ).scalar() or 0
-
-                if piezas >= plan_activo.plan_total * 0.95:
-                    # Buscar siguiente modelo en PlanDiaLinea
-                    orden_actual = db.query(PlanDiaLinea).filter(
-                        PlanDiaLinea.linea_id  == linea_obj.id,
-                        PlanDiaLinea.modelo_id == plan_activo.modelo_id,
-                        PlanDiaLinea.fecha     == hoy,
-                    ).first()
-                    if orden_actual:
-                        siguiente = db.query(PlanDiaLinea).filter(
-                            PlanDiaLinea.linea_id == linea_obj.id,
-                            PlanDiaLinea.fecha    == hoy,
-                            PlanDiaLinea.orden    >  orden_actual.orden,
-                        ).order_by(PlanDiaLinea.orden).first()
-                        if siguiente:
-                            plan_activo.activo = False
-                            db.add(PlanLinea(
-                                linea_id  = linea_obj.id,
-                                modelo_id = siguiente.modelo_id,
-                                plan_total= siguiente.plan_piezas,
-                                fecha     = hoy,
-                                activo    = True,
-                                creado_en = ts,
-                            ))
-                            db.commit()
-
-    await ws_manager.broadcast("refresh")
+    _auto_avanzar_plan(db, linea_id, ts)
+
+    await ws_manager.broadcast("refresh", {
+        "evento":   "GOOD",
+        "linea":    evento.linea,
+        "estacion": evento.estacion,
+        "contador": evento.contador,
+        "cantidad": evento.cantidad,
+        "ts":       ts.isoformat(),
+    })
     return {"ok": True, "id": registro.id}
 
 
+@router.post("/eventos/lote")
+async def recibir_lote_eventos(lote: LoteEventosIn, db: Session = Depends(get_uph_db)):
+    """
+    Lote de eventos del outbox del cliente OCR (hora de captura del cliente).
+    Idempotente: un lote reenviado tras perder el ACK devuelve sus eventos como
+    duplicados. El cliente borra de su outbox aceptados + duplicados.
+    """
+    r = eventos_service.registrar_lote(db, lote.eventos)
+    if r["nuevos"]:
+        version_service.bump(EVENTOS)
+        for fila, e in r["nuevos"]:
+            _append_csv(e.linea, e.estacion, e.evento, e.contador, fila["timestamp"], e.cantidad)
+
+        # Un auto-avance y un broadcast por línea (no por pieza)
+        for linea_id, (fila, e) in r["ultimos"].items():
+            _auto_avanzar_plan(db, linea_id, fila["timestamp"])
+            await ws_manager.broadcast("refresh", {
+                "evento":   "GOOD",
+                "linea":    e.linea,
+                "estacion": e.estacion,
+                "contador": e.contador,
+                "cantidad": e.cantidad,
+                "ts":       fila["timestamp"].isoformat(),
+            })
+    return {
+        "ok": True,
+        "aceptados": r["aceptados"],
+        "duplicados": r["duplicados"],
+        "rechazados": r["rechazados"],
+    }
+
+
 @router.get("/andon/{linea}")
 def andon_linea(linea: str, db: Session = Depends(get_uph_db)):
     """
@@ -424,7 +633,10 @@ def andon_linea(linea: str, db: Session = Depends(get_uph_db)):
 
 
 @router.get("/ranking/semanal")
-def ranking_semanal(db: Session = Depends(get_uph_db)):
+def ranking_semanal(
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(EVENTOS, ASIGNACIONES, ttl=60)),
+):
     """
     Ranking por UPH promedio de la semana actual (Lun 06:30 → Vie 18:30).
     La semana se reinicia cada viernes a las 18:30.
@@ -487,7 +699,8 @@ def ranking_semanal(db: Session = Depends(get_uph_db)):
     # ── Acumular piezas por operador usando ventana exacta ───────
     # Cada asignación tiene hora_inicio / hora_fin que delimita su ventana real.
     # hora_inicio=None → desde inicio del turno de ese día (inicio_semana o día 00:00 UTC)
-    op_totales: dict = {}   # num_empleado → total_piezas
+    empleados: list = []
+    ventanas:  list = []
     for a in asignaciones_semana:
         desde_asig = a.hora_inicio if a.hora_inicio else \
             (datetime.strptime(a.fecha, "%Y-%m-%d") + utc_offset).replace(tzinfo=timezone.utc)
@@ -497,23 +710,29 @@ def ranking_semanal(db: Session = Depends(get_uph_db)):
         hasta_asig = min(hasta_asig, corte_utc)
         if desde_asig >= hasta_asig:
             continue
-        cnt = (
-            db.query(func.count(EventoUPH.id))
-            .filter(
-                EventoUPH.estacion  == a.estacion,
-                EventoUPH.evento    == "GOOD",
-                EventoUPH.timestamp >= desde_asig,
-                EventoUPH.timestamp <  hasta_asig,
-            )
-            .scalar() or 0
-        )
-        op_totales[a.num_empleado] = op_totales.get(a.num_empleado, 0) + cnt
+        empleados.append(a.num_empleado)
+        ventanas.append([
+            _ev_estacion(a.estacion),
+            EventoUPH.timestamp >= desde_asig,
+            EventoUPH.timestamp <  hasta_asig,
+        ])
+
+    op_totales: dict = {}   # num_empleado → total_piezas
+    for num_empleado, cnt in zip(
+        empleados, _piezas_por_ventana(db, ventanas, inicio_semana_utc, corte_utc)
+    ):
+        op_totales[num_empleado] = op_totales.get(num_empleado, 0) + cnt
+
+    operadores = {
+        o.num_empleado: o
+        for o in db.query(Operador).filter(Operador.num_empleado.in_(list(op_totales)))
+    } if op_totales else {}
 
     # ── Construir ranking uno por operador ───────────────────────
     hoy = ahora_loc.strftime("%Y-%m-%d")
     ranking = []
     for num_empleado, total_eventos in op_totales.items():
-        operador = db.query(Operador).filter(Operador.num_empleado == num_empleado).first()
+        operador = operadores.get(num_empleado)
         if not operador:
             continue
         # Turno real del perfil
@@ -558,6 +777,7 @@ def crear_asignacion(
     asig = Asignacion(**data.model_dump())
     db.add(asig)
     db.commit()
+    version_service.bump(ASIGNACIONES)
     db.refresh(asig)
     return {"id": asig.id, "ok": True}
 
@@ -640,9 +860,9 @@ def operador_horas_hoy(
         if t_fin > ahora:
             t_fin = ahora
         if estaciones:
-            count = db.query(func.count(EventoUPH.id)).filter(
-                EventoUPH.linea.in_([_linea_evento(a.linea.nombre) for a in asigs if a.linea]),
-                EventoUPH.estacion.in_(estaciones),
+            count = db.query(PIEZAS).filter(
+                EventoUPH.linea_id.in_({a.linea_id for a in asigs if a.linea_id}),
+                EventoUPH.estacion_num.in_({estacion_num(e) for e in estaciones}),
                 EventoUPH.evento == "GOOD",
                 EventoUPH.timestamp >= t,
                 EventoUPH.timestamp < t_fin,
@@ -692,11 +912,13 @@ def crear_operador(
         for k, v in data.model_dump().items():
             setattr(existente, k, v)
         db.commit()
+        version_service.bump(ASIGNACIONES)
         return {"num_empleado": existente.num_empleado, "ok": True, "actualizado": True}
 
     op = Operador(**data.model_dump())
     db.add(op)
     db.commit()
+    version_service.bump(ASIGNACIONES)
     return {"num_empleado": op.num_empleado, "ok": True, "actualizado": False}
 
 
@@ -715,6 +937,7 @@ def actualizar_turno_operador(
         raise HTTPException(status_code=400, detail="Turno debe ser A, B o C")
     op.turno = turno or None
     db.commit()
+    version_service.bump(ASIGNACIONES)
     return {"ok": True, "num_empleado": num_empleado, "turno": op.turno}
 
 
@@ -767,6 +990,7 @@ def crear_modelo(
     )
     db.add(modelo)
     db.commit()
+    version_service.bump(PLANES)
     db.refresh(modelo)
     return {"id": modelo.id, "ok": True}
 
@@ -794,6 +1018,7 @@ def actualizar_modelo(
     modelo.uph_hi7 = data.uph_hi7
     modelo.uph_total = data.uph_hi1
     db.commit()
+    version_service.bump(PLANES)
     return {"id": modelo.id, "ok": True}
 
 
@@ -809,6 +1034,7 @@ def eliminar_modelo(
         raise HTTPException(status_code=404, detail="Modelo no encontrado")
     db.delete(modelo)
     db.commit()
+    version_service.bump(PLANES)
 
 
 @router.get("/modelos/linea/{linea_nombre}")
@@ -865,91 +1091,57 @@ def listar_turnos(
 def resumen_todas_lineas(
     db: Session = Depends(get_uph_db),
     current_user: Tecnico = Depends(get_current_user),
+    _etag: None = Depends(conditional_get(EVENTOS, ASIGNACIONES, PLANES, DESCANSOS, ttl=60)),
 ):
     """Resumen en tiempo real de todas las líneas para gerencia."""
     _ensure_gerencia(current_user)
     lineas = db.query(Linea).order_by(Linea.nombre).all()
     hoy = datetime.now().strftime("%Y-%m-%d")
+    ahora = datetime.now(timezone.utc)
+    ctx = _ContextoHoy(db, hoy)
+
+    # Referencia temporal por línea: desde que inició el plan activo (o hace 1h como mínimo)
+    inicio_ref: dict = {}
+    for linea in lineas:
+        plan_hoy = ctx.planes.get(linea.id)
+        inicio = plan_hoy.creado_en if plan_hoy else (ahora - timedelta(hours=1))
+        if inicio.tzinfo is None:   # SQLite devuelve datetimes naive (UTC)
+            inicio = inicio.replace(tzinfo=timezone.utc)
+        inicio_ref[linea.id] = inicio
+    piezas_ref = ctx.conteos_linea_desde(inicio_ref, ahora)
+
+    # Piezas en la hora actual (contador para X/Y)
+    inicio_hora = ahora.replace(minute=0, second=0, microsecond=0)
+    piezas_hora_linea = ctx.conteos_linea_desde({l: inicio_hora for l in inicio_ref}, ahora)
+
     resultado = []
     for linea in lineas:
-        asig = (
-            db.query(Asignacion)
-            .filter(Asignacion.linea_id == linea.id, Asignacion.fecha == hoy)
-            .first()
-        )
-        modelo = asig.modelo if asig else None
-        _num = ''.join(filter(str.isdigit, linea.nombre))
-        _attr = f"uph_hi{_num}" if _num else None
-        _val = getattr(modelo, _attr, None) if (modelo and _attr) else None
-        uph_meta = _val if _val else (modelo.uph_total or 0) if modelo else 0
+        asigs = ctx.asig_por_linea.get(linea.id, [])
+        modelo = asigs[0].modelo if asigs else None
+        # Plan del día (del planner via plan.html)
+        plan_hoy = ctx.planes.get(linea.id)
+        uph_meta = _meta_linea(modelo, linea.nombre)
         # Si no hay modelo en asignación, intentar desde el plan activo
-        if not uph_meta:
-            plan_modelo_temp = db.query(PlanLinea).filter(
-                PlanLinea.linea_id == linea.id,
-                PlanLinea.fecha    == hoy,
-                PlanLinea.activo   == True,
-            ).first()
-            if plan_modelo_temp and plan_modelo_temp.modelo:
-                m2 = plan_modelo_temp.modelo
-                _val2 = getattr(m2, _attr, None) if _attr else None
-                uph_meta = _val2 if _val2 else (m2.uph_total or 0)
-        nombre_ev = _linea_evento(linea.nombre)   # "HI-6" → "L6"
-        ahora = datetime.now(timezone.utc)
-
-        total_estaciones = (
-            db.query(func.count(func.distinct(Asignacion.estacion)))
-            .filter(Asignacion.linea_id == linea.id, Asignacion.fecha == hoy)
-            .scalar() or 0
-        )
+        if not uph_meta and plan_hoy and plan_hoy.modelo:
+            uph_meta = _meta_linea(plan_hoy.modelo, linea.nombre)
+
+        total_estaciones = len({a.estacion for a in asigs})
 
-        # Plan del día (del planner via plan.html)
-        plan_hoy = db.query(PlanLinea).filter(
-            PlanLinea.linea_id == linea.id,
-            PlanLinea.fecha    == hoy,
-            PlanLinea.activo   == True,
-        ).first()
         plan_modelo_nombre = plan_hoy.modelo.nombre if plan_hoy and plan_hoy.modelo else (modelo.nombre if modelo else None)
         plan_total         = plan_hoy.plan_total if plan_hoy else None
 
-        # Referencia temporal: desde que inició el plan activo (o hace 1h como mínimo)
-        inicio_ref = plan_hoy.creado_en if plan_hoy else (ahora - timedelta(hours=1))
-
         # UPH real: piezas desde inicio del plan ÷ horas transcurridas
-        uph_real = round(_uph_turno(db, nombre_ev, inicio_ref), 1)
+        piezas_desde_ref = piezas_ref.get(linea.id, 0)
+        horas = max((ahora - inicio_ref[linea.id]).total_seconds() / 3600, 0.01)
+        uph_real = round(piezas_desde_ref / horas, 1)
 
         # Piezas acumuladas desde inicio del plan
-        piezas_modelo = None
-        if plan_hoy:
-            piezas_modelo = db.query(func.count(EventoUPH.id)).filter(
-                EventoUPH.linea    == nombre_ev,
-                EventoUPH.evento   == "GOOD",
-                EventoUPH.timestamp >= plan_hoy.creado_en,
-            ).scalar() or 0
+        piezas_modelo = piezas_desde_ref if plan_hoy else None
 
-        # Piezas en la hora actual (contador para X/Y)
-        inicio_hora = ahora.replace(minute=0, second=0, microsecond=0)
-        piezas_hora = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea == nombre_ev,
-            EventoUPH.evento == "GOOD",
-            EventoUPH.timestamp >= inicio_hora,
-            EventoUPH.timestamp <= ahora,
-        ).scalar() or 0
+        piezas_hora = piezas_hora_linea.get(linea.id, 0)
 
         # ¿Hay siguiente modelo en PlanDiaLinea?
-        tiene_siguiente = False
-        if plan_hoy:
-            orden_actual = db.query(PlanDiaLinea).filter(
-                PlanDiaLinea.linea_id  == linea.id,
-                PlanDiaLinea.modelo_id == plan_hoy.modelo_id,
-                PlanDiaLinea.fecha     == hoy,
-            ).first()
-            if orden_actual:
-                sig = db.query(PlanDiaLinea).filter(
-                    PlanDiaLinea.linea_id == linea.id,
-                    PlanDiaLinea.fecha    == hoy,
-                    PlanDiaLinea.orden    >  orden_actual.orden,
-                ).first()
-                tiene_siguiente = sig is not None
+        tiene_siguiente = bool(plan_hoy) and ctx.tiene_siguiente(linea.id, plan_hoy.modelo_id)
 
         resultado.append({
             "linea":           linea.nombre,
@@ -973,6 +1165,7 @@ def top_operadores(
     linea: Optional[str] = None,
     db: Session = Depends(get_uph_db),
     current_user: Tecnico = Depends(get_current_user),
+    _etag: None = Depends(conditional_get(EVENTOS, ASIGNACIONES, ttl=60)),
 ):
     """Top operadores por piezas en la hora actual y en el día."""
     _ensure_gerencia(current_user)
@@ -990,12 +1183,17 @@ def top_operadores(
         inicio_hora = ahora.replace(minute=0, second=0, microsecond=0)
     inicio_dia  = datetime.strptime(hoy, "%Y-%m-%d").replace(tzinfo=timezone.utc)
 
-    query = db.query(Asignacion).filter(Asignacion.fecha == hoy, Asignacion.hora_fin == None)
+    linea_id = None
     if linea:
         linea_obj = db.query(Linea).filter(Linea.nombre == linea).first()
         if linea_obj:
-            query = query.filter(Asignacion.linea_id == linea_obj.id)
-    asignaciones = query.all()
+            linea_id = linea_obj.id
+    ctx = _ContextoHoy(db, hoy, linea_id=linea_id, solo_activas=True)
+    asignaciones = ctx.asignaciones
+
+    linea_ids = [a.linea_id for a in asignaciones]
+    conteo_hora = ctx.conteos(linea_ids, inicio_hora)
+    conteo_dia  = ctx.conteos(linea_ids, inicio_dia)
 
     # Acumular por operador
     por_op: dict = {}
@@ -1004,29 +1202,17 @@ def top_operadores(
             continue
         key = asig.num_empleado
         if key not in por_op:
-            op = db.query(Operador).filter(Operador.num_empleado == key).first()
+            op = asig.operador
             por_op[key] = {
                 "num_empleado": key,
                 "nombre": op.nombre if op else key,
-                "foto_url": op.foto_url if op else None,
+                "foto_url": _foto_operador(op),
                 "piezas_hora": 0,
                 "piezas_dia": 0,
             }
-        linea_nombre = _linea_evento(asig.linea.nombre if asig.linea else "")
-        piezas_hora = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.estacion == asig.estacion,
-            EventoUPH.linea == linea_nombre,
-            EventoUPH.evento == "GOOD",
-            EventoUPH.timestamp >= inicio_hora,
-        ).scalar() or 0
-        piezas_dia = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.estacion == asig.estacion,
-            EventoUPH.linea == linea_nombre,
-            EventoUPH.evento == "GOOD",
-            EventoUPH.timestamp >= inicio_dia,
-        ).scalar() or 0
-        por_op[key]["piezas_hora"] += piezas_hora
-        por_op[key]["piezas_dia"]  += piezas_dia
+        clave = ctx.clave(asig)
+        por_op[key]["piezas_hora"] += conteo_hora.get(clave, 0)
+        por_op[key]["piezas_dia"]  += conteo_dia.get(clave, 0)
 
     ops = list(por_op.values())
     top_hora = sorted(ops, key=lambda x: x["piezas_hora"], reverse=True)[:3]
@@ -1067,10 +1253,10 @@ def historial_operador(
         inicio_dia = datetime.strptime(fecha, "%Y-%m-%d").replace(tzinfo=timezone.utc)
         fin_dia = inicio_dia + timedelta(days=1)
         eventos = (
-            db.query(func.count(EventoUPH.id))
+            db.query(PIEZAS)
             .filter(
-                EventoUPH.estacion == asig.estacion,
-                EventoUPH.linea == linea_nombre,
+                _ev_estacion(asig.estacion),
+                EventoUPH.linea_id == asig.linea_id,
                 EventoUPH.evento == "GOOD",
                 EventoUPH.timestamp >= inicio_dia,
                 EventoUPH.timestamp < fin_dia,
@@ -1136,9 +1322,9 @@ def reporte_semanal_completo(
                 datetime.strptime(a.fecha, "%Y-%m-%d").replace(tzinfo=timezone.utc)
             hasta_a = a.hora_fin if a.hora_fin else datetime.now(timezone.utc)
             cnt = (
-                db.query(func.count(EventoUPH.id))
+                db.query(PIEZAS)
                 .filter(
-                    EventoUPH.estacion  == a.estacion,
+                    _ev_estacion(a.estacion),
                     EventoUPH.evento    == "GOOD",
                     EventoUPH.timestamp >= desde_a,
                     EventoUPH.timestamp <  hasta_a,
@@ -1275,7 +1461,7 @@ def get_asignacion_hoy(
         resultado.append({
             "num_empleado": num_emp,
             "nombre": op.nombre if op else num_emp,
-            "foto_url": op.foto_url if op else None,
+            "foto_url": _foto_operador(op),
             "turno": op.turno if op else None,
             "estaciones": estaciones,
         })
@@ -1310,6 +1496,7 @@ def actualizar_modelo_hoy(
         Asignacion.fecha == hoy,
     ).update({"modelo_id": modelo_id})
     db.commit()
+    version_service.bump(ASIGNACIONES)
     return {"ok": True, "actualizadas": actualizadas, "modelo": modelo.nombre}
 
 
@@ -1330,6 +1517,7 @@ def limpiar_asignacion_hoy(
         Asignacion.fecha == hoy,
     ).delete()
     db.commit()
+    version_service.bump(ASIGNACIONES)
     return {"ok": True, "eliminadas": eliminadas}
 
 
@@ -1407,7 +1595,8 @@ async def crear_asignacion_bulk(
         creadas += 1
 
     db.commit()
-    await ws_manager.broadcast("refresh")
+    version_service.bump(ASIGNACIONES)
+    await ws_manager.broadcast("refresh", {"evento": "asignaciones", "linea": _linea_evento(data.linea)})
     return {"ok": True, "creadas": creadas, "linea": data.linea, "fecha": data.fecha}
 
 
@@ -1416,6 +1605,7 @@ def scoreboard_hoy(
     linea: Optional[str] = None,
     db: Session = Depends(get_uph_db),
     current_user: Tecnico = Depends(get_current_user),
+    _etag: None = Depends(conditional_get(EVENTOS, ASIGNACIONES, ttl=60)),
 ):
     """Scoreboard en tiempo real del día: operadores rankeados por KPI actual."""
     _ensure_gerencia(current_user)
@@ -1423,13 +1613,13 @@ def scoreboard_hoy(
     ahora = datetime.now(timezone.utc)
     inicio_dia = datetime.strptime(hoy, "%Y-%m-%d").replace(tzinfo=timezone.utc)
 
-    query = db.query(Asignacion).filter(Asignacion.fecha == hoy, Asignacion.hora_fin == None)
+    linea_id = None
     if linea:
         linea_obj = db.query(Linea).filter(Linea.nombre == linea).first()
         if linea_obj:
-            query = query.filter(Asignacion.linea_id == linea_obj.id)
-
-    asignaciones = query.all()
+            linea_id = linea_obj.id
+    ctx = _ContextoHoy(db, hoy, linea_id=linea_id, solo_activas=True)
+    asignaciones = ctx.asignaciones
 
     # Pre-calcular # estaciones por linea para dividir UPH meta
     estaciones_por_linea: dict = {}
@@ -1439,33 +1629,25 @@ def scoreboard_hoy(
             estaciones_por_linea[lid] = set()
         estaciones_por_linea[lid].add(asig.estacion)
 
+    # Conteos por (línea, estación): hora en punto actual y día completo
+    linea_ids = [a.linea_id for a in asignaciones]
+    conteo_hora = ctx.conteos(linea_ids, ahora.replace(minute=0, second=0, microsecond=0), ahora)
+    conteo_dia  = ctx.conteos(linea_ids, inicio_dia, ahora)
+
     resultado = []
     for asig in asignaciones:
         linea_nombre = asig.linea.nombre if asig.linea else ""
         num_est = len(estaciones_por_linea.get(asig.linea_id, {1})) or 1
         # Usar UPH específico de la línea
-        _num = ''.join(filter(str.isdigit, linea_nombre))
-        _attr = f"uph_hi{_num}" if _num else None
-        _uph_linea_val = getattr(asig.modelo, _attr, None) if (asig.modelo and _attr) else None
-        uph_meta_linea = _uph_linea_val if _uph_linea_val else (asig.modelo.uph_total if asig.modelo else 0)
+        uph_meta_linea = _meta_linea(asig.modelo, linea_nombre)
         uph_meta_est = round(uph_meta_linea / num_est, 1)
 
-        nombre_ev_sb = _linea_evento(linea_nombre)   # "HI-6" → "L6"
-        uph_hora = _uph_ultima_hora(db, nombre_ev_sb, asig.estacion)
+        clave = ctx.clave(asig)
+        uph_hora = float(conteo_hora.get(clave, 0))
 
         # total_hoy = piezas del día completo en esa estación
         # (independiente de cuándo se asignó el operador — evita reset al reasignar)
-        total_hoy = (
-            db.query(func.count(EventoUPH.id))
-            .filter(
-                EventoUPH.estacion == asig.estacion,
-                EventoUPH.linea == nombre_ev_sb,
-                EventoUPH.evento == "GOOD",
-                EventoUPH.timestamp >= inicio_dia,
-                EventoUPH.timestamp <= ahora,
-            )
-            .scalar() or 0
-        )
+        total_hoy = conteo_dia.get(clave, 0)
 
         kpi_pct = round((uph_hora / uph_meta_est * 100) if uph_meta_est > 0 else 0, 1)
 
@@ -1525,23 +1707,23 @@ def api_datos(linea: str = "L6", db: Session = Depends(get_uph_db)):
     desde = datetime(2000, 1, 1, tzinfo=timezone.utc)
 
     rows = (
-        db.query(EventoUPH.estacion, func.count(EventoUPH.id).label("total"))
+        db.query(EventoUPH.estacion_num, PIEZAS.label("total"))
         .filter(
-            EventoUPH.linea == linea,
+            _ev_linea(linea),
             EventoUPH.evento == "GOOD",
             EventoUPH.timestamp >= desde,
         )
-        .group_by(EventoUPH.estacion)
+        .group_by(EventoUPH.estacion_num)
         .all()
     )
-    conteos = {r.estacion: r.total for r in rows}
+    conteos = {r.estacion_num: r.total for r in rows}
 
     estaciones_list = ESTACIONES_POR_LINEA.get(linea, [str(i) for i in range(601, 609)])
     datos = [
         {
             "estacion": est,
-            "hora_actual": conteos.get(est, 0),
-            "turno": conteos.get(est, 0),
+            "hora_actual": conteos.get(estacion_num(est), 0),
+            "turno": conteos.get(estacion_num(est), 0),
             "uph": _uph_ultima_hora(db, linea, est),
         }
         for est in estaciones_list
@@ -1554,7 +1736,7 @@ def estado_cliente(linea: str = "L6", db: Session = Depends(get_uph_db)):
     """Indica si el cliente OCR está activo (último evento < 3 min)."""
     ultimo = (
         db.query(func.max(EventoUPH.timestamp))
-        .filter(EventoUPH.linea == linea)
+        .filter(_ev_linea(linea))
         .scalar()
     )
     if ultimo is None:
@@ -1582,9 +1764,10 @@ def limpiar_eventos(data: LimpiarIn, db: Session = Depends(get_uph_db)):
     """Elimina eventos para pruebas. Si linea=None borra todo."""
     q = db.query(EventoUPH)
     if data.linea:
-        q = q.filter(EventoUPH.linea == data.linea)
+        q = q.filter(_ev_linea(data.linea))
     eliminados = q.delete(synchronize_session=False)
     db.commit()
+    version_service.bump(EVENTOS)
     return {"ok": True, "eliminados": eliminados}
 
 
@@ -1612,7 +1795,9 @@ def iniciar_descanso(
     d = DescansoLinea(linea_id=l.id, inicio=datetime.now(timezone.utc))
     db.add(d)
     db.commit()
+    version_service.bump(DESCANSOS)
     db.refresh(d)
+    descanso_service.iniciar(l.id, d.inicio)
     return {"id": d.id, "ok": True, "inicio": d.inicio.isoformat()}
 
 
@@ -1634,6 +1819,8 @@ def terminar_descanso(
         DescansoLinea.fin      == None,
     ).update({"fin": ahora, "activo": False})
     db.commit()
+    version_service.bump(DESCANSOS)
+    descanso_service.terminar(l.id)
     return {"ok": True, "cerrados": updated}
 
 
@@ -1647,34 +1834,19 @@ def estado_descanso(
     l = db.query(Linea).filter(Linea.nombre == linea).first()
     if not l:
         raise HTTPException(status_code=404, detail="Línea no encontrada")
+    return {"linea": linea, **descanso_service.estado(db, l.id, turno_id_actual())}
 
-    # Turno activo
-    ahora_loc = datetime.now()
-    mins = ahora_loc.hour * 60 + ahora_loc.minute
-    wd   = ahora_loc.weekday()
-    T_INI, T_FIN = 6 * 60 + 30, 18 * 60 + 30
-    if wd in (0, 1, 2, 3):
-        turno_id = 1 if T_INI <= mins < T_FIN else 2
-    elif wd == 4:
-        turno_id = 2 if mins < T_INI else (3 if T_INI <= mins < T_FIN else 2)
-    elif wd == 5:
-        turno_id = 2 if mins < T_INI else (3 if T_INI <= mins < T_FIN else 2)
-    else:
-        turno_id = 3 if T_INI <= mins < T_FIN else 2
-
-    manual = db.query(DescansoLinea).filter(
-        DescansoLinea.linea_id == l.id,
-        DescansoLinea.activo   == True,
-        DescansoLinea.fin      == None,
-    ).first()
 
-    en_descanso = bool(manual) or _esta_en_descanso_fijo(turno_id)
-    return {
-        "linea":        linea,
-        "en_descanso":  en_descanso,
-        "tipo":         "manual" if manual else ("fijo" if en_descanso else None),
-        "inicio":       manual.inicio.isoformat() if manual else None,
-    }
+@router.get("/ocr/descanso/{linea}")
+def estado_descanso_ocr(linea: str, db: Session = Depends(get_uph_db)):
+    """
+    Estado de descanso para el cliente OCR (baja su frecuencia de muestreo).
+    Sin autenticación (solo red local); acepta el nombre que envía la PC ("L6").
+    """
+    linea_id = lineas_service.id_linea(linea)   # solo lectura: nunca crea la línea
+    if linea_id is None:
+        raise HTTPException(status_code=404, detail="Línea no encontrada")
+    return {"linea": linea, **descanso_service.estado(db, linea_id, turno_id_actual())}
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -1709,6 +1881,7 @@ def crear_plan_linea(
     )
     db.add(plan)
     db.commit()
+    version_service.bump(PLANES)
     db.refresh(plan)
     return {"id": plan.id, "ok": True}
 
@@ -1731,9 +1904,8 @@ def get_plan_linea(
     ).first()
     if not plan:
         return {"plan": None}
-    nombre_evento = _linea_evento(linea)
-    piezas_actual = db.query(func.count(EventoUPH.id)).filter(
-        EventoUPH.linea    == nombre_evento,
+    piezas_actual = db.query(PIEZAS).filter(
+        EventoUPH.linea_id == l.id,
         EventoUPH.evento   == "GOOD",
         EventoUPH.timestamp >= plan.creado_en,
     ).scalar() or 0
@@ -1770,6 +1942,7 @@ def cerrar_plan_linea(
         PlanLinea.activo   == True,
     ).update({"activo": False})
     db.commit()
+    version_service.bump(PLANES)
     return {"ok": True}
 
 
@@ -1785,7 +1958,10 @@ def dashboard_operadores():
 
 
 @router.get("/dashboard/asignaciones-hoy")
-def asignaciones_hoy_publico(db: Session = Depends(get_uph_db)):
+def asignaciones_hoy_publico(
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(ASIGNACIONES, ttl=60)),
+):
     """
     Operadores asignados hoy, agrupados por línea — sin autenticación.
     Usado por el dashboard de pared.
@@ -1807,7 +1983,7 @@ def asignaciones_hoy_publico(db: Session = Depends(get_uph_db)):
             por_linea[linea_nombre][a.num_empleado] = {
                 "num_empleado": a.num_empleado,
                 "nombre": op.nombre if op else a.num_empleado,
-                "foto_url": op.foto_url if op else None,
+                "foto_url": _foto_operador(op),
                 "turno": op.turno if op else None,
             }
     resultado = [
@@ -1835,15 +2011,142 @@ async def uph_websocket(ws: WebSocket):
         ws_manager.disconnect(ws)
 
 
+class NotifyIn(BaseModel):
+    linea: Optional[str] = None
+    estacion: Optional[str] = None
+    contador: Optional[int] = None
+    cantidad: Optional[int] = None
+    ts: Optional[str] = None
+
+
 @router.post("/internal/notify", include_in_schema=False)
-async def internal_notify():
+async def internal_notify(data: Optional[NotifyIn] = None):
     """run_uph.py (puerto 5000) llama esto después de guardar un EventoUPH."""
-    await ws_manager.broadcast("refresh")
+    version_service.bump(EVENTOS)
+    cambio = {"evento": "GOOD", **data.model_dump()} if data else None
+    await ws_manager.broadcast("refresh", cambio)
     return {"ok": True, "clients": len(ws_manager._clients)}
 
 
+def _snapshot_lineas(linea: Optional[str] = None) -> dict:
+    """Estado compacto por línea para SSE: piezas del turno, de la hora y último evento."""
+    ahora = datetime.now(timezone.utc)
+    inicio_turno = _turno_inicio_actual().astimezone(timezone.utc)
+    inicio_hora = ahora.replace(minute=0, second=0, microsecond=0)
+    db = UphSessionLocal()
+    try:
+        q = db.query(
+            EventoUPH.linea_id,
+            PIEZAS,
+            func.max(EventoUPH.timestamp),
+        ).filter(
+            EventoUPH.evento    == "GOOD",
+            EventoUPH.timestamp >= inicio_turno,
+        )
+        qh = db.query(EventoUPH.linea_id, PIEZAS).filter(
+            EventoUPH.evento    == "GOOD",
+            EventoUPH.timestamp >= inicio_hora,
+        )
+        if linea:
+            q = q.filter(_ev_linea(linea))
+            qh = qh.filter(_ev_linea(linea))
+        por_hora = dict(qh.group_by(EventoUPH.linea_id).all())
+        # Claves con el nombre de evento ("L6") que usan los clientes
+        lineas = {
+            nombre_evento(lineas_service.nombre(l) or str(l)): {
+                "piezas_turno":  total,
+                "piezas_hora":   por_hora.get(l, 0),
+                "ultimo_evento": ultimo.isoformat() if ultimo else None,
+            }
+            for l, total, ultimo in q.group_by(EventoUPH.linea_id).all()
+        }
+    finally:
+        db.close()
+    return {
+        "turno_inicio": inicio_turno.isoformat(),
+        "lineas":       lineas,
+        "actualizado":  ahora.isoformat(),
+    }
+
+
+def _sse(evento: str, datos: dict, id_: Optional[int] = None) -> str:
+    partes = []
+    if id_ is not None:
+        partes.append(f"id: {id_}")
+    partes.append(f"event: {evento}")
+    partes.append(f"data: {json.dumps(datos, default=str)}")
+    return "\n".join(partes) + "\n\n"
+
+
+@router.get("/stream")
+async def uph_stream(request: Request, linea: Optional[str] = None):
+    """
+    Server-Sent Events: alternativa al polling para pantallas donde el WebSocket
+    no es confiable (proxy). Usa el mismo feed de cambios que /ws.
+
+    - `snapshot`: estado por línea al conectar (o al resincronizar)
+    - `delta`: cada cambio del feed; `id` es la secuencia para Last-Event-ID
+    - comentario `: ping` cada 15 s como heartbeat
+    - `?linea=L6` (o HI-6) filtra los deltas de otras líneas
+    """
+    filtro = _linea_evento(linea) if linea else None
+    ultimo_id = request.headers.get("last-event-id")
+
+    def _aplica(cambio: dict) -> bool:
+        return not filtro or not cambio.get("linea") or cambio["linea"] == filtro
+
+    async def _generador():
+        enviado = -1   # último id entregado; evita duplicar deltas ya cubiertos
+
+        async def _snapshot() -> str:
+            nonlocal enviado
+            enviado = ws_manager.seq
+            datos = await run_in_threadpool(_snapshot_lineas, filtro)
+            return _sse("snapshot", datos, enviado)
+
+        cola = ws_manager.suscribir()
+        try:
+            yield "retry: 3000\n\n"
+            pendientes = None
+            if ultimo_id and ultimo_id.isdigit():
+                pendientes = ws_manager.pendientes_desde(int(ultimo_id))
+            if pendientes is None:
+                yield await _snapshot()
+            else:
+                enviado = int(ultimo_id)
+                for cambio in pendientes:
+                    enviado = cambio["id"]
+                    if _aplica(cambio):
+                        yield _sse("delta", cambio, cambio["id"])
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    cambio = await asyncio.wait_for(cola.get(), timeout=SSE_HEARTBEAT_SEG)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if cambio["tipo"] == "resync":
+                    yield await _snapshot()
+                elif cambio["id"] > enviado:
+                    enviado = cambio["id"]
+                    if _aplica(cambio):
+                        yield _sse("delta", cambio, cambio["id"])
+        finally:
+            ws_manager.desuscribir(cola)
+
+    return StreamingResponse(
+        _generador(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/dashboard/lineas-hoy")
-def dashboard_lineas_hoy(db: Session = Depends(get_uph_db)):
+def dashboard_lineas_hoy(
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(EVENTOS, ASIGNACIONES, PLANES, DESCANSOS, ttl=60)),
+):
     """
     Datos completos para wall dashboard v2 — sin autenticación.
     Retorna por línea: UPH actual, meta, modelo, piezas acumuladas del modelo,
@@ -1941,29 +2244,62 @@ def dashboard_lineas_hoy(db: Session = Depends(get_uph_db)):
 
     lineas = db.query(Linea).order_by(Linea.nombre).all()
 
+    # Precarga: asignaciones del turno activo (con operador y modelo), planes
+    # del día y piezas por estación en dos consultas agrupadas
+    asig_por_linea: dict = {}
+    for a in (
+        db.query(Asignacion)
+        .options(joinedload(Asignacion.operador), joinedload(Asignacion.modelo))
+        .filter(
+            Asignacion.fecha    == fecha_asig,
+            Asignacion.turno_id == turno_id_act,
+            Asignacion.hora_fin.is_(None),
+        )
+        .order_by(Asignacion.id)
+        .all()
+    ):
+        asig_por_linea.setdefault(a.linea_id, []).append(a)
+
+    planes: dict = {}
+    for p in (
+        db.query(PlanLinea).options(joinedload(PlanLinea.modelo))
+        .filter(PlanLinea.fecha == hoy, PlanLinea.activo == True)
+        .order_by(PlanLinea.id)
+        .all()
+    ):
+        planes.setdefault(p.linea_id, p)
+
+    plan_dia: dict = {}
+    for d in db.query(PlanDiaLinea).filter(PlanDiaLinea.fecha == hoy).order_by(PlanDiaLinea.id).all():
+        plan_dia.setdefault(d.linea_id, []).append(d)
+
+    def _conteos(desde: datetime) -> dict:
+        q = db.query(EventoUPH.linea_id, EventoUPH.estacion_num, PIEZAS).filter(
+            EventoUPH.evento    == "GOOD",
+            EventoUPH.timestamp >= desde,
+            EventoUPH.timestamp <= ahora,
+        ).group_by(EventoUPH.linea_id, EventoUPH.estacion_num)
+        return {(l, e): n for l, e, n in q.all()}
+
+    piezas_turno_por_est = _conteos(inicio_turno_utc)
+    piezas_hora_por_est  = _conteos(inicio_hora)
+    piezas_turno_linea: dict = {}
+    piezas_hora_linea:  dict = {}
+    for (l, _), n in piezas_turno_por_est.items():
+        piezas_turno_linea[l] = piezas_turno_linea.get(l, 0) + n
+    for (l, _), n in piezas_hora_por_est.items():
+        piezas_hora_linea[l] = piezas_hora_linea.get(l, 0) + n
+
+    # Horas efectivas del turno (sin descansos fijos), iguales para todas las líneas
+    horas = _horas_turno(inicio_turno_utc, turno_id_act)
+
     resultado = []
     for linea in lineas:
         # Asignaciones del turno activo para esta línea (solo turno actual)
-        asignaciones = (
-            db.query(Asignacion)
-            .filter(
-                Asignacion.linea_id == linea.id,
-                Asignacion.fecha    == fecha_asig,
-                Asignacion.turno_id == turno_id_act,
-                Asignacion.hora_fin.is_(None),
-            )
-            .all()
-        )
-
-        # Nombre de línea tal como llega en los eventos (L6, L1, etc.)
-        nombre_evento = _linea_evento(linea.nombre)
+        asignaciones = asig_por_linea.get(linea.id, [])
 
         # Plan activo de hoy para esta línea (usar fecha local, igual que plan/subir)
-        plan_activo = db.query(PlanLinea).filter(
-            PlanLinea.linea_id == linea.id,
-            PlanLinea.fecha    == hoy,
-            PlanLinea.activo   == True,
-        ).first()
+        plan_activo = planes.get(linea.id)
 
         # Modelo actual: preferir el del plan activo (avanza con el plan),
         # caer en el de la primera asignación si no hay plan
@@ -1972,23 +2308,14 @@ def dashboard_lineas_hoy(db: Session = Depends(get_uph_db)):
         modelo_nombre = modelo.nombre if modelo else None
 
         # UPH meta específica de la línea
-        _num = ''.join(filter(str.isdigit, linea.nombre))
-        _attr = f"uph_hi{_num}" if _num else None
-        _val = getattr(modelo, _attr, None) if (modelo and _attr) else None
-        uph_meta = _val if _val else (modelo.uph_total if modelo else 0) if modelo else 0
-
-        # UPH actual: piezas del turno ÷ horas transcurridas (average para barra/%)
-        uph_actual  = round(_uph_turno(db, nombre_evento, inicio_turno_utc), 1)
-        # Piezas RAW en la hora actual (contador para el número X/Y)
-        piezas_hora = int(_uph_hora_actual(db, nombre_evento))
+        uph_meta = _meta_linea(modelo, linea.nombre)
 
         # Piezas desde inicio del turno (no desde plan_activo.creado_en para no resetear al subir plan)
-        piezas_modelo = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea == nombre_evento,
-            EventoUPH.evento == "GOOD",
-            EventoUPH.timestamp >= inicio_turno_utc,
-            EventoUPH.timestamp <= ahora,
-        ).scalar() or 0
+        piezas_modelo = piezas_turno_linea.get(linea.id, 0)
+        # UPH actual: piezas del turno ÷ horas efectivas (sin descansos fijos)
+        uph_actual  = round(piezas_modelo / horas, 1)
+        # Piezas RAW en la hora actual (contador para el número X/Y)
+        piezas_hora = int(piezas_hora_linea.get(linea.id, 0))
 
         # Plan total: plan activo > plan_interno de asignación > meta × 12h
         plan_modelo = (
@@ -2014,19 +2341,14 @@ def dashboard_lineas_hoy(db: Session = Depends(get_uph_db)):
                 ops_dict[emp] = {
                     "num_empleado": emp,
                     "nombre": op.nombre if op else str(emp),
-                    "foto_url": op.foto_url if op else None,
+                    "foto_url": _foto_operador(op),
                     "estaciones": [],
                     "piezas_turno": 0,
                 }
-            uph_hora_est    = round(_uph_turno(db, nombre_evento, inicio_turno_utc, a.estacion), 1)
-            piezas_hora_est = int(_uph_hora_actual(db, nombre_evento, a.estacion))
-            piezas_turno_est = db.query(func.count(EventoUPH.id)).filter(
-                EventoUPH.linea     == nombre_evento,
-                EventoUPH.estacion  == a.estacion,
-                EventoUPH.evento    == "GOOD",
-                EventoUPH.timestamp >= inicio_turno_utc,
-                EventoUPH.timestamp <= ahora,
-            ).scalar() or 0
+            clave = (linea.id, estacion_num(a.estacion))
+            piezas_turno_est = piezas_turno_por_est.get(clave, 0)
+            uph_hora_est    = round(piezas_turno_est / horas, 1)
+            piezas_hora_est = int(piezas_hora_por_est.get(clave, 0))
             kpi_pct = round((uph_hora_est / uph_meta_est * 100) if uph_meta_est > 0 else 0, 1)
             ops_dict[emp]["piezas_turno"] += piezas_turno_est
             ops_dict[emp]["estaciones"].append({
@@ -2045,18 +2367,10 @@ def dashboard_lineas_hoy(db: Session = Depends(get_uph_db)):
         # ¿Hay siguiente modelo en PlanDiaLinea?
         tiene_siguiente = False
         if plan_activo:
-            orden_actual = db.query(PlanDiaLinea).filter(
-                PlanDiaLinea.linea_id  == linea.id,
-                PlanDiaLinea.modelo_id == plan_activo.modelo_id,
-                PlanDiaLinea.fecha     == hoy,
-            ).first()
+            secuencia = plan_dia.get(linea.id, [])
+            orden_actual = next((d for d in secuencia if d.modelo_id == plan_activo.modelo_id), None)
             if orden_actual:
-                sig = db.query(PlanDiaLinea).filter(
-                    PlanDiaLinea.linea_id == linea.id,
-                    PlanDiaLinea.fecha    == hoy,
-                    PlanDiaLinea.orden    >  orden_actual.orden,
-                ).first()
-                tiene_siguiente = sig is not None
+                tiene_siguiente = any(d.orden > orden_actual.orden for d in secuencia)
 
         modelo_interno = modelo.modelo_interno if modelo else None
 
@@ -2128,10 +2442,11 @@ async def plan_avanzar_modelo(linea_id: int, db: Session = Depends(get_uph_db)):
     )
     db.add(nuevo)
     db.commit()
+    version_service.bump(PLANES)
     db.refresh(nuevo)
 
     modelo = db.query(ModeloUPH).filter(ModeloUPH.id == siguiente.modelo_id).first()
-    await ws_manager.broadcast("refresh")
+    await ws_manager.broadcast("refresh", {"evento": "plan"})
     return {
         "ok": True,
         "nuevo_modelo": modelo.nombre if modelo else None,
@@ -2140,7 +2455,12 @@ async def plan_avanzar_modelo(linea_id: int, db: Session = Depends(get_uph_db)):
 
 
 @router.get("/tendencias")
-def tendencias_uph(desde: Optional[str] = None, horas: int = 12, db: Session = Depends(get_uph_db)):
+def tendencias_uph(
+    desde: Optional[str] = None,
+    horas: int = 12,
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(EVENTOS, ttl=60)),
+):
     """
     UPH por hora para cada línea desde el inicio del turno activo.
     Acepta `desde` (ISO 8601) o `horas` como fallback.
@@ -2179,14 +2499,33 @@ def tendencias_uph(desde: Optional[str] = None, horas: int = 12, db: Session = D
     from datetime import datetime as _dt
     hoy = _dt.now().strftime("%Y-%m-%d")
 
-    for linea in lineas:
-        nombre_evento = _linea_evento(linea.nombre)
+    # Primera asignación de hoy por línea (con su modelo) en una consulta
+    primera_asig: dict = {}
+    for a in (
+        db.query(Asignacion).options(joinedload(Asignacion.modelo))
+        .filter(Asignacion.fecha == hoy)
+        .order_by(Asignacion.id)
+        .all()
+    ):
+        primera_asig.setdefault(a.linea_id, a)
+
+    # Piezas por (línea, slot) en una consulta: CASE asigna cada evento a su slot
+    conteos: dict = {}
+    if slots:
+        idx_slot = case(
+            *[(EventoUPH.timestamp < fin, i) for i, fin in enumerate(slots[1:])],
+            else_=len(slots) - 1,
+        )
+        q = db.query(EventoUPH.linea_id, idx_slot, PIEZAS).filter(
+            EventoUPH.evento == "GOOD",
+            EventoUPH.timestamp >= slots[0],
+            EventoUPH.timestamp <  ahora,
+        ).group_by(EventoUPH.linea_id, idx_slot)
+        conteos = {(l, i): n for l, i, n in q.all()}
 
+    for linea in lineas:
         # Meta de la línea: buscar modelo activo de hoy
-        asig = db.query(Asignacion).filter(
-            Asignacion.linea_id == linea.id,
-            Asignacion.fecha    == hoy,
-        ).first()
+        asig = primera_asig.get(linea.id)
         modelo  = asig.modelo if asig else None
         _num    = ''.join(filter(str.isdigit, linea.nombre))
         _attr   = f"uph_hi{_num}" if _num else None
@@ -2202,12 +2541,7 @@ def tendencias_uph(desde: Optional[str] = None, horas: int = 12, db: Session = D
                 fin = ahora
 
             minutos = max(1, (fin - slot).total_seconds() / 60)
-            conteo  = db.query(func.count(EventoUPH.id)).filter(
-                EventoUPH.linea  == nombre_evento,
-                EventoUPH.evento == "GOOD",
-                EventoUPH.timestamp >= slot,
-                EventoUPH.timestamp <  fin,
-            ).scalar() or 0
+            conteo  = conteos.get((linea.id, idx), 0)
 
             # meta proporcional al slot (ej. 30 min → meta/2)
             meta_slot = round(uph_meta * minutos / 60)
@@ -2537,9 +2871,9 @@ def _guardar_csv_hora(linea: str, estaciones: list, db):
         if escribir_header:
             writer.writerow(["hora", "estacion", "total_piezas"])
         for est in estaciones:
-            total = db.query(func.count(EventoUPH.id)).filter(
-                EventoUPH.linea == linea,
-                EventoUPH.estacion == est,
+            total = db.query(PIEZAS).filter(
+                _ev_linea(linea),
+                _ev_estacion(est),
                 EventoUPH.evento == "GOOD",
                 EventoUPH.timestamp >= inicio,
             ).scalar() or 0
@@ -2768,26 +3102,45 @@ def plan_listar_modelos(db: Session = Depends(get_uph_db)):
     return {"modelos": [_modelo_to_dict(m) for m in modelos]}
 
 
+def _parse_int(val):
+    try:    return int(float(val)) if val else None
+    except (TypeError, ValueError): return None
+
+
 @router.post("/plan/subir")
 async def plan_subir(data: PlanSubirIn, db: Session = Depends(get_uph_db)):
     """Procesa filas del Excel: upsert modelos, PlanDiaLinea (todos los modelos del día)
-    y PlanLinea activo (primer modelo de cada línea si no hay uno activo)."""
+    y PlanLinea activo (primer modelo de cada línea si no hay uno activo).
+
+    Trabaja por fases con precarga (modelos y líneas en dos consultas), inserción
+    de modelos nuevos en un solo flush y PlanDiaLinea en un insert masivo.
+    Devuelve `tiempos_ms` por fase."""
+    tiempos: dict = {}
+    t_fase = t_total = time.perf_counter()
+
+    def _marcar(fase: str):
+        nonlocal t_fase
+        ahora_pc = time.perf_counter()
+        tiempos[fase] = round((ahora_pc - t_fase) * 1000, 1)
+        t_fase = ahora_pc
+
     guardados = 0
     hoy = datetime.now().strftime("%Y-%m-%d")
     orden_por_linea: dict = {}
     lineas_con_plan_activo: set = set()
     es_noche = (data.turno or '').upper() == 'B'
 
-    # Limpiar PlanDiaLinea de hoy para las líneas del upload antes de insertar
-    lineas_nombres = {f.linea.strip() for f in data.filas if f.linea}
-    for nombre in lineas_nombres:
-        linea_obj = db.query(Linea).filter(Linea.nombre.ilike(nombre)).first()
-        if linea_obj:
-            db.query(PlanDiaLinea).filter(
-                PlanDiaLinea.linea_id == linea_obj.id,
-                PlanDiaLinea.fecha    == hoy,
-            ).delete()
-    db.flush()
+    # ── Fase 1: precarga de modelos y líneas referenciados ──
+    nombres_modelo = {f.modelo.strip() for f in data.filas if f.modelo}
+    modelos: dict = {}
+    if nombres_modelo:
+        for m in db.query(ModeloUPH).filter(ModeloUPH.nombre.in_(nombres_modelo)).order_by(ModeloUPH.id):
+            modelos.setdefault(m.nombre, m)
+    # Línea por nombre sin distinguir mayúsculas (equivalente al ilike anterior)
+    lineas_por_nombre: dict = {}
+    for l in db.query(Linea).order_by(Linea.id):
+        lineas_por_nombre.setdefault(l.nombre.lower(), l)
+    _marcar("precarga")
 
     # Pre-scan: qué líneas tienen piezas para el turno activo
     lineas_con_piezas_turno: set = set()
@@ -2804,6 +3157,9 @@ async def plan_subir(data: PlanSubirIn, db: Session = Depends(get_uph_db)):
         except (ValueError, TypeError):
             pass
 
+    # ── Fase 2: upsert de modelos (los nuevos se insertan en un solo INSERT) ──
+    filas_modelo = []
+    nuevos = []   # ModeloUPH transitorios; se insertan juntos al final de la fase
     for fila in data.filas:
         if not fila.modelo:
             continue
@@ -2821,13 +3177,12 @@ async def plan_subir(data: PlanSubirIn, db: Session = Depends(get_uph_db)):
             if num:
                 uph_field = f"uph_hi{num}"
 
-        # Upsert modelo
-        modelo = db.query(ModeloUPH).filter(
-            ModeloUPH.nombre == fila.modelo.strip()
-        ).first()
+        nombre = fila.modelo.strip()
+        modelo = modelos.get(nombre)
         if not modelo:
-            modelo = ModeloUPH(nombre=fila.modelo.strip())
-            db.add(modelo)
+            modelo = ModeloUPH(nombre=nombre)
+            nuevos.append(modelo)
+            modelos[nombre] = modelo
 
         if fila.modelo_interno:
             modelo.modelo_interno = fila.modelo_interno.strip()
@@ -2836,90 +3191,128 @@ async def plan_subir(data: PlanSubirIn, db: Session = Depends(get_uph_db)):
             if not modelo.uph_total:
                 modelo.uph_total = uph
 
-        db.flush()
-
-        # ── PlanDiaLinea: todos los modelos planificados para el día ──
-        if fila.linea and modelo.id:
-            linea_obj = db.query(Linea).filter(
-                Linea.nombre.ilike(fila.linea.strip())
-            ).first()
-            if linea_obj:
-                def _parse_int(val):
-                    try:    return int(float(val)) if val else None
-                    except: return None
+        filas_modelo.append((fila, modelo))
+        guardados += 1
+    db.flush()   # UPDATE de modelos existentes modificados
+    if nuevos:
+        tabla = ModeloUPH.__table__
+        columnas = [c.name for c in tabla.columns if c.name != "id"]
+        ids = dict(db.execute(
+            insert(tabla).returning(tabla.c.nombre, tabla.c.id),
+            [{c: getattr(m, c) for c in columnas} for m in nuevos],
+        ).all())
+        for m in nuevos:
+            m.id = ids[m.nombre]
+    _marcar("modelos")
+
+    # ── Fase 3: PlanDiaLinea — todos los modelos planificados para el día ──
+    # Limpiar PlanDiaLinea de hoy para las líneas del upload antes de insertar
+    ids_lineas = {
+        lineas_por_nombre[f.linea.strip().lower()].id
+        for f in data.filas
+        if f.linea and f.linea.strip().lower() in lineas_por_nombre
+    }
+    if ids_lineas:
+        db.query(PlanDiaLinea).filter(
+            PlanDiaLinea.linea_id.in_(ids_lineas),
+            PlanDiaLinea.fecha == hoy,
+        ).delete(synchronize_session=False)
+
+    # Planes activos actuales de esas líneas (uno por línea)
+    planes_activos: dict = {}
+    if ids_lineas:
+        for p in db.query(PlanLinea).filter(
+            PlanLinea.linea_id.in_(ids_lineas),
+            PlanLinea.fecha    == hoy,
+            PlanLinea.activo   == True,
+        ).order_by(PlanLinea.id):
+            planes_activos.setdefault(p.linea_id, p)
 
-                piezas       = _parse_int(fila.plan_piezas)
-                piezas_dia   = _parse_int(fila.plan_piezas_dia)
-                piezas_noche = _parse_int(fila.plan_piezas_noche)
+    filas_plan_dia = []
+    for fila, modelo in filas_modelo:
+        if not fila.linea:
+            continue
+        linea_obj = lineas_por_nombre.get(fila.linea.strip().lower())
+        if not linea_obj:
+            continue
 
-                linea_key = linea_obj.id
-                orden = orden_por_linea.get(linea_key, 0)
-                orden_por_linea[linea_key] = orden + 1
+        piezas       = _parse_int(fila.plan_piezas)
+        piezas_dia   = _parse_int(fila.plan_piezas_dia)
+        piezas_noche = _parse_int(fila.plan_piezas_noche)
+
+        linea_key = linea_obj.id
+        orden = orden_por_linea.get(linea_key, 0)
+        orden_por_linea[linea_key] = orden + 1
+
+        filas_plan_dia.append({
+            "linea_id":          linea_obj.id,
+            "modelo_id":         modelo.id,
+            "fecha":             hoy,
+            "plan_piezas":       piezas,
+            "plan_piezas_dia":   piezas_dia,
+            "plan_piezas_noche": piezas_noche,
+            "orden":             orden,
+        })
 
-                db.add(PlanDiaLinea(
+        # ── PlanLinea activo: primer modelo relevante por turno ──
+        # Turno B: primer modelo con piezas_noche > 0
+        #          Si ninguno tiene noche, usar el primero (plan existe, dashboard mostrará NO WORK)
+        # Turno A/C: primer modelo con piezas (orden=0)
+        linea_lower = fila.linea.strip().lower()
+        piezas_turno = piezas_noche if es_noche else piezas_dia
+        es_relevante = bool(piezas_turno and piezas_turno > 0)
+        es_fallback  = linea_lower not in lineas_con_piezas_turno and bool(piezas)
+        activar = (es_relevante or es_fallback) and linea_key not in lineas_con_plan_activo
+
+        if activar:
+            lineas_con_plan_activo.add(linea_key)
+            plan_activo = planes_activos.get(linea_obj.id)
+            if plan_activo:
+                if plan_activo.modelo_id == modelo.id:
+                    plan_activo.plan_total        = piezas
+                    plan_activo.plan_piezas_dia   = piezas_dia
+                    plan_activo.plan_piezas_noche = piezas_noche
+                else:
+                    plan_activo.activo = False
+                    db.add(PlanLinea(
+                        linea_id=linea_obj.id,
+                        modelo_id=modelo.id,
+                        plan_total=piezas,
+                        plan_piezas_dia=piezas_dia,
+                        plan_piezas_noche=piezas_noche,
+                        fecha=hoy,
+                        activo=True,
+                        creado_en=datetime.now(timezone.utc),
+                    ))
+            else:
+                db.add(PlanLinea(
                     linea_id=linea_obj.id,
                     modelo_id=modelo.id,
-                    fecha=hoy,
-                    plan_piezas=piezas,
+                    plan_total=piezas,
                     plan_piezas_dia=piezas_dia,
                     plan_piezas_noche=piezas_noche,
-                    orden=orden,
+                    fecha=hoy,
+                    activo=True,
                 ))
 
-                # ── PlanLinea activo: primer modelo relevante por turno ──
-                # Turno B: primer modelo con piezas_noche > 0
-                #          Si ninguno tiene noche, usar el primero (plan existe, dashboard mostrará NO WORK)
-                # Turno A/C: primer modelo con piezas (orden=0)
-                linea_lower = fila.linea.strip().lower()
-                piezas_turno = piezas_noche if es_noche else piezas_dia
-                es_relevante = bool(piezas_turno and piezas_turno > 0)
-                es_fallback  = linea_lower not in lineas_con_piezas_turno and bool(piezas)
-                activar = (es_relevante or es_fallback) and linea_key not in lineas_con_plan_activo
-
-                if activar:
-                    lineas_con_plan_activo.add(linea_key)
-                    plan_activo = db.query(PlanLinea).filter(
-                        PlanLinea.linea_id == linea_obj.id,
-                        PlanLinea.fecha    == hoy,
-                        PlanLinea.activo   == True,
-                    ).first()
-                    if plan_activo:
-                        if plan_activo.modelo_id == modelo.id:
-                            plan_activo.plan_total        = piezas
-                            plan_activo.plan_piezas_dia   = piezas_dia
-                            plan_activo.plan_piezas_noche = piezas_noche
-                        else:
-                            plan_activo.activo = False
-                            db.add(PlanLinea(
-                                linea_id=linea_obj.id,
-                                modelo_id=modelo.id,
-                                plan_total=piezas,
-                                plan_piezas_dia=piezas_dia,
-                                plan_piezas_noche=piezas_noche,
-                                fecha=hoy,
-                                activo=True,
-                                creado_en=datetime.now(timezone.utc),
-                            ))
-                    else:
-                        db.add(PlanLinea(
-                            linea_id=linea_obj.id,
-                            modelo_id=modelo.id,
-                            plan_total=piezas,
-                            plan_piezas_dia=piezas_dia,
-                            plan_piezas_noche=piezas_noche,
-                            fecha=hoy,
-                            activo=True,
-                        ))
-
-        guardados += 1
+    if filas_plan_dia:
+        db.execute(insert(PlanDiaLinea.__table__), filas_plan_dia)
+    _marcar("plan_dia")
 
     db.commit()
-    await ws_manager.broadcast("refresh")
-    return {"guardados": guardados, "ok": True}
+    _marcar("commit")
+    version_service.bump(PLANES)
+    await ws_manager.broadcast("refresh", {"evento": "plan"})
+    tiempos["total"] = round((time.perf_counter() - t_total) * 1000, 1)
+    return {"guardados": guardados, "ok": True, "tiempos_ms": tiempos}
 
 
 @router.get("/plan-dia/{linea}")
-def get_plan_dia(linea: str, db: Session = Depends(get_uph_db)):
+def get_plan_dia(
+    linea: str,
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(PLANES, ttl=60)),
+):
     """Devuelve todos los modelos planificados para una línea hoy, en orden."""
     hoy = datetime.now().strftime("%Y-%m-%d")
     l = db.query(Linea).filter(Linea.nombre == linea).first()
@@ -2957,7 +3350,11 @@ def get_plan_dia(linea: str, db: Session = Depends(get_uph_db)):
 # DASHBOARD LÍDERES — estado actual por líder + línea asignada
 # ─────────────────────────────────────────────────────────────────────────────
 @router.get("/dashboard/lideres")
-def dashboard_lideres(db: Session = Depends(get_uph_db), db_main: Session = Depends(get_db)):
+def dashboard_lideres(
+    db: Session = Depends(get_uph_db),
+    db_main: Session = Depends(get_db),
+    _etag: None = Depends(conditional_get(EVENTOS, PLANES, LIDERES, ttl=30)),
+):
     ahora_loc = datetime.now()
     ahora_utc = datetime.now(timezone.utc)
     hoy       = ahora_loc.strftime("%Y-%m-%d")
@@ -3000,13 +3397,11 @@ def dashboard_lideres(db: Session = Depends(get_uph_db), db_main: Session = Depe
         if not linea_obj:
             continue
 
-        # Evento nombre para EventoUPH
         num = linea_nombre.replace("HI-", "").replace("L", "")
-        nombre_evento = f"HI-{num}" if not linea_nombre.startswith("HI-") else linea_nombre
 
         # UPH turno de la línea
-        piezas_turno = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea == nombre_evento,
+        piezas_turno = db.query(PIEZAS).filter(
+            EventoUPH.linea_id == linea_obj.id,
             EventoUPH.evento == "GOOD",
             EventoUPH.timestamp >= inicio_turno_utc,
             EventoUPH.timestamp <= ahora_utc,
@@ -3029,8 +3424,8 @@ def dashboard_lideres(db: Session = Depends(get_uph_db), db_main: Session = Depe
         uph_meta = _val if _val else (modelo_obj.uph_total if modelo_obj else 0) if modelo_obj else 0
 
         # Piezas y plan
-        piezas_modelo = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea == nombre_evento,
+        piezas_modelo = db.query(PIEZAS).filter(
+            EventoUPH.linea_id == linea_obj.id,
             EventoUPH.evento == "GOOD",
             EventoUPH.timestamp >= (plan_activo.creado_en if plan_activo else inicio_turno_utc),
             EventoUPH.timestamp <= ahora_utc,
@@ -3061,7 +3456,11 @@ def dashboard_lideres(db: Session = Depends(get_uph_db), db_main: Session = Depe
 # RANKING SEMANAL DE LÍNEAS
 # ─────────────────────────────────────────────────────────────────────────────
 @router.get("/ranking/lineas-semana")
-def ranking_lineas_semana(db: Session = Depends(get_uph_db), db_main: Session = Depends(get_db)):
+def ranking_lineas_semana(
+    db: Session = Depends(get_uph_db),
+    db_main: Session = Depends(get_db),
+    _etag: None = Depends(conditional_get(EVENTOS, LIDERES, ttl=60)),
+):
     ahora_loc = datetime.now()
     ahora_utc = datetime.now(timezone.utc)
     utc_offset = ahora_utc.replace(tzinfo=None) - ahora_loc
@@ -3094,9 +3493,8 @@ def ranking_lineas_semana(db: Session = Depends(get_uph_db), db_main: Session =
     lineas = db.query(Linea).all()
     ranking = []
     for linea in lineas:
-        nombre_ev = linea.nombre
-        piezas = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea  == nombre_ev,
+        piezas = db.query(PIEZAS).filter(
+            EventoUPH.linea_id == linea.id,
             EventoUPH.evento == "GOOD",
             EventoUPH.timestamp >= inicio_semana_utc,
             EventoUPH.timestamp <  corte_utc,
@@ -3163,7 +3561,8 @@ async def subir_foto_lider(
 
     lider.foto_url = f"/uploads/lideres/{filename}"
     db.commit()
-    return {"foto_url": lider.foto_url}
+    version_service.bump(LIDERES)
+    return {"foto_url": fotos_service.registrar("lideres", numero_empleado, dest)}
 
 
 @router.get("/lider/{numero_empleado}")
@@ -3184,16 +3583,9 @@ def get_lider(numero_empleado: str, db: Session = Depends(get_uph_db)):
 
 
 # ══════════════════════════════════════════════════════════════════
-# SELECCIÓN DE PERFIL DE LÍDER — sin DB, archivo JSON de sesiones
+# SELECCIÓN DE PERFIL DE LÍDER — sin DB, sesiones en memoria (lideres_service)
 # ══════════════════════════════════════════════════════════════════
 
-import json
-import threading
-
-_LIDERES_FILE    = Path(__file__).parent.parent.parent / "lider_sessions.json"
-_LINEA_LIDER_FILE= Path(__file__).parent.parent.parent / "linea_lider_map.json"
-_LIDERES_LOCK    = threading.Lock()
-_FOTOS_LIDERES   = Path(__file__).parent.parent.parent / "uploads" / "lideres"
 
 # Lista fija de líderes del listado AMI
 LIDERES_AMI = [
@@ -3219,37 +3611,9 @@ LIDERES_AMI = [
 ]
 
 
-def _read_sessions() -> dict:
-    try:
-        if _LIDERES_FILE.exists():
-            return json.loads(_LIDERES_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        pass
-    return {}
-
-
-def _write_sessions(data: dict):
-    _LIDERES_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-
-
 def _foto_url(num_empleado: str) -> Optional[str]:
-    for ext in [".jpg", ".jpeg", ".png"]:
-        if (_FOTOS_LIDERES / f"{num_empleado}{ext}").exists():
-            return f"/uploads/lideres/{num_empleado}{ext}"
-    return None
-
-
-def _read_linea_lider() -> dict:
-    try:
-        if _LINEA_LIDER_FILE.exists():
-            return json.loads(_LINEA_LIDER_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        pass
-    return {}
-
-
-def _write_linea_lider(data: dict):
-    _LINEA_LIDER_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    """Foto del líder desde el índice de uploads/lideres (URL con ?v=hash)."""
+    return fotos_service.lider(num_empleado)
 
 
 def _turno_inicio_actual() -> datetime:
@@ -3297,24 +3661,22 @@ def vincular_linea(data: VincularLineaIn):
     lider = next((l for l in LIDERES_AMI if l["num_empleado"] == data.num_empleado), None)
     if not lider:
         raise HTTPException(status_code=404, detail="Líder no encontrado")
-    with _LIDERES_LOCK:
-        mapa = _read_linea_lider()
-        mapa[data.linea] = {
-            "num_empleado": data.num_empleado,
-            "nombre":       lider["nombre"],
-            "foto_url":     _foto_url(data.num_empleado),
-            "turno_inicio": _turno_inicio_actual().isoformat(),
-        }
-        _write_linea_lider(mapa)
+    info = {
+        "num_empleado": data.num_empleado,
+        "nombre":       lider["nombre"],
+        "foto_url":     _foto_url(data.num_empleado),
+        "turno_inicio": _turno_inicio_actual().isoformat(),
+    }
+    lideres_service.linea_lider.actualizar(lambda mapa: mapa.__setitem__(data.linea, info))
+    version_service.bump(LIDERES)
     return {"ok": True}
 
 
 @router.get("/lideres/lineas")
-def get_lideres_lineas():
+def get_lideres_lineas(_etag: None = Depends(conditional_get(LIDERES, ttl=60))):
     """Devuelve líderes del turno activo — filtra entradas de turnos anteriores."""
     turno_ini = _turno_inicio_actual().isoformat()
-    with _LIDERES_LOCK:
-        mapa = _read_linea_lider()
+    mapa = lideres_service.linea_lider.snapshot()
     filtrado = {
         linea: lid for linea, lid in mapa.items()
         if (lid.get("turno_inicio") or "") >= turno_ini
@@ -3330,8 +3692,7 @@ class LiderClaimIn(BaseModel):
 @router.get("/lideres/lista")
 def lista_lideres():
     """Lista de líderes AMI con estado de disponibilidad. Sin auth."""
-    with _LIDERES_LOCK:
-        sessions = _read_sessions()
+    sessions = lideres_service.sesiones.snapshot()
     resultado = []
     for l in LIDERES_AMI:
         session_actual = sessions.get(l["num_empleado"])
@@ -3347,15 +3708,17 @@ def lista_lideres():
 @router.post("/lideres/claim")
 def claim_lider(data: LiderClaimIn):
     """Reclamar un perfil de líder para una sesión. Sin auth."""
-    with _LIDERES_LOCK:
-        sessions = _read_sessions()
+    def _reclamar(sessions: dict):
         actual = sessions.get(data.num_empleado)
         if actual and actual != data.session_id:
             raise HTTPException(status_code=409, detail="Perfil ya en uso por otro dispositivo")
         # Liberar cualquier perfil anterior de esta sesión
-        sessions = {k: v for k, v in sessions.items() if v != data.session_id}
+        for k in [k for k, v in sessions.items() if v == data.session_id]:
+            del sessions[k]
         sessions[data.num_empleado] = data.session_id
-        _write_sessions(sessions)
+
+    lideres_service.sesiones.actualizar(_reclamar)
+    version_service.bump(LIDERES)
     lider = next((l for l in LIDERES_AMI if l["num_empleado"] == data.num_empleado), None)
     if not lider:
         raise HTTPException(status_code=404, detail="Líder no encontrado")
@@ -3365,19 +3728,20 @@ def claim_lider(data: LiderClaimIn):
 @router.delete("/lideres/claim/{num_empleado}")
 def release_lider(num_empleado: str, session_id: str):
     """Liberar perfil de líder. Sin auth."""
-    with _LIDERES_LOCK:
-        sessions = _read_sessions()
+    def _liberar(sessions: dict):
         if sessions.get(num_empleado) == session_id:
             del sessions[num_empleado]
-            _write_sessions(sessions)
+
+    if lideres_service.sesiones.snapshot().get(num_empleado) == session_id:
+        lideres_service.sesiones.actualizar(_liberar)
+        version_service.bump(LIDERES)
     return {"ok": True}
 
 
 @router.get("/lideres/sesion/{session_id}")
 def get_sesion_lider(session_id: str):
     """Obtener el líder reclamado por esta sesión. Sin auth."""
-    with _LIDERES_LOCK:
-        sessions = _read_sessions()
+    sessions = lideres_service.sesiones.snapshot()
     num = next((k for k, v in sessions.items() if v == session_id), None)
     if not num:
         return {"lider": None}
@@ -3388,7 +3752,10 @@ def get_sesion_lider(session_id: str):
 
 
 @router.get("/ranking/lideres-semana")
-def get_ranking_lideres_semana(db: Session = Depends(get_uph_db)):
+def get_ranking_lideres_semana(
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(EVENTOS, LIDERES, ttl=60)),
+):
     """Ranking semanal de líderes por UPH promedio de su línea (Lun 06:30 → Dom 18:30)."""
     ahora      = datetime.now(timezone.utc)
     ahora_loc  = datetime.now()
@@ -3413,8 +3780,7 @@ def get_ranking_lideres_semana(db: Session = Depends(get_uph_db)):
     corte_utc         = (corte_loc + utc_offset).replace(tzinfo=timezone.utc)
     horas_semana      = round((corte_utc - semana_inicio_utc).total_seconds() / 3600, 1)
 
-    with _LIDERES_LOCK:
-        mapa = _read_linea_lider()
+    mapa = lideres_service.linea_lider.snapshot()
 
     # Por cada líder calcular UPH de su línea en la semana
     lideres_data: dict = {}
@@ -3422,9 +3788,8 @@ def get_ranking_lideres_semana(db: Session = Depends(get_uph_db)):
         num_emp = lid_info.get("num_empleado")
         if not num_emp:
             continue
-        ev_linea = _linea_evento(linea_nombre)
-        cnt = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea     == ev_linea,
+        cnt = db.query(PIEZAS).filter(
+            _ev_linea(linea_nombre),
             EventoUPH.evento    == "GOOD",
             EventoUPH.timestamp >= semana_inicio_utc,
             EventoUPH.timestamp <= corte_utc,
@@ -3467,7 +3832,10 @@ def get_ranking_lideres_semana(db: Session = Depends(get_uph_db)):
 
 
 @router.get("/ranking-semanal")
-def get_ranking_semanal(db: Session = Depends(get_uph_db)):
+def get_ranking_semanal(
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(EVENTOS, ASIGNACIONES, ttl=60)),
+):
     """Ranking de operadores de la semana (Lun 06:30 → Dom 18:30)."""
     ahora      = datetime.now(timezone.utc)
     ahora_loc  = datetime.now()
@@ -3514,8 +3882,9 @@ def get_ranking_semanal(db: Session = Depends(get_uph_db)):
     ops_total: dict = {}  # num_empleado -> total eventos
     ops_turno: dict = {}  # num_empleado -> turno_id
 
+    validas:  list = []   # (asig, horas_asig)
+    ventanas: list = []
     for asig, linea_obj in asig_rows:
-        ev_linea  = _linea_evento(linea_obj.nombre)
         fecha_dt  = datetime.strptime(asig.fecha, "%Y-%m-%d")
 
         # Ventana del turno en hora local
@@ -3533,15 +3902,16 @@ def get_ranking_semanal(db: Session = Depends(get_uph_db)):
             continue
 
         horas_asig = (t_fin_utc - t_ini_utc).total_seconds() / 3600
-
-        cnt = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea     == ev_linea,
-            EventoUPH.estacion  == asig.estacion,
-            EventoUPH.evento    == "GOOD",
+        validas.append((asig, horas_asig))
+        ventanas.append([
+            EventoUPH.linea_id  == linea_obj.id,
+            _ev_estacion(asig.estacion),
             EventoUPH.timestamp >= t_ini_utc,
             EventoUPH.timestamp <= t_fin_utc,
-        ).scalar() or 0
+        ])
 
+    conteos = _piezas_por_ventana(db, ventanas, semana_inicio_utc, corte_utc)
+    for (asig, horas_asig), cnt in zip(validas, conteos):
         emp = asig.num_empleado
         uph_asig = round(cnt / horas_asig, 2) if horas_asig > 0 else 0
 
@@ -3549,6 +3919,11 @@ def get_ranking_semanal(db: Session = Depends(get_uph_db)):
         ops_total[emp] = ops_total.get(emp, 0) + cnt
         ops_turno.setdefault(emp, asig.turno_id)
 
+    operadores = {
+        o.num_empleado: o
+        for o in db.query(Operador).filter(Operador.num_empleado.in_(list(ops_uphs)))
+    } if ops_uphs else {}
+
     # Construir ranking: UPH promedio = media de UPH por cada asignación
     ranking = []
     for emp, uphs in ops_uphs.items():
@@ -3556,12 +3931,12 @@ def get_ranking_semanal(db: Session = Depends(get_uph_db)):
             continue
         uph_promedio = round(sum(uphs) / len(uphs), 1)
         total        = ops_total[emp]
-        op           = db.query(Operador).filter(Operador.num_empleado == emp).first()
+        op           = operadores.get(emp)
         turno_letra  = {1: "A", 2: "B", 3: "C"}.get(ops_turno.get(emp), "—")
         ranking.append({
             "num_empleado":  emp,
             "nombre":        op.nombre   if op else emp,
-            "foto_url":      op.foto_url if op else None,
+            "foto_url":      _foto_operador(op),
             "turno":         turno_letra,
             "total_eventos": total,
             "uph_promedio":  uph_promedio,
@@ -3579,7 +3954,10 @@ def get_ranking_semanal(db: Session = Depends(get_uph_db)):
 
 
 @router.get("/monitor/lineas")
-def get_monitor_lineas(db: Session = Depends(get_uph_db)):
+def get_monitor_lineas(
+    db: Session = Depends(get_uph_db),
+    _etag: None = Depends(conditional_get(EVENTOS, LIDERES, ttl=60)),
+):
     """Monitor admin: 6 líneas con eventos del turno activo y desglose por estación."""
     ahora     = datetime.now(timezone.utc)
     ahora_loc = datetime.now()
@@ -3614,30 +3992,29 @@ def get_monitor_lineas(db: Session = Depends(get_uph_db)):
 
     horas_elapsed = max((ahora - inicio_utc).total_seconds() / 3600, 0.01)
 
-    with _LIDERES_LOCK:
-        lideres_mapa = _read_linea_lider()
+    lideres_mapa = lideres_service.linea_lider.snapshot()
 
     LINEAS = [("HI-1","L1"),("HI-2","L2"),("HI-3","L3"),
               ("HI-4","L4"),("HI-5","L5"),("HI-6","L6")]
 
     resultado = []
     for nombre_bd, nombre_ev in LINEAS:
-        total = db.query(func.count(EventoUPH.id)).filter(
-            EventoUPH.linea     == nombre_ev,
+        total = db.query(PIEZAS).filter(
+            _ev_linea(nombre_ev),
             EventoUPH.evento    == "GOOD",
             EventoUPH.timestamp >= inicio_utc,
             EventoUPH.timestamp <= ahora,
         ).scalar() or 0
 
         est_rows = db.query(
-            EventoUPH.estacion,
-            func.count(EventoUPH.id).label("cnt"),
+            EventoUPH.estacion_num,
+            PIEZAS.label("cnt"),
         ).filter(
-            EventoUPH.linea     == nombre_ev,
+            _ev_linea(nombre_ev),
             EventoUPH.evento    == "GOOD",
             EventoUPH.timestamp >= inicio_utc,
             EventoUPH.timestamp <= ahora,
-        ).group_by(EventoUPH.estacion).order_by(EventoUPH.estacion).all()
+        ).group_by(EventoUPH.estacion_num).order_by(EventoUPH.estacion_num).all()
 
         lider_info = lideres_mapa.get(nombre_bd) or {}
         uph_actual  = round(total / horas_elapsed, 1)
@@ -3650,7 +4027,7 @@ def get_monitor_lineas(db: Session = Depends(get_uph_db)):
             "lider_nombre":   lider_info.get("nombre"),
             "lider_foto":     lider_info.get("foto_url"),
             "lider_emp":      lider_info.get("num_empleado"),
-            "estaciones":     [{"estacion": r.estacion, "total": r.cnt} for r in est_rows],
+            "estaciones":     [{"estacion": str(r.estacion_num), "total": r.cnt} for r in est_rows],
         })
 
     return {
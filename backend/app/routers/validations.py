@@ -13,6 +13,7 @@ from ..services.pdf_service import generate_validation_pdf, generate_turn_report
 from ..utils.logger import api_logger, db_logger
 from ..utils.logger import get_logger
 from ..services.cache_service import cache_service
+from ..services.version_service import version_service, conditional_get, JIGS, VALIDACIONES
 
 logger = get_logger(__name__)
 
@@ -158,6 +159,7 @@ async def create_validation(
             # Log error but don't fail the validation
             print(f"Error generando PDF: {e}")
     
+    version_service.bump(VALIDACIONES, JIGS)
     return ValidacionSchema.model_validate(db_validation)
 
 @router.get("/", response_model=PaginatedResponse[ValidacionSchema])
@@ -168,7 +170,8 @@ async def get_validations(
     turno: str = None,
     tecnico_asignado_id: int = None,
     db: Session = Depends(get_db),
-    current_user: Tecnico = Depends(get_current_user)
+    current_user: Tecnico = Depends(get_current_user),
+    _etag: None = Depends(conditional_get(VALIDACIONES, JIGS))
 ):
     """
     Obtener validaciones con filtros opcionales y paginación
@@ -290,6 +293,7 @@ async def asignar_validacion(
     validacion.tecnico_asignado_id = tecnico.id
     db.commit()
     db.refresh(validacion)
+    version_service.bump(VALIDACIONES)
     
     return {
         "message": f"Validación asignada correctamente al técnico {tecnico.nombre}",
@@ -325,6 +329,7 @@ async def marcar_completada(
     validacion.completada = True
     db.commit()
     db.refresh(validacion)
+    version_service.bump(VALIDACIONES)
     
     return {
         "message": "Validación marcada como completada",
@@ -356,6 +361,7 @@ async def delete_validation(
     # Eliminar la validación
     db.delete(validacion)
     db.commit()
+    version_service.bump(VALIDACIONES)
     
     return {
         "message": "Validación eliminada correctamente",
@@ -381,6 +387,7 @@ async def sync_pending_validations(
             print(f"Error sincronizando validación {validation.id}: {e}")
     
     db.commit()
+    version_service.bump(VALIDACIONES)
     
     return {
         "message": f"Se sincronizaron {synced_count} validaciones",
@@ -552,6 +559,7 @@ async def generate_batch_validation_report(
 
         # Guardar todos los cambios en la base de datos
         db.commit()
+        version_service.bump(JIGS)
         print(f"✅ Actualizaciones de última validación guardadas en la BD")
 
         # Generar PDF del reporte por lotes
@@ -0,0 +1,186 @@
+"""
+Servicio de descansos por línea
+- Descansos fijos precompilados en tablas por minuto de la semana (lookup O(1))
+- Descansos manuales en memoria, actualizados por los endpoints /descanso/{linea}
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from ..models.uph_models import DescansoLinea
+from .version_service import version_service, DESCANSOS
+
+MINUTOS_DIA = 24 * 60
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+
+# Sin Redis la versión DESCANSOS es local al proceso: otro proceso (run_uph.py)
+# no ve los bumps, así que los descansos manuales se releen de la BD con este TTL
+RECARGA_SIN_REDIS_SEG = 5
+
+# ─────────────────────────────────────────────
+# Horarios de descanso fijos por turno
+# ─────────────────────────────────────────────
+# Cada entrada: (HH:MM inicio, HH:MM fin)
+# Turno B: el segundo descanso cruza medianoche (02:30-03:00)
+# Turno C viernes: igual que Turno A
+# Turno C sáb/dom: solo un descanso
+
+DESCANSOS_TURNO = {
+    1: [("09:30", "10:00"), ("14:00", "14:30")],          # Turno A
+    2: [("21:10", "21:40"), ("02:30", "03:00")],          # Turno B
+    "C_finde": [("09:00", "09:30")],                      # Turno C sáb/dom
+    "C_viernes": [("09:30", "10:00"), ("14:00", "14:30")],# Turno C viernes (= A)
+}
+
+
+def minutos(hhmm: str) -> int:
+    """'09:30' → 570 minutos desde medianoche."""
+    h, m = map(int, hhmm.split(":"))
+    return h * 60 + m
+
+
+def minuto_semana(dt: datetime) -> int:
+    """Minuto de la semana (0 = lunes 00:00) de una hora local."""
+    return dt.weekday() * MINUTOS_DIA + dt.hour * 60 + dt.minute
+
+
+def turno_id_actual(ahora: Optional[datetime] = None) -> int:
+    """Turno en curso para una hora local (A=1 / B=2 / C=3; turnos de 06:30 y 18:30)."""
+    ahora = ahora or datetime.now()
+    mins = ahora.hour * 60 + ahora.minute
+    wd   = ahora.weekday()
+    T_INI, T_FIN = 6 * 60 + 30, 18 * 60 + 30
+    if wd in (0, 1, 2, 3):
+        return 1 if T_INI <= mins < T_FIN else 2
+    return 3 if T_INI <= mins < T_FIN else 2
+
+
+def _clave_horario(turno_id, weekday: int):
+    if turno_id == 3:
+        return "C_viernes" if weekday == 4 else "C_finde"
+    return turno_id
+
+
+def _compilar_tabla(turno_id) -> bytearray:
+    """Marca con 1 cada minuto de la semana que cae en un descanso fijo del turno."""
+    tabla = bytearray(MINUTOS_SEMANA)
+    for wd in range(7):
+        base = wd * MINUTOS_DIA
+        for ini_str, fin_str in DESCANSOS_TURNO.get(_clave_horario(turno_id, wd), []):
+            ini_min, fin_min = minutos(ini_str), minutos(fin_str)
+            if ini_min <= fin_min:
+                rangos = [(ini_min, fin_min)]
+            else:
+                # Cruza medianoche: [ini, 24:00) ∪ [00:00, fin) del mismo día
+                rangos = [(ini_min, MINUTOS_DIA), (0, fin_min)]
+            for a, b in rangos:
+                tabla[base + a:base + b] = b"\x01" * (b - a)
+    return tabla
+
+
+def _acumulado(tabla: bytearray) -> list:
+    """Suma prefija: acumulado[i] = minutos de descanso en [0, i)."""
+    acc = [0] * (len(tabla) + 1)
+    total = 0
+    for i, v in enumerate(tabla):
+        total += v
+        acc[i + 1] = total
+    return acc
+
+
+class DescansoService:
+    """Resuelve si una línea está en descanso sin consultar la BD.
+
+    El estado manual se carga de la BD una vez y luego lo mantienen los endpoints
+    de inicio/fin. Si la versión del dominio DESCANSOS cambia por otro proceso
+    (Redis compartido), el estado se recarga en la siguiente consulta. Sin Redis
+    la versión no se comparte y el estado se relee cada RECARGA_SIN_REDIS_SEG.
+    """
+
+    def __init__(self):
+        self._tablas = {t: _compilar_tabla(t) for t in (1, 2, 3)}
+        self._acumulados = {t: _acumulado(tabla) for t, tabla in self._tablas.items()}
+        self._lock = threading.Lock()
+        self._manuales: dict = {}          # linea_id → inicio (datetime UTC)
+        self._version: Optional[int] = None
+        self._cargado_en = 0.0             # time.monotonic() de la última lectura de BD
+
+    # ── Descansos fijos ──────────────────────────────────────────
+
+    def en_descanso_fijo(self, turno_id: int, ahora: Optional[datetime] = None) -> bool:
+        """True si la hora local (`ahora` o la actual) cae en un descanso fijo del turno."""
+        tabla = self._tablas.get(turno_id)
+        if tabla is None:
+            return False
+        return bool(tabla[minuto_semana(ahora or datetime.now())])
+
+    def minutos_descanso(self, turno_id: int, desde: datetime, hasta: datetime) -> int:
+        """Minutos de descanso fijo entre dos horas locales (para horas efectivas)."""
+        acc = self._acumulados.get(turno_id)
+        if acc is None or hasta <= desde:
+            return 0
+        total_minutos = int((hasta - desde).total_seconds() // 60)
+        semanas, resto = divmod(total_minutos, MINUTOS_SEMANA)
+        ini = minuto_semana(desde)
+        fin = ini + resto
+        if fin <= MINUTOS_SEMANA:
+            parcial = acc[fin] - acc[ini]
+        else:
+            parcial = (acc[MINUTOS_SEMANA] - acc[ini]) + acc[fin - MINUTOS_SEMANA]
+        return semanas * acc[MINUTOS_SEMANA] + parcial
+
+    # ── Descansos manuales ───────────────────────────────────────
+
+    def _sincronizar(self, db) -> None:
+        version = version_service.get(DESCANSOS)
+        if self._version == version and (
+            version_service.compartido
+            or time.monotonic() - self._cargado_en < RECARGA_SIN_REDIS_SEG
+        ):
+            return
+        activos = db.query(DescansoLinea.linea_id, DescansoLinea.inicio).filter(
+            DescansoLinea.activo == True,
+            DescansoLinea.fin    == None,
+        ).all()
+        with self._lock:
+            self._manuales = {linea_id: inicio for linea_id, inicio in activos}
+            self._version = version
+            self._cargado_en = time.monotonic()
+
+    def manual_activo(self, db, linea_id: int) -> Optional[datetime]:
+        """Inicio del descanso manual abierto de la línea, o None."""
+        self._sincronizar(db)
+        return self._manuales.get(linea_id)
+
+    def iniciar(self, linea_id: int, inicio: datetime) -> None:
+        """Registrar un descanso manual (llamar después del commit y del bump)."""
+        with self._lock:
+            self._manuales[linea_id] = inicio
+            if self._version is not None:
+                self._version = version_service.get(DESCANSOS)
+
+    def terminar(self, linea_id: int) -> None:
+        """Cerrar el descanso manual de la línea (llamar después del commit y del bump)."""
+        with self._lock:
+            self._manuales.pop(linea_id, None)
+            if self._version is not None:
+                self._version = version_service.get(DESCANSOS)
+
+    def en_descanso(self, db, linea_id: int, turno_id: int) -> bool:
+        """Combina descanso manual + horario fijo."""
+        return self.manual_activo(db, linea_id) is not None or self.en_descanso_fijo(turno_id)
+
+    def estado(self, db, linea_id: int, turno_id: int) -> dict:
+        """Estado de descanso de la línea (manual + fijo) para los endpoints."""
+        inicio_manual = self.manual_activo(db, linea_id)
+        en_descanso = inicio_manual is not None or self.en_descanso_fijo(turno_id)
+        return {
+            "en_descanso": en_descanso,
+            "tipo":        "manual" if inicio_manual else ("fijo" if en_descanso else None),
+            "inicio":      inicio_manual.isoformat() if inicio_manual else None,
+        }
+
+
+# Instancia global del servicio de descansos
+descanso_service = DescansoService()
@@ -0,0 +1,124 @@
+"""
+Ingesta de eventos UPH por lotes
+Los clientes OCR guardan cada pieza en un outbox local y la envían en lotes con
+reintentos. Cada evento trae un `uid` y la hora de captura: si el ACK de un
+lote se pierde y el cliente lo reenvía, los eventos ya guardados se reconocen
+por (línea, estación, timestamp, contador) y se contestan como duplicados sin
+insertar. El contador distingue el AUTO-30 del "1" capturados en el mismo frame.
+
+Un evento puede traer `cantidad` > 1 (piezas vistas en un mismo frame: relleno
+de lecturas perdidas, AUTO-30 + 1) con el rango `contador_desde`..`contador`;
+la clave de duplicado usa el último contador del rango.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+
+from ..models.uph_models import EventoUPH
+from .lineas_service import lineas_service, estacion_num
+
+# Reloj del cliente adelantado más de esto → usar la hora del servidor
+MAX_ADELANTO = timedelta(minutes=2)
+
+# Piezas máximas en un registro (columna SMALLINT)
+MAX_CANTIDAD = 1000
+
+
+def ts_cliente(valor: Optional[str], ahora: datetime) -> datetime:
+    """Hora de captura del cliente en UTC. ISO con offset o naive (hora local de
+    la planta); inválida, ausente o en el futuro → hora del servidor."""
+    if not valor:
+        return ahora
+    try:
+        ts = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    except ValueError:
+        return ahora
+    ts = (ts if ts.tzinfo else ts.astimezone()).astimezone(timezone.utc)
+    return ahora if ts > ahora + MAX_ADELANTO else ts
+
+
+def _utc(ts: datetime) -> datetime:
+    # SQLite devuelve datetimes naive (UTC)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+class EventosService:
+    """Registro idempotente de lotes de eventos GOOD."""
+
+    def registrar_lote(self, db, eventos: list) -> dict:
+        """Guardar un lote en una sola transacción.
+
+        `eventos`: objetos con uid, linea, estacion, evento, contador, timestamp,
+        cantidad y contador_desde.
+        Devuelve uids aceptados / duplicados / rechazados (uid → motivo), las
+        filas insertadas con su evento de entrada y, por línea, el último
+        evento aceptado (para notificar a los dashboards).
+        """
+        ahora = datetime.now(timezone.utc)
+        rechazados: dict = {}
+        candidatos = []   # (uid, fila, evento)
+        for e in eventos:
+            if e.evento != "GOOD":
+                rechazados[e.uid] = "solo se registran GOOD"
+                continue
+            est_num = estacion_num(e.estacion)
+            linea_id = lineas_service.resolver(db, e.linea) if est_num is not None else None
+            if linea_id is None or est_num is None:
+                rechazados[e.uid] = "línea o estación no reconocida"
+                continue
+            fila = {
+                "linea_id": linea_id,
+                "estacion_num": est_num,
+                "evento": "GOOD",
+                "contador": e.contador,
+                "timestamp": ts_cliente(e.timestamp, ahora),
+                "cantidad": e.cantidad,
+                "contador_desde": e.contador_desde,
+            }
+            candidatos.append((e.uid, fila, e))
+
+        vistos = self._existentes(db, [f for _, f, _ in candidatos])
+        duplicados, nuevos, ultimos = [], [], {}
+        for uid, fila, e in candidatos:
+            clave = (fila["linea_id"], fila["estacion_num"], fila["timestamp"], fila["contador"])
+            if clave in vistos:
+                duplicados.append(uid)
+                continue
+            vistos.add(clave)
+            nuevos.append((fila, e))
+            previo = ultimos.get(fila["linea_id"])
+            if previo is None or fila["timestamp"] >= previo[0]["timestamp"]:
+                ultimos[fila["linea_id"]] = (fila, e)
+
+        if nuevos:
+            db.execute(insert(EventoUPH.__table__), [f for f, _ in nuevos])
+        db.commit()
+        return {
+            "aceptados": [e.uid for _, e in nuevos],
+            "nuevos": nuevos,
+            "duplicados": duplicados,
+            "rechazados": rechazados,
+            "ultimos": ultimos,
+        }
+
+    @staticmethod
+    def _existentes(db, filas: list) -> set:
+        """Claves (linea_id, estacion_num, timestamp, contador) del lote que ya están en la BD."""
+        if not filas:
+            return set()
+        lineas = {f["linea_id"] for f in filas}
+        desde = min(f["timestamp"] for f in filas)
+        hasta = max(f["timestamp"] for f in filas)
+        existentes = db.query(
+            EventoUPH.linea_id, EventoUPH.estacion_num, EventoUPH.timestamp, EventoUPH.contador,
+        ).filter(
+            EventoUPH.linea_id.in_(lineas),
+            EventoUPH.timestamp >= desde,
+            EventoUPH.timestamp <= hasta,
+        ).all()
+        return {(l, e, _utc(t), c) for l, e, t, c in existentes}
+
+
+# Instancia global del servicio de eventos
+eventos_service = EventosService()
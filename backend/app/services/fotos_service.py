@@ -0,0 +1,121 @@
+"""
+Índice de fotos de líderes y operadores
+Resuelve número de empleado → URL con hash de contenido (cache-busting) sin
+hacer stat() por request. El índice se construye al arrancar, se actualiza al
+subir una foto y se reconstruye si cambia el mtime del directorio.
+"""
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path(__file__).parent.parent.parent / "uploads"
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+# Cada cuánto se revisa el mtime de los directorios (segundos)
+REVISAR_MTIME_SEG = 30
+# Prefijos de archivo aceptados por tipo ("lider_518.jpg" lo genera subir_foto_lider)
+PREFIJOS = {
+    "lideres":    ("", "lider_"),
+    "operadores": ("", "operador_"),
+}
+
+
+def _hash_archivo(ruta: Path) -> str:
+    return hashlib.sha1(ruta.read_bytes()).hexdigest()[:10]
+
+
+class FotosService:
+    """Índice en memoria {tipo: {num_empleado: (url, hash)}}."""
+
+    def __init__(self, base_dir: Path = UPLOADS_DIR):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._indice: dict = {}
+        self._mtimes: dict = {}
+        self._revisado = 0.0
+
+    def _num_empleado(self, tipo: str, stem: str) -> Optional[str]:
+        for prefijo in sorted(PREFIJOS[tipo], key=len, reverse=True):
+            if prefijo and stem.startswith(prefijo):
+                return stem[len(prefijo):]
+        return stem if "" in PREFIJOS[tipo] else None
+
+    def _indexar_tipo(self, tipo: str) -> dict:
+        directorio = self.base_dir / tipo
+        encontrados: dict = {}   # num → (mtime, ruta)
+        if directorio.is_dir():
+            for ruta in directorio.iterdir():
+                if ruta.suffix.lower() not in EXTENSIONES or not ruta.is_file():
+                    continue
+                num = self._num_empleado(tipo, ruta.stem)
+                if not num:
+                    continue
+                mtime = ruta.stat().st_mtime
+                # Si hay varias fotos del mismo empleado, gana la más reciente
+                if num not in encontrados or mtime > encontrados[num][0]:
+                    encontrados[num] = (mtime, ruta)
+        indice = {}
+        for num, (_, ruta) in encontrados.items():
+            try:
+                indice[num] = (f"/uploads/{tipo}/{ruta.name}", _hash_archivo(ruta))
+            except OSError as e:
+                logger.warning(f"No se pudo leer la foto {ruta}: {e}")
+        return indice
+
+    def _mtime_dir(self, tipo: str) -> Optional[float]:
+        try:
+            return (self.base_dir / tipo).stat().st_mtime
+        except OSError:
+            return None
+
+    def reconstruir(self) -> None:
+        """Reindexar todos los directorios de fotos."""
+        for tipo in PREFIJOS:
+            indice = self._indexar_tipo(tipo)
+            with self._lock:
+                self._indice[tipo] = indice
+                self._mtimes[tipo] = self._mtime_dir(tipo)
+        self._revisado = time.monotonic()
+
+    def _revisar(self) -> None:
+        """Reindexar los tipos cuyo directorio cambió (como mucho cada REVISAR_MTIME_SEG)."""
+        if self._indice and time.monotonic() - self._revisado < REVISAR_MTIME_SEG:
+            return
+        self._revisado = time.monotonic()
+        for tipo in PREFIJOS:
+            mtime = self._mtime_dir(tipo)
+            if tipo not in self._indice or mtime != self._mtimes.get(tipo):
+                indice = self._indexar_tipo(tipo)
+                with self._lock:
+                    self._indice[tipo] = indice
+                    self._mtimes[tipo] = mtime
+
+    def registrar(self, tipo: str, num_empleado: str, ruta: Path) -> str:
+        """Actualizar el índice tras subir una foto. Devuelve la URL versionada."""
+        entrada = (f"/uploads/{tipo}/{ruta.name}", _hash_archivo(ruta))
+        with self._lock:
+            self._indice.setdefault(tipo, {})[num_empleado] = entrada
+            self._mtimes[tipo] = self._mtime_dir(tipo)
+        return f"{entrada[0]}?v={entrada[1]}"
+
+    def url(self, tipo: str, num_empleado: str) -> Optional[str]:
+        """URL de la foto con `?v=<hash>` para cache-busting, o None."""
+        self._revisar()
+        entrada = self._indice.get(tipo, {}).get(str(num_empleado))
+        if not entrada:
+            return None
+        return f"{entrada[0]}?v={entrada[1]}"
+
+    def lider(self, num_empleado: str) -> Optional[str]:
+        return self.url("lideres", num_empleado)
+
+    def operador(self, num_empleado: str) -> Optional[str]:
+        return self.url("operadores", num_empleado)
+
+
+# Instancia global del índice de fotos
+fotos_service = FotosService()
@@ -0,0 +1,139 @@
+"""
+Almacén en memoria de sesiones de líderes y mapa línea → líder
+Reemplaza la lectura de los JSON en cada request: las lecturas son lookups
+sobre un dict inmutable y las escrituras se persisten a disco con
+escritura atómica (tmp + rename) agrupadas en una ventana corta.
+"""
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from .cache_service import cache_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ventana para agrupar escrituras a disco (segundos)
+PERSISTIR_DEBOUNCE_SEG = 0.5
+
+
+class MapaPersistente:
+    """Dict respaldado por un archivo JSON y, si hay Redis, compartido entre workers.
+
+    - Lectura: `snapshot()` devuelve el dict actual sin tomar lock. Nunca se muta
+      en sitio; cada escritura publica una copia nueva (copy-on-write).
+    - Escritura: `actualizar(fn)` aplica `fn` sobre una copia bajo lock, publica
+      la copia y programa la persistencia. Si `fn` lanza, no se publica nada.
+    - Con Redis el contenido se replica en `lideres:<nombre>` y una versión en
+      `lideres:<nombre>:v`; otros workers recargan cuando la versión cambia.
+    """
+
+    def __init__(self, nombre: str, archivo: Path):
+        self.nombre = nombre
+        self.archivo = archivo
+        self._data: Optional[dict] = None
+        self._version_redis: Optional[str] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def _clave_redis(self) -> str:
+        return f"lideres:{self.nombre}"
+
+    def _leer_archivo(self) -> dict:
+        try:
+            if self.archivo.exists():
+                return json.loads(self.archivo.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"No se pudo leer {self.archivo.name}: {e}")
+        return {}
+
+    def _sincronizar_redis(self) -> None:
+        """Recargar desde Redis si otro worker publicó una versión nueva."""
+        try:
+            version = cache_service.redis_client.get(f"{self._clave_redis}:v")
+            if version is None or version == self._version_redis:
+                return
+            crudo = cache_service.redis_client.get(self._clave_redis)
+            if crudo is not None:
+                self._data = json.loads(crudo)
+            self._version_redis = version
+        except Exception as e:
+            logger.error(f"Error sincronizando '{self.nombre}' desde Redis: {e}")
+
+    def snapshot(self) -> dict:
+        """Contenido actual (no mutar)."""
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._leer_archivo()
+        if cache_service.enabled:
+            self._sincronizar_redis()
+        return self._data
+
+    def actualizar(self, fn: Callable[[dict], None]) -> dict:
+        """Aplicar `fn` a una copia del mapa y publicarla. Devuelve la copia publicada."""
+        with self._lock:
+            if self._data is None:
+                self._data = self._leer_archivo()
+            if cache_service.enabled:
+                self._sincronizar_redis()
+            nuevo = dict(self._data)
+            fn(nuevo)
+            self._data = nuevo
+            if cache_service.enabled:
+                try:
+                    cache_service.redis_client.set(self._clave_redis, json.dumps(nuevo, ensure_ascii=False))
+                    self._version_redis = str(cache_service.redis_client.incr(f"{self._clave_redis}:v"))
+                except Exception as e:
+                    logger.error(f"Error publicando '{self.nombre}' en Redis: {e}")
+            self._programar_persistencia()
+        return nuevo
+
+    def _programar_persistencia(self) -> None:
+        if self._timer is not None:
+            return   # ya hay una escritura pendiente; tomará el estado más reciente
+        self._timer = threading.Timer(PERSISTIR_DEBOUNCE_SEG, self.persistir)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def persistir(self) -> None:
+        """Escribir el estado actual a disco de forma atómica (tmp + rename)."""
+        with self._lock:
+            self._timer = None
+            data = self._data
+        if data is None:
+            return
+        tmp = self.archivo.with_suffix(self.archivo.suffix + ".tmp")
+        try:
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.archivo)
+        except Exception as e:
+            logger.error(f"Error guardando {self.archivo.name}: {e}")
+
+    def flush(self) -> None:
+        """Persistir ya si hay una escritura pendiente (apagado del proceso)."""
+        timer = self._timer
+        if timer is not None:
+            timer.cancel()
+            self.persistir()
+
+
+class LideresService:
+    """Sesiones de perfil de líder (num_empleado → session_id) y líder activo por línea."""
+
+    def __init__(self, base_dir: Path):
+        self.sesiones = MapaPersistente("sesiones", base_dir / "lider_sessions.json")
+        self.linea_lider = MapaPersistente("linea_lider", base_dir / "linea_lider_map.json")
+        atexit.register(self.flush)
+
+    def flush(self) -> None:
+        self.sesiones.flush()
+        self.linea_lider.flush()
+
+
+# Instancia global del servicio de líderes (archivos en backend/)
+lideres_service = LideresService(Path(__file__).parent.parent.parent)
@@ -0,0 +1,137 @@
+"""
+Resolución canónica de líneas UPH
+Los eventos llegan con el nombre de la PC de línea ("L6") y la BD usa "HI-6".
+Este servicio mantiene una tabla de alias en memoria (L6, HI-6, hi6, 6…) → id de
+`lineas` para que la ingesta guarde `linea_id` entero y las consultas filtren y
+agrupen sobre enteros en vez de cadenas.
+"""
+import re
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database_uph import UphSessionLocal
+from ..models.uph_models import Linea
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Recarga de alias por línea numerada desconocida (creada por otro proceso), como mucho cada N s
+RECARGAR_SEG = 30
+
+_NUM_LINEA = re.compile(r"^(?:L|HI)?-?\s*(\d+)$", re.IGNORECASE)
+
+# Líneas legacy que aún envían eventos con su nombre de PC ("L7") y que pueden no
+# tener fila en `lineas`: la primera vez se crea su "HI-N". Cualquier otro nombre
+# desconocido se rechaza (la ingesta no crea líneas).
+LINEAS_LEGACY = {f"L{n}": f"HI-{n}" for n in range(7, 12)}
+
+
+def numero_linea(nombre: Optional[str]) -> Optional[int]:
+    """'L6', 'HI-6', 'hi6', '6' → 6; cualquier otro formato → None."""
+    if not nombre:
+        return None
+    m = _NUM_LINEA.match(nombre.strip())
+    return int(m.group(1)) if m else None
+
+
+def nombre_evento(nombre: str) -> str:
+    """Nombre que usan los eventos: 'HI-6' → 'L6'. Otros formatos se devuelven igual."""
+    num = numero_linea(nombre)
+    return f"L{num}" if num is not None else nombre
+
+
+def estacion_num(estacion) -> Optional[int]:
+    """'604' → 604; estaciones no numéricas → None."""
+    try:
+        return int(str(estacion).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class LineasService:
+    """Tabla de alias línea → id con carga perezosa.
+
+    Alias: cada fila de `lineas` ("HI-6" → L6, hi6, 6) más LINEAS_LEGACY. Solo
+    las líneas legacy se crean al llegar su primer evento; el id entra al caché
+    después del commit de la creación.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_alias: dict = {}     # alias normalizado → linea_id
+        self._por_id: dict = {}        # linea_id → nombre BD ("HI-6")
+        self._cargado = False
+        self._recargado = 0.0
+
+    @staticmethod
+    def _alias(nombre: str) -> str:
+        num = numero_linea(nombre)
+        return f"#{num}" if num is not None else nombre.strip().lower()
+
+    def _registrar(self, linea_id: int, nombre: str):
+        self._por_alias[self._alias(nombre)] = linea_id
+        self._por_id[linea_id] = nombre
+
+    def cargar(self, db=None) -> None:
+        """(Re)cargar la tabla de alias desde `lineas`."""
+        propia = db is None
+        db = db or UphSessionLocal()
+        try:
+            filas = db.query(Linea.id, Linea.nombre).order_by(Linea.id).all()
+        finally:
+            if propia:
+                db.close()
+        with self._lock:
+            self._por_alias.clear()
+            self._por_id.clear()
+            for linea_id, nombre in reversed(filas):   # a igualdad de alias gana el id menor
+                self._registrar(linea_id, nombre)
+            self._cargado = True
+            self._recargado = time.monotonic()
+
+    def id_linea(self, nombre: Optional[str]) -> Optional[int]:
+        """Id de la línea para cualquier alias conocido; None si no existe."""
+        if not nombre:
+            return None
+        if not self._cargado:
+            self.cargar()
+        alias = self._alias(nombre)
+        linea_id = self._por_alias.get(alias)
+        if linea_id is None and alias.startswith("#") and time.monotonic() - self._recargado > RECARGAR_SEG:
+            self.cargar()
+            linea_id = self._por_alias.get(alias)
+        return linea_id
+
+    def resolver(self, db, nombre: Optional[str]) -> Optional[int]:
+        """Id de la línea para ingesta. Solo crea la fila de una línea de
+        LINEAS_LEGACY; cualquier otro nombre desconocido → None."""
+        linea_id = self.id_linea(nombre)
+        if linea_id is not None or not nombre:
+            return linea_id
+        nombre_bd = LINEAS_LEGACY.get(f"L{numero_linea(nombre)}")
+        if nombre_bd is None:
+            return None
+        # Transacción propia: el id no depende del commit (o rollback) del llamador
+        with Session(bind=db.get_bind()) as sesion:
+            try:
+                sesion.add(Linea(nombre=nombre_bd))
+                sesion.commit()
+                logger.info(f"Línea {nombre_bd} creada desde evento '{nombre}'")
+            except IntegrityError:
+                sesion.rollback()   # la creó otro proceso
+            self.cargar(sesion)
+        return self.id_linea(nombre)
+
+    def nombre(self, linea_id: int) -> Optional[str]:
+        """Nombre BD ("HI-6") de un id."""
+        if not self._cargado:
+            self.cargar()
+        return self._por_id.get(linea_id)
+
+
+# Instancia global del servicio de líneas
+lineas_service = LineasService()
@@ -3,17 +3,23 @@ Servicio de monitoreo y alertas
 Integra Prometheus para métricas y Sentry para tracking de errores
 """
 import os
+import re
 import time
 import logging
+import contextvars
+import weakref
 from functools import wraps
 from typing import Callable
 from fastapi import Request, Response
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from starlette.responses import Response as StarletteResponse
+from sqlalchemy import event
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 
+from ..config import IS_PRODUCTION, DB_SLOW_QUERY_MS, DB_SLOW_QUERY_EXPLAIN
+
 logger = logging.getLogger(__name__)
 
 # Métricas de Prometheus
@@ -40,6 +46,19 @@ database_queries_total = Counter(
     ['operation', 'table']
 )
 
+db_queries_per_request = Histogram(
+    'db_queries_per_request',
+    'Consultas SQL por petición HTTP',
+    ['method', 'route'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+db_time_per_request_seconds = Histogram(
+    'db_time_per_request_seconds',
+    'Tiempo en base de datos por petición HTTP en segundos',
+    ['method', 'route']
+)
+
 cache_hits_total = Counter(
     'cache_hits_total',
     'Total de hits en caché',
@@ -76,10 +95,112 @@ def init_sentry():
     
     logger.info(f"✅ Sentry inicializado para ambiente: {sentry_environment}")
 
+class _ConsultasRequest:
+    """Acumulador por petición; el contextvar apunta al mismo objeto desde el
+    middleware hasta los hilos del threadpool (que copian el contexto)."""
+    __slots__ = ("consultas", "segundos")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+
+_consultas_request: contextvars.ContextVar = contextvars.ContextVar("consultas_request", default=None)
+_explicando: contextvars.ContextVar = contextvars.ContextVar("explicando", default=False)
+
+_RE_TABLA = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)', re.IGNORECASE)
+_MAX_PARAMS_LOG = 500
+_engines_instrumentados = weakref.WeakSet()
+
+
+def _operacion_tabla(statement: str) -> tuple:
+    """'SELECT ... FROM eventos_uph ...' → ('SELECT', 'eventos_uph')"""
+    partes = statement.lstrip().split(None, 1)
+    operacion = partes[0].upper() if partes else "?"
+    m = _RE_TABLA.search(statement)
+    return operacion, (m.group(1).lower() if m else "-")
+
+
+def _log_consulta_lenta(conn, nombre: str, statement: str, parameters, executemany: bool, duracion: float):
+    """Loguear consulta lenta con parámetros y, si está activo, su plan."""
+    params = f"<executemany x{len(parameters)}>" if executemany else repr(parameters)
+    if len(params) > _MAX_PARAMS_LOG:
+        params = params[:_MAX_PARAMS_LOG] + "…"
+    logger.warning(f"🐢 Consulta lenta [{nombre}] {duracion * 1000:.0f} ms: {statement} | params={params}")
+
+    if not DB_SLOW_QUERY_EXPLAIN or executemany or not statement.lstrip().upper().startswith("SELECT"):
+        return
+    # Conexión aparte: un EXPLAIN fallido no debe abortar la transacción en curso
+    prefijo = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    token = _explicando.set(True)
+    try:
+        with conn.engine.connect() as otra:
+            plan = otra.exec_driver_sql(prefijo + statement, parameters).fetchall()
+        logger.warning("Plan:\n" + "\n".join(" | ".join(str(c) for c in fila) for fila in plan))
+    except Exception as e:
+        logger.warning(f"EXPLAIN falló: {e}")
+    finally:
+        _explicando.reset(token)
+
+
+def instrumentar_engine(engine, nombre: str):
+    """Registrar listeners de SQLAlchemy que cuentan consultas y tiempo en BD.
+
+    - database_queries_total por operación/tabla
+    - acumulado de la petición HTTP en curso (ver metrics_middleware)
+    - log de consultas por encima de DB_SLOW_QUERY_MS
+    """
+    if engine in _engines_instrumentados:
+        return
+    _engines_instrumentados.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        duracion = time.perf_counter() - conn.info["inicio_consulta"].pop()
+        if _explicando.get():
+            return
+        operacion, tabla = _operacion_tabla(statement)
+        database_queries_total.labels(operation=operacion, table=tabla).inc()
+        actual = _consultas_request.get()
+        if actual is not None:
+            actual.consultas += 1
+            actual.segundos += duracion
+        if duracion * 1000 >= DB_SLOW_QUERY_MS:
+            _log_consulta_lenta(conn, nombre, statement, parameters, executemany, duracion)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # La consulta falló: descartar el inicio que no tendrá after_cursor_execute
+        conn = context.connection
+        if conn is not None and conn.info.get("inicio_consulta"):
+            conn.info["inicio_consulta"].pop()
+
+
+def consultas_request_actual() -> "_ConsultasRequest | None":
+    """Acumulador (consultas, segundos) de la petición en curso, si hay una."""
+    return _consultas_request.get()
+
+
+def _ruta_plantilla(request: Request) -> str:
+    """Plantilla de la ruta ('/api/uph/linea/{linea}') para no explotar la cardinalidad."""
+    ruta = request.scope.get("route")
+    return getattr(ruta, "path", None) or "sin_ruta"
+
+
 def init_monitoring(app):
     """Inicializar monitoreo en la aplicación FastAPI"""
     # Inicializar Sentry
     init_sentry()
+
+    # Conteo de consultas SQL en ambas bases
+    from ..database import engine
+    from ..database_uph import uph_engine
+    instrumentar_engine(engine, "main")
+    instrumentar_engine(uph_engine, "uph")
     
     # Middleware para métricas HTTP
     @app.middleware("http")
@@ -92,6 +213,8 @@ def init_monitoring(app):
 
         # Incrementar conexiones activas
         active_connections.inc()
+        consultas = _ConsultasRequest()
+        token = _consultas_request.set(consultas)
 
         try:
             response = await call_next(request)
@@ -104,6 +227,13 @@ def init_monitoring(app):
             
             http_requests_total.labels(method=method, endpoint=endpoint, status=status).inc()
             http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
+
+            route = _ruta_plantilla(request)
+            db_queries_per_request.labels(method=method, route=route).observe(consultas.consultas)
+            db_time_per_request_seconds.labels(method=method, route=route).observe(consultas.segundos)
+            if not IS_PRODUCTION:
+                response.headers["X-DB-Queries"] = str(consultas.consultas)
+                response.headers["X-DB-Time"] = f"{consultas.segundos * 1000:.1f}ms"
             
             return response
         except Exception as e:
@@ -113,6 +243,7 @@ def init_monitoring(app):
         finally:
             # Decrementar conexiones activas
             active_connections.dec()
+            _consultas_request.reset(token)
     
     # Endpoint para métricas de Prometheus
     @app.get("/metrics")
@@ -0,0 +1,203 @@
+"""
+Servicio de profiling bajo demanda
+Un admin agrega `X-Profile: 1` (o `?__profile=1`) y la petición corre bajo
+pyinstrument; el reporte HTML queda en memoria con ruta, duración y consultas
+SQL, consultable en /api/admin/profiles.
+
+Desactivado (PROFILING_ENABLED=false, default) no se instala nada: ni
+middleware ni envoltura de endpoints.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Optional
+import contextvars
+import logging
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from ..config import PROFILING_ENABLED, PROFILING_HISTORIAL, PROFILING_INTERVALO_MS
+from .monitoring_service import consultas_request_actual
+
+logger = logging.getLogger(__name__)
+
+_perfil_actual: contextvars.ContextVar = contextvars.ContextVar("perfil_actual", default=None)
+
+
+class _PerfilEnCurso:
+    """Sesiones de pyinstrument de una petición: hilo del event loop + hilo del threadpool."""
+    __slots__ = ("sesiones",)
+
+    def __init__(self):
+        self.sesiones = []
+
+
+class ProfilingService:
+    """Historial circular de perfiles (solo en memoria, por proceso)."""
+
+    def __init__(self, maximo: int = PROFILING_HISTORIAL):
+        self._perfiles: deque = deque(maxlen=maximo)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def nuevo_id(self) -> int:
+        return next(self._ids)
+
+    def guardar(self, perfil: dict):
+        with self._lock:
+            self._perfiles.append(perfil)
+
+    def listar(self) -> list:
+        """Metadatos de los perfiles, más reciente primero (sin el HTML)."""
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "html"} for p in reversed(self._perfiles)]
+
+    def obtener(self, perfil_id: int) -> Optional[dict]:
+        with self._lock:
+            return next((p for p in self._perfiles if p["id"] == perfil_id), None)
+
+
+def _solicita_perfil(scope) -> bool:
+    if b"__profile=1" in scope.get("query_string", b""):
+        return True
+    return any(k == b"x-profile" and v == b"1" for k, v in scope.get("headers", ()))
+
+
+def _admin_del_token(scope) -> Optional[str]:
+    """Usuario admin del Bearer token, o None (token inválido o sin permisos)."""
+    from jose import JWTError, jwt
+    from ..auth import ALGORITHM
+    from ..config import SECRET_KEY
+    from ..database import SessionLocal
+    from ..models.models import Tecnico
+    from ..routers.admin import ADMIN_USERS
+
+    auth = next((v.decode() for k, v in scope.get("headers", ()) if k == b"authorization"), "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    try:
+        usuario = jwt.decode(auth[7:], SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    if usuario not in ADMIN_USERS:
+        return None
+    db = SessionLocal()
+    try:
+        existe = db.query(Tecnico.id).filter(Tecnico.usuario == usuario, Tecnico.activo == True).first()
+    finally:
+        db.close()
+    return usuario if existe else None
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: sin la marca de profiling solo compara headers y sigue."""
+
+    def __init__(self, app):
+        self.app = app
+        self._ocupado = False   # un perfil a la vez: pyinstrument muestrea por hilo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _solicita_perfil(scope):
+            return await self.app(scope, receive, send)
+        usuario = await run_in_threadpool(_admin_del_token, scope)
+        if usuario is None or self._ocupado:
+            return await self.app(scope, receive, send)
+
+        from pyinstrument import Profiler
+        from pyinstrument.session import Session
+
+        self._ocupado = True
+        perfil_id = profiling_service.nuevo_id()
+        estado = {"status": None}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", str(perfil_id).encode())]
+            await send(message)
+
+        en_curso = _PerfilEnCurso()
+        token = _perfil_actual.set(en_curso)
+        profiler = Profiler(interval=PROFILING_INTERVALO_MS / 1000, async_mode="enabled")
+        inicio = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            profiler.stop()
+            duracion = time.perf_counter() - inicio
+            _perfil_actual.reset(token)
+            self._ocupado = False
+            sesion = Session.combine(profiler.last_session, *en_curso.sesiones) if en_curso.sesiones \
+                else profiler.last_session
+            ruta = getattr(scope.get("route"), "path", None) or scope["path"]
+            consultas = consultas_request_actual()
+            profiling_service.guardar({
+                "id": perfil_id,
+                "fecha": datetime.now(timezone.utc).isoformat(),
+                "usuario": usuario,
+                "metodo": scope["method"],
+                "ruta": ruta,
+                "path": scope["path"],
+                "status": estado["status"],
+                "duracion_ms": round(duracion * 1000, 1),
+                "consultas": consultas.consultas if consultas else None,
+                "db_ms": round(consultas.segundos * 1000, 1) if consultas else None,
+                "html": _renderizar(sesion),
+            })
+            logger.info(f"🔬 Perfil {perfil_id}: {scope['method']} {ruta} {duracion * 1000:.0f} ms ({usuario})")
+
+
+def _renderizar(sesion) -> str:
+    from pyinstrument.renderers import HTMLRenderer
+    return HTMLRenderer().render(sesion)
+
+
+def _envolver_sync(call):
+    """Endpoints `def` corren en el threadpool, fuera del hilo que muestrea el
+    middleware: perfilar el cuerpo en su propio hilo cuando la petición lo pide."""
+    @wraps(call)
+    def _perfilado(*args, **kwargs):
+        en_curso = _perfil_actual.get()
+        if en_curso is None:
+            return call(*args, **kwargs)
+        from pyinstrument import Profiler
+        profiler = Profiler(interval=PROFILING_INTERVALO_MS / 1000, async_mode="disabled")
+        profiler.start()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profiler.stop()
+            en_curso.sesiones.append(profiler.last_session)
+    return _perfilado
+
+
+def _instrumentar_rutas(app):
+    for ruta in app.routes:
+        if isinstance(ruta, APIRoute) and not asyncio.iscoroutinefunction(ruta.dependant.call):
+            ruta.dependant.call = _envolver_sync(ruta.dependant.call)
+
+
+def init_profiling(app):
+    """Instalar profiling bajo demanda si PROFILING_ENABLED. Llamar antes de
+    init_monitoring para quedar dentro del middleware de métricas (conteo de consultas)."""
+    if not PROFILING_ENABLED:
+        return
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        logger.warning("PROFILING_ENABLED pero pyinstrument no está instalado; profiling desactivado")
+        return
+    app.add_middleware(ProfilingMiddleware)
+    app.add_event_handler("startup", lambda: _instrumentar_rutas(app))
+    logger.info("✅ Profiling bajo demanda habilitado (X-Profile: 1, solo admin)")
+
+
+# Instancia global del servicio de profiling
+profiling_service = ProfilingService()
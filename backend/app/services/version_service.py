@@ -0,0 +1,129 @@
+"""
+Servicio de versiones por dominio para GET condicionales (ETag / If-None-Match)
+Cada dominio (eventos, asignaciones, planes, jigs...) tiene un contador monotónico
+que se incrementa en cada escritura. Los endpoints de lectura derivan su ETag de
+las versiones de los dominios que consultan y responden 304 sin tocar la BD.
+"""
+import hashlib
+import threading
+import time
+from typing import Optional, Iterable
+
+from fastapi import HTTPException, Request, Response
+
+from .cache_service import cache_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dominios conocidos — usar estas constantes en bump()/conditional_get()
+EVENTOS = "eventos"            # ingesta UPH (EventoUPH)
+ASIGNACIONES = "asignaciones"  # asignaciones y operadores
+PLANES = "planes"              # PlanLinea, PlanDiaLinea y modelos UPH
+DESCANSOS = "descansos"        # descansos manuales por línea
+LIDERES = "lideres"            # vínculos líder-línea y fotos (archivos JSON)
+JIGS = "jigs"
+VALIDACIONES = "validaciones"
+
+
+class VersionService:
+    """Contadores de versión por dominio.
+
+    Con Redis disponible los contadores se comparten entre workers/procesos (INCR);
+    sin Redis se guardan en memoria del proceso. La época identifica el almacén para
+    que un reinicio (contadores en 0) nunca reutilice un ETag anterior.
+    """
+
+    _REDIS_PREFIX = "version:"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: dict = {}
+        self._epoch = str(int(time.time()))
+        if cache_service.enabled:
+            try:
+                cache_service.redis_client.setnx(f"{self._REDIS_PREFIX}epoch", self._epoch)
+                self._epoch = cache_service.redis_client.get(f"{self._REDIS_PREFIX}epoch") or self._epoch
+            except Exception as e:
+                logger.warning(f"No se pudo inicializar la época de versiones en Redis: {e}")
+
+    def bump(self, *dominios: str) -> None:
+        """Incrementar la versión de uno o más dominios (llamar después del commit)."""
+        for dominio in dominios:
+            with self._lock:
+                self._versions[dominio] = self._versions.get(dominio, 0) + 1
+            if cache_service.enabled:
+                try:
+                    cache_service.redis_client.incr(f"{self._REDIS_PREFIX}{dominio}")
+                except Exception as e:
+                    logger.error(f"Error incrementando versión '{dominio}' en Redis: {e}")
+
+    @property
+    def compartido(self) -> bool:
+        """True si los contadores se comparten entre procesos (Redis disponible)."""
+        return cache_service.enabled
+
+    def get(self, dominio: str) -> int:
+        """Versión actual de un dominio."""
+        if cache_service.enabled:
+            try:
+                valor = cache_service.redis_client.get(f"{self._REDIS_PREFIX}{dominio}")
+                return int(valor or 0)
+            except Exception as e:
+                logger.error(f"Error leyendo versión '{dominio}' de Redis: {e}")
+        return self._versions.get(dominio, 0)
+
+    def etag(self, dominios: Iterable[str], *extra: str, ttl: Optional[int] = None) -> str:
+        """ETag débil a partir de las versiones de los dominios.
+
+        Args:
+            dominios: Dominios de los que depende la respuesta
+            extra: Otros componentes que cambian la respuesta (query string, rol...)
+            ttl: Si se indica, el ETag rota cada `ttl` segundos aunque no haya
+                 escrituras (para respuestas que dependen de la hora actual)
+        """
+        partes = [self._epoch]
+        partes += [f"{d}={self.get(d)}" for d in sorted(dominios)]
+        partes += [str(e) for e in extra]
+        if ttl:
+            partes.append(f"t={int(time.time() // ttl)}")
+        digest = hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+
+# Instancia global del servicio de versiones
+version_service = VersionService()
+
+
+def _etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil: ignorar el prefijo W/
+    objetivo = etag[2:] if etag.startswith("W/") else etag
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == objetivo:
+            return True
+    return False
+
+
+def conditional_get(*dominios: str, ttl: Optional[int] = None):
+    """
+    Dependencia para endpoints GET: emite ETag y responde 304 si el cliente ya
+    tiene la versión actual (If-None-Match), antes de ejecutar cualquier consulta.
+
+    Uso:
+        def endpoint(..., _etag: None = Depends(conditional_get(EVENTOS, ttl=60))):
+    """
+    def _dependencia(request: Request, response: Response):
+        auth = request.headers.get("authorization", "")
+        etag = version_service.etag(dominios, request.url.path, request.url.query, auth, ttl=ttl)
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Authorization"}
+        if _etag_coincide(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return _dependencia
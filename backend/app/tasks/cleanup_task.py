@@ -15,6 +15,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from app.database import SessionLocal
 from app.models.models import Validacion
+from app.services.version_service import version_service, JIGS, VALIDACIONES
 from app.services.storage_service import (
     cleanup_old_pdfs,
     compress_old_pdfs,
@@ -132,6 +133,7 @@ def cleanup_turn_validations(turno: str):
         ).delete(synchronize_session=False)
         
         db.commit()
+        version_service.bump(VALIDACIONES, JIGS)
         
         # Actualizar la secuencia de IDs después de eliminar registros
         # Esto previene errores de "llave duplicada" cuando se crean nuevas validaciones
@@ -185,6 +187,7 @@ def cleanup_daily_validations(target_date, label):
         ).delete(synchronize_session=False)
 
         db.commit()
+        version_service.bump(VALIDACIONES, JIGS)
 
         if deleted_count > 0:
             try:
@@ -236,6 +239,7 @@ def mark_no_validado_for_date(target_date, label):
         )
 
         db.commit()
+        version_service.bump(VALIDACIONES, JIGS)
         logger.info(f"✅ [{label}] Marcadas {updated_count} validaciones como NO_VALIDADO del {target_date} (contadas: {count_before})")
         return updated_count
     except Exception as e:
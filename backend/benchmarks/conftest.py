@@ -0,0 +1,113 @@
+"""
+Benchmarks de agregación UPH y generación de PDF (pytest-benchmark).
+
+Fuera de `testpaths`: `pytest` a secas no los corre. Desde backend/:
+
+    pytest benchmarks --benchmark-autosave          # guarda .benchmarks/<máquina>/NNNN_<commit>.json
+    pytest benchmarks --benchmark-compare           # compara contra el último guardado
+    pytest-benchmark compare 0001 0002 --group-by=name
+    pytest benchmarks --benchmark-json=bench.json   # JSON suelto (CI)
+
+Datasets sintéticos de eventos (1 día, 1 semana, 2 semanas) sobre SQLite en
+memoria; BENCH_POR_HORA ajusta el ritmo por estación (default 30 piezas/h).
+La planta y el reloj fijo del router salen de tests/planta_uph.py, los mismos
+que usa tests/test_query_budget.py.
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("UPH_DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.database_uph import UphBase
+from app.models.models import Tecnico, Adaptador, ConectorAdaptador
+from app.routers import uph
+from app.services.lineas_service import lineas_service
+from tests.planta_uph import Reloj, sembrar_planta
+
+POR_HORA = int(os.getenv("BENCH_POR_HORA", 30))
+DATASETS = {"1d": 1, "1sem": 7, "2sem": 14}
+
+
+class UsuarioBench:
+    """Usuario con permisos de gerencia para llamar endpoints sin JWT."""
+    id = 1
+    nombre = "Benchmark"
+    numero_empleado = "00000"
+    tipo_usuario = "admin"
+
+
+def _motor():
+    return create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+
+@pytest.fixture(scope="module", params=list(DATASETS), ids=list(DATASETS))
+def planta(request):
+    """Sessionmaker sobre una planta UPH sembrada con el dataset del parámetro."""
+    engine = _motor()
+    UphBase.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Sesion()
+    try:
+        eventos = sembrar_planta(db, DATASETS[request.param], POR_HORA)
+        lineas_service.cargar(db)
+        print(f"\n[{request.param}] {eventos:,} eventos sembrados")
+        yield Sesion
+    finally:
+        db.close()
+        engine.dispose()
+        lineas_service._cargado = False
+
+
+@pytest.fixture
+def gerente():
+    return UsuarioBench()
+
+
+@pytest.fixture
+def reloj_fijo(monkeypatch):
+    monkeypatch.setattr(uph, "datetime", Reloj)
+
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    """Los PDFs de validación se escriben en REPORTS_DIR: redirigir a tmp."""
+    import app.config
+    monkeypatch.setattr(app.config, "REPORTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def inventario():
+    """BD principal con adaptadores activos y conectores (1 de cada 7 NG)."""
+    engine = _motor()
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Sesion()
+    db.add(Tecnico(usuario="bench", nombre="Benchmark", numero_empleado="00000",
+                   password_hash="x", tipo_usuario="admin", activo=True))
+    for i in range(400):
+        adaptador = Adaptador(codigo_qr=f"AD{i:05d}", numero_adaptador=f"A{i}",
+                              modelo_adaptador=f"ADAPTADOR-{i % 25}", estado="activo")
+        adaptador.conectores = [
+            ConectorAdaptador(nombre_conector=f"ZH-MINI-HD-{k}",
+                              estado="NG" if (i + k) % 7 == 0 else "OK",
+                              comentario_ng="pin doblado" if (i + k) % 7 == 0 else None)
+            for k in range(1, 5)
+        ]
+        db.add(adaptador)
+    db.commit()
+    db.close()
+    try:
+        yield Sesion
+    finally:
+        engine.dispose()
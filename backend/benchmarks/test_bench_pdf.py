@@ -0,0 +1,56 @@
+"""
+Benchmarks de generación de PDF: reporte de validación por lotes y PDF de
+inventario de adaptadores.
+"""
+import asyncio
+
+import pytest
+
+from app.models.models import Tecnico
+from app.routers.inventario import generar_inventario_pdf
+from app.services.pdf_service import generate_batch_validation_report_pdf
+
+
+def _reporte_lote(n: int) -> dict:
+    return {
+        "fecha": "2026-10-14T10:00:00",
+        "turno": "A",
+        "tecnico": "Benchmark",
+        "tecnico_id": 1,
+        "numero_empleado": "00000",
+        "modelo": "55U75QUF",
+        "linea": "6",
+        "validaciones": [
+            {
+                "numero_jig": f"J{i}",
+                "tipo": "manual",
+                "estado": "OK" if i % 9 else "NG",
+                "comentario": "Sin comentarios" if i % 9 else "Pin 3 sin continuidad en prueba de ICT",
+                "turno": "A",
+                "created_at": "2026-10-14T10:00:00",
+            }
+            for i in range(n)
+        ],
+    }
+
+
+@pytest.mark.benchmark(group="pdf-validacion-lote")
+@pytest.mark.parametrize("jigs", [10, 50, 200])
+def test_generate_batch_validation_report_pdf(benchmark, reports_dir, jigs):
+    data = _reporte_lote(jigs)
+    ruta = benchmark(generate_batch_validation_report_pdf, data)
+    assert ruta.endswith(".pdf")
+
+
+@pytest.mark.benchmark(group="pdf-inventario")
+def test_generar_inventario_pdf(benchmark, inventario):
+    def _ronda():
+        db = inventario()
+        try:
+            usuario = db.query(Tecnico).first()
+            return asyncio.run(generar_inventario_pdf(nombre_inventario="Inventario General", db=db,
+                                                      current_user=usuario))
+        finally:
+            db.close()
+    response = benchmark(_ronda)
+    assert response.media_type == "application/pdf"
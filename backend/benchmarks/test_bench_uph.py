@@ -0,0 +1,56 @@
+"""
+Benchmarks de los endpoints de agregación UPH sobre 1 día / 1 semana / 2 semanas
+de eventos. Se llaman las funciones del router directamente (sin HTTP ni ETag)
+para medir solo consultas y agregación.
+"""
+import asyncio
+
+import pytest
+
+from app.routers import uph
+from app.routers.uph import FilaPlan, PlanSubirIn
+
+
+def _medir(benchmark, planta, fn):
+    """Una sesión nueva por ronda: sin identity map caliente entre rondas."""
+    def _ronda():
+        db = planta()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+    return benchmark(_ronda)
+
+
+@pytest.mark.benchmark(group="uph-dashboard-lineas-hoy")
+def test_dashboard_lineas_hoy(benchmark, planta, reloj_fijo):
+    r = _medir(benchmark, planta, lambda db: uph.dashboard_lineas_hoy(db=db, _etag=None))
+    assert r["lineas"]
+
+
+@pytest.mark.benchmark(group="uph-tendencias")
+def test_tendencias_uph(benchmark, planta, reloj_fijo):
+    r = _medir(benchmark, planta, lambda db: uph.tendencias_uph(desde=None, horas=12, db=db, _etag=None))
+    assert r["lineas"]
+
+
+@pytest.mark.benchmark(group="uph-ranking-semanal")
+def test_get_ranking_semanal(benchmark, planta, reloj_fijo):
+    _medir(benchmark, planta, lambda db: uph.get_ranking_semanal(db=db, _etag=None))
+
+
+@pytest.mark.benchmark(group="uph-reporte-semanal")
+def test_reporte_semanal_completo(benchmark, planta, reloj_fijo, gerente):
+    _medir(benchmark, planta, lambda db: uph.reporte_semanal_completo(db=db, current_user=gerente))
+
+
+@pytest.mark.benchmark(group="uph-plan-subir")
+def test_plan_subir(benchmark, planta, reloj_fijo):
+    """Re-subida del Excel del día: 6 líneas × 10 modelos (upsert sobre existentes)."""
+    data = PlanSubirIn(turno="AC", filas=[
+        FilaPlan(linea=f"HI-{n}", modelo=f"55U8{m}", modelo_interno=f"50A{m}FUR",
+                 uph_meta=str(90 + m), plan_piezas="400", plan_piezas_dia="200", plan_piezas_noche="200")
+        for n in range(1, 7) for m in range(10)
+    ])
+    r = _medir(benchmark, planta, lambda db: asyncio.run(uph.plan_subir(data, db=db)))
+    assert r["ok"]
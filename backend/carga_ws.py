@@ -0,0 +1,278 @@
+"""
+Prueba de carga del fan-out WebSocket de /api/uph/ws (_ConnectionManager).
+
+Simula N pantallas (andon por línea + tablets de líderes) conectadas al
+WebSocket mientras llega ingesta a ritmo fijo. Una fracción de clientes son
+lectores lentos (buffer de socket chico y pausa entre lecturas), como una
+tablet con wifi malo.
+
+Fases:
+  1. Ingesta sin WebSockets → latencia base del POST /api/uph/evento.
+  2. Conectar N clientes (en un subproceso, para que la memoria medida sea la
+     del servidor) → RSS por conexión.
+  3. Misma ingesta con los N conectados → latencia de ingesta con fan-out,
+     duración de cada broadcast en el servidor y latencia de entrega
+     broadcast → cliente (p50/p95/p99, normales vs lentos).
+
+La app corre en este proceso (igual que carga_uph.py) para poder cronometrar
+cada broadcast; servidor y clientes comparten time.monotonic() (Linux).
+
+Ejemplos:
+  python carga_ws.py --clientes 200 --lentos 0.05 --ritmo 20 --duracion 30
+  python carga_ws.py --clientes 500 --lentos 0 --ritmo 50 --json ws_500.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from carga_uph import ServidorLocal, percentil, _resumen_latencias
+
+
+def _rss_mb() -> float:
+    """RSS del proceso en MB (Linux /proc; 0 si no está disponible)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def _resumen(valores: list) -> dict:
+    return {"n": len(valores), "p50": percentil(valores, 50), "p95": percentil(valores, 95),
+            "p99": percentil(valores, 99), "max": max(valores, default=0)}
+
+
+# ─────────────────────────────────────────────────────────────────
+# Subproceso: N clientes WebSocket
+# ─────────────────────────────────────────────────────────────────
+
+async def _cliente(ws_url: str, lento: bool, args, llegadas: list, estado: dict, fin: asyncio.Event):
+    import websockets
+    kwargs = {"open_timeout": 30, "ping_interval": None}
+    if lento:
+        # Buffer de recepción chico + cola de 1 mensaje: la contrapresión llega rápido al servidor
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, args.lento_buffer)
+        host, puerto = ws_url.split("//", 1)[1].split("/", 1)[0].split(":")
+        sock.connect((host, int(puerto)))
+        sock.setblocking(False)
+        kwargs.update(sock=sock, max_queue=1)
+    try:
+        async with websockets.connect(ws_url, **kwargs) as ws:
+            estado["conectados"] += 1
+            while not fin.is_set():
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                llegadas.append(time.monotonic())
+                if lento:
+                    await asyncio.sleep(args.lento_pausa)
+    except Exception as e:
+        estado["cortes"][type(e).__name__] = estado["cortes"].get(type(e).__name__, 0) + 1
+
+
+async def _worker(args):
+    """Conecta los clientes, avisa LISTO por stdout y espera FIN por stdin."""
+    rnd = random.Random(args.semilla)
+    fin = asyncio.Event()
+    estado = {"conectados": 0, "cortes": {}}
+    clientes = [{"lento": rnd.random() < args.lentos, "llegadas": []} for _ in range(args.clientes)]
+    tareas = []
+    for i in range(0, len(clientes), 50):   # de 50 en 50: no saturar el accept del servidor
+        for c in clientes[i:i + 50]:
+            tareas.append(asyncio.create_task(_cliente(args.ws_url, c["lento"], args, c["llegadas"], estado, fin)))
+        await asyncio.sleep(0.2)
+    while estado["conectados"] + sum(estado["cortes"].values()) < len(clientes):
+        await asyncio.sleep(0.1)
+    print(f"LISTO {estado['conectados']}", flush=True)
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, sys.stdin.readline)
+    fin.set()
+    await asyncio.gather(*tareas)
+    print(json.dumps({"clientes": clientes, "conectados": estado["conectados"], "cortes": estado["cortes"]}),
+          flush=True)
+
+
+# ─────────────────────────────────────────────────────────────────
+# Proceso principal: servidor + ingesta + cronómetro de broadcasts
+# ─────────────────────────────────────────────────────────────────
+
+class CronometroBroadcast:
+    """Envuelve ws_manager.broadcast: inicio y duración por número de secuencia."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.inicio: dict = {}
+        self.duracion: list = []
+        original = manager.broadcast
+
+        async def _broadcast(msg, cambio=None):
+            t = time.monotonic()
+            self.inicio[manager.seq + 1] = t
+            await original(msg, cambio)
+            self.duracion.append((time.monotonic() - t) * 1000)
+
+        manager.broadcast = _broadcast
+
+
+async def ingesta(cliente, args, segundos: float) -> list:
+    """POST de eventos GOOD a ritmo fijo repartidos entre estaciones; latencias ms."""
+    estaciones = [(f"L{n}", f"{n}{e:02d}") for n in range(1, args.lineas + 1) for e in range(1, args.estaciones + 1)]
+    contadores = {num: 0 for _, num in estaciones}
+    latencias, tareas = [], []
+
+    async def _enviar(linea: str, num: str):
+        contadores[num] = contadores[num] % 29 + 1
+        ini = time.monotonic()
+        try:
+            r = await cliente.post("/api/uph/evento", timeout=args.timeout, json={
+                "linea": linea, "estacion": num, "evento": "GOOD", "contador": contadores[num],
+            })
+            if r.status_code == 201 and r.json().get("ok"):
+                latencias.append((time.monotonic() - ini) * 1000)
+        except Exception:
+            pass
+
+    t0 = time.monotonic()
+    i = 0
+    while time.monotonic() - t0 < segundos:
+        linea, num = estaciones[i % len(estaciones)]
+        tareas.append(asyncio.create_task(_enviar(linea, num)))
+        i += 1
+        await asyncio.sleep(max(0.0, t0 + i / args.ritmo - time.monotonic()))
+    await asyncio.gather(*tareas)
+    return latencias
+
+
+async def correr(servidor: ServidorLocal, args) -> dict:
+    import httpx
+    from app.routers.uph import ws_manager
+
+    cron = CronometroBroadcast(ws_manager)
+    reporte = {"parametros": {k: v for k, v in vars(args).items() if k != "worker"}}
+    async with httpx.AsyncClient(base_url=servidor.url) as cliente:
+        # 1. Base sin WebSockets
+        base = await ingesta(cliente, args, args.duracion)
+        reporte["ingesta_sin_ws"] = _resumen(base)
+        print(f"Ingesta sin WS:     {_resumen_latencias(base)}")
+
+        # 2. Conectar clientes en subproceso y medir RSS del servidor
+        gc.collect()
+        rss_antes = _rss_mb()
+        ws_url = servidor.url.replace("http", "ws", 1) + "/api/uph/ws"
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, "--worker", "--ws-url", ws_url,
+            "--clientes", str(args.clientes), "--lentos", str(args.lentos),
+            "--lento-pausa", str(args.lento_pausa), "--lento-buffer", str(args.lento_buffer),
+            "--semilla", str(args.semilla),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=1 << 30,
+        )
+        linea = (await proc.stdout.readline()).decode().split()
+        conectados = int(linea[1]) if linea and linea[0] == "LISTO" else 0
+        await asyncio.sleep(1)
+        gc.collect()
+        rss_despues = _rss_mb()
+        por_conexion_kb = (rss_despues - rss_antes) * 1024 / max(conectados, 1)
+        reporte["memoria"] = {"rss_antes_mb": rss_antes, "rss_despues_mb": rss_despues,
+                              "kb_por_conexion": por_conexion_kb, "conectados": conectados}
+        print(f"Conectados:         {conectados}/{args.clientes} "
+              f"(RSS {rss_antes:.1f} → {rss_despues:.1f} MB, {por_conexion_kb:.1f} KB/conexión)")
+
+        # 3. Ingesta con fan-out
+        seq_base = ws_manager.seq
+        cron.duracion.clear()
+        con_ws = await ingesta(cliente, args, args.duracion)
+        await asyncio.sleep(args.drenar)
+        sockets_vivos = len(ws_manager._clients)
+        proc.stdin.write(b"FIN\n")
+        await proc.stdin.drain()
+        datos = json.loads((await proc.stdout.readline()).decode())
+        await proc.wait()
+
+    reporte["ingesta_con_ws"] = _resumen(con_ws)
+    reporte["broadcast_servidor_ms"] = _resumen(cron.duracion)
+    print(f"Ingesta con WS:     {_resumen_latencias(con_ws)}")
+    print(f"Broadcast (serv.):  {_resumen_latencias(cron.duracion)}")
+
+    emitidos = ws_manager.seq - seq_base
+    for tipo, lento in (("normales", False), ("lentos", True)):
+        clientes = [c for c in datos["clientes"] if c["lento"] == lento]
+        entrega, recibidos = [], 0
+        for c in clientes:
+            recibidos += len(c["llegadas"])
+            for k, t in enumerate(c["llegadas"], start=1):
+                inicio = cron.inicio.get(seq_base + k)
+                if inicio is not None:
+                    entrega.append((t - inicio) * 1000)
+        esperados = emitidos * len(clientes)
+        reporte[f"entrega_{tipo}"] = {**_resumen(entrega), "clientes": len(clientes),
+                                     "recibidos": recibidos, "esperados": esperados}
+        if clientes:
+            print(f"Entrega {tipo:<9}  {_resumen_latencias(entrega)}  "
+                  f"({recibidos}/{esperados} mensajes, {len(clientes)} clientes)")
+    reporte["sockets_vivos_al_final"] = sockets_vivos
+    reporte["cortes"] = datos["cortes"]
+    print(f"Sockets vivos al final: {sockets_vivos}" +
+          (f"  cortes: {datos['cortes']}" if datos["cortes"] else ""))
+    return reporte
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga del fan-out WebSocket /api/uph/ws")
+    parser.add_argument("--db", help="BD UPH para el servidor en proceso (default: SQLite temporal)")
+    parser.add_argument("--clientes", type=int, default=200, help="WebSockets conectados")
+    parser.add_argument("--lentos", type=float, default=0.05, help="Fracción de lectores lentos (0–1)")
+    parser.add_argument("--lento-pausa", type=float, default=1.0, help="Pausa en s entre lecturas de un lector lento")
+    parser.add_argument("--lento-buffer", type=int, default=4096, help="SO_RCVBUF en bytes de un lector lento")
+    parser.add_argument("--ritmo", type=float, default=20, help="Eventos por segundo en total")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos de ingesta por fase")
+    parser.add_argument("--drenar", type=float, default=2, help="Espera en s para entregas pendientes")
+    parser.add_argument("--lineas", type=int, default=6)
+    parser.add_argument("--estaciones", type=int, default=8, help="Estaciones por línea")
+    parser.add_argument("--timeout", type=float, default=2, help="Timeout del POST (igual que el cliente OCR)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--json", help="Guardar el reporte en este archivo")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--ws-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args))
+        return
+
+    db_url = args.db or "sqlite:///" + str(Path(tempfile.gettempdir()) / "carga_ws.db")
+    servidor = ServidorLocal(db_url)
+    servidor.iniciar(args.lineas, args.estaciones)
+
+    print("=" * 60)
+    print("  CARGA WEBSOCKET UPH")
+    print("=" * 60)
+    print(f"  Servidor:  {servidor.url}  (en proceso, {db_url})")
+    print(f"  Clientes:  {args.clientes} ({args.lentos:.0%} lentos: pausa {args.lento_pausa:g}s, "
+          f"buffer {args.lento_buffer} B)")
+    print(f"  Ingesta:   {args.ritmo:g} ev/s durante {args.duracion:g}s por fase")
+    print("=" * 60)
+
+    try:
+        reporte = asyncio.run(correr(servidor, args))
+    finally:
+        servidor.detener()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reporte, indent=2, default=str), encoding="utf-8")
+        print(f"\nReporte guardado en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,6 @@ import numpy as np
 import cv2
 import pytesseract
 from PIL import Image, ImageDraw
-import mss
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
@@ -61,32 +60,40 @@ CONFIG = {
 }
 # ══════════════════════════════════════════════════════════════════
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("fct_agent.log", encoding="utf-8"),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
 log = logging.getLogger(__name__)
 
 
-def capturar_zona(sct, monitor_info, zona):
-    """Captura una zona y devuelve imagen BGR (numpy array)."""
-    x, y, w, h = zona
-    region = {
-        "left":   monitor_info["left"] + x,
-        "top":    monitor_info["top"]  + y,
-        "width":  w,
-        "height": h,
+def capturar_zonas(sct, monitor_info, zonas):
+    """Captura varias zonas (x, y, w, h) con un solo grab del rectángulo que las
+    contiene. Devuelve {nombre: imagen BGR}; cada zona es una vista del buffer
+    de mss y solo esa vista se convierte de color."""
+    x0 = min(x for x, _, _, _ in zonas.values())
+    y0 = min(y for _, y, _, _ in zonas.values())
+    x1 = max(x + w for x, _, w, _ in zonas.values())
+    y1 = max(y + h for _, y, _, h in zonas.values())
+    shot = sct.grab({
+        "left":   monitor_info["left"] + x0,
+        "top":    monitor_info["top"]  + y0,
+        "width":  x1 - x0,
+        "height": y1 - y0,
+    })
+    bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+    return {
+        k: cv2.cvtColor(bgra[y - y0:y - y0 + h, x - x0:x - x0 + w], cv2.COLOR_BGRA2BGR)
+        for k, (x, y, w, h) in zonas.items()
     }
-    shot = sct.grab(region)
-    img_np = np.array(shot)
-    return cv2.cvtColor(img_np, cv2.COLOR_BGRA2BGR)
 
 
-def ocr_numero(img_bgr):
+# Preprocesamientos que prueba ocr_numero, en orden (replay_ocr.py los evalúa por separado)
+METODOS_OCR = [
+    ("umbral_150",     lambda g: cv2.threshold(g, 150, 255, cv2.THRESH_BINARY)[1]),
+    ("umbral_150_inv", lambda g: cv2.threshold(g, 150, 255, cv2.THRESH_BINARY_INV)[1]),
+    ("adaptativo",     lambda g: cv2.adaptiveThreshold(g, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)),
+    ("gris",           lambda g: g),
+]
+
+
+def ocr_numero(img_bgr, metodos=None):
     """Extrae número de una imagen BGR usando Tesseract.
     Prueba múltiples métodos de preprocesamiento para cubrir
     fondos oscuros, fondos rojos (estado NG) y fondos claros.
@@ -97,12 +104,7 @@ def ocr_numero(img_bgr):
 
     config = "--psm 7 -c tessedit_char_whitelist=0123456789."
 
-    for metodo in [
-        lambda g: cv2.threshold(g, 150, 255, cv2.THRESH_BINARY)[1],
-        lambda g: cv2.threshold(g, 150, 255, cv2.THRESH_BINARY_INV)[1],
-        lambda g: cv2.adaptiveThreshold(g, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2),
-        lambda g: g,
-    ]:
+    for _, metodo in metodos or METODOS_OCR:
         img_proc = metodo(gris)
         texto = pytesseract.image_to_string(img_proc, config=config).strip()
         if re.search(r"\d+(?:\.\d+)?", texto):
@@ -120,12 +122,10 @@ def limpiar_numero(texto: str):
 
 
 def capturar_y_enviar(debug=False):
+    import mss
     with mss.mss() as sct:
         monitor = sct.monitors[CONFIG["monitor"]]
-        imgs = {
-            "zona_pass_a": capturar_zona(sct, monitor, CONFIG["zona_pass_a"]),
-            "zona_pass_b": capturar_zona(sct, monitor, CONFIG["zona_pass_b"]),
-        }
+        imgs = capturar_zonas(sct, monitor, {k: CONFIG[k] for k in ("zona_pass_a", "zona_pass_b")})
 
     if debug:
         import os
@@ -166,6 +166,7 @@ def capturar_y_enviar(debug=False):
 
 def calibrar():
     """Guarda 'calibracion.png' con las zonas de Pass% marcadas."""
+    import mss
     with mss.mss() as sct:
         monitor = sct.monitors[CONFIG["monitor"]]
         shot = sct.grab(monitor)
@@ -186,6 +187,15 @@ def calibrar():
 
 
 def main():
+    # Solo al ejecutar el agente: importar el módulo no crea fct_agent.log
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            logging.FileHandler("fct_agent.log", encoding="utf-8"),
+            logging.StreamHandler(sys.stdout),
+        ],
+    )
     if "--calibrar" in sys.argv:
         calibrar()
         return
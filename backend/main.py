@@ -18,6 +18,8 @@ from app.models import uph_models, mes_models
 from app.config import CORS_ORIGINS, IS_PRODUCTION, FORCE_HTTPS, API_HOST, API_PORT
 from app.utils.logger import get_logger
 from app.services.monitoring_service import init_monitoring
+from app.services.profiling_service import init_profiling
+from app.services.fotos_service import fotos_service
 
 # Configurar logging
 logger = get_logger(__name__)
@@ -71,6 +73,29 @@ try:
             _conn.commit()
         except Exception:
             _conn.rollback()
+        # Claves enteras de línea/estación en eventos_uph (backfill y compactación abajo)
+        try:
+            _conn.execute(_text("ALTER TABLE eventos_uph ADD COLUMN linea_id SMALLINT REFERENCES lineas(id)"))
+            _conn.execute(_text("ALTER TABLE eventos_uph ADD COLUMN estacion_num SMALLINT"))
+            _conn.commit()
+        except Exception:
+            _conn.rollback()
+        # Registros con varias piezas (cantidad + rango de contador)
+        try:
+            _conn.execute(_text("ALTER TABLE eventos_uph ADD COLUMN cantidad SMALLINT NOT NULL DEFAULT 1"))
+            _conn.execute(_text("ALTER TABLE eventos_uph ADD COLUMN contador_desde INTEGER"))
+            _conn.commit()
+        except Exception:
+            _conn.rollback()
+        for _idx in (
+            "CREATE INDEX IF NOT EXISTS ix_eventos_uph_linea_ts ON eventos_uph(linea_id, timestamp)",
+            "CREATE INDEX IF NOT EXISTS ix_eventos_uph_linea_est_ts ON eventos_uph(linea_id, estacion_num, timestamp)",
+        ):
+            try:
+                _conn.execute(_text(_idx))
+                _conn.commit()
+            except Exception:
+                _conn.rollback()
 except Exception as _e:
     pass
 
@@ -94,6 +119,15 @@ try:
 except Exception as _e:
     pass
 
+# Layout anterior de eventos_uph → aviso crítico (compactar con alembic upgrade)
+uph_models.verificar_layout_eventos(uph_engine)
+# Vista de compatibilidad con las columnas de texto (PostgreSQL)
+try:
+    with uph_engine.begin() as _conn:
+        _conn.execute(_text(uph_models.VISTA_EVENTOS_TEXTO_SQL))
+except Exception:
+    pass
+
 app = FastAPI(
     title="Hisense CheckApp",
     description="""
@@ -137,6 +171,9 @@ app = FastAPI(
     },
 )
 
+# Profiling bajo demanda (antes del monitoreo: queda dentro del conteo de consultas)
+init_profiling(app)
+
 # Inicializar monitoreo (Prometheus y Sentry)
 init_monitoring(app)
 
@@ -199,6 +236,8 @@ app.include_router(mes.router)
 uploads_dir = Path(__file__).parent / "uploads"
 uploads_dir.mkdir(exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+# Índice de fotos de líderes/operadores (evita stat() por request)
+fotos_service.reconstruir()
 
 # Servir dashboard_operadores.html
 from fastapi.responses import FileResponse
@@ -0,0 +1,164 @@
+"""
+Mide tamaño de tabla e índices de eventos_uph: layout anterior vs compacto.
+
+Genera un dataset sintético de dos semanas (11 líneas × 8 estaciones) en dos
+tablas temporales con el layout de cada versión, mide y las borra:
+- bench_eventos_legacy:   linea/estacion texto, evento "GOOD", created_at,
+                          índice duplicado sobre la PK + claves enteras
+- bench_eventos_compacto: mismo layout que EventoUPH actual
+
+Correr: python medir_eventos_uph.py [--por-hora 30] [--dias 14] [--url URL]
+Sin --url usa UPH_DATABASE_URL. PostgreSQL (pg_relation_size) o SQLite (dbstat).
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import (
+    create_engine, text, MetaData, Table, Column, Index,
+    Integer, SmallInteger, String, DateTime,
+)
+
+LINEAS = range(1, 12)          # L1–L11
+ESTACIONES = range(1, 9)       # N01–N08
+LOTE = 20000
+
+meta = MetaData()
+
+legacy = Table(
+    "bench_eventos_legacy", meta,
+    Column("id", Integer, primary_key=True),
+    Column("linea", String, nullable=False),
+    Column("estacion", String, nullable=False),
+    Column("linea_id", SmallInteger),
+    Column("estacion_num", SmallInteger),
+    Column("evento", String, nullable=False),
+    Column("contador", Integer),
+    Column("timestamp", DateTime(timezone=True), nullable=False),
+    Column("created_at", DateTime(timezone=True)),
+    Index("ix_bench_legacy_id", "id"),
+    Index("ix_bench_legacy_linea_ts", "linea_id", "timestamp"),
+    Index("ix_bench_legacy_linea_est_ts", "linea_id", "estacion_num", "timestamp"),
+)
+
+compacto = Table(
+    "bench_eventos_compacto", meta,
+    Column("id", Integer, primary_key=True),
+    Column("contador", Integer),
+    Column("timestamp", DateTime(timezone=True), nullable=False),
+    Column("linea_id", SmallInteger, nullable=False),
+    Column("estacion_num", SmallInteger, nullable=False),
+    Column("evento", SmallInteger, nullable=False),
+    Index("ix_bench_compacto_linea_ts", "linea_id", "timestamp"),
+    Index("ix_bench_compacto_linea_est_ts", "linea_id", "estacion_num", "timestamp"),
+)
+
+
+def generar(por_hora: int, dias: int):
+    """Eventos GOOD: cada estación produce `por_hora` piezas por hora con jitter."""
+    rnd = random.Random(42)
+    fin = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    inicio = fin - timedelta(days=dias)
+    paso = 3600 / por_hora
+    total_seg = int((fin - inicio).total_seconds())
+    contadores = {}
+    for i in range(int(total_seg / paso)):
+        base = inicio + timedelta(seconds=i * paso)
+        for linea in LINEAS:
+            for est in ESTACIONES:
+                num = linea * 100 + est
+                contadores[num] = contadores.get(num, 0) + 1
+                ts = base + timedelta(seconds=rnd.uniform(0, paso))
+                yield linea, num, contadores[num], ts
+
+
+def llenar(conn, por_hora: int, dias: int) -> int:
+    filas_l, filas_c, n = [], [], 0
+    for linea, num, contador, ts in generar(por_hora, dias):
+        filas_l.append({
+            "linea": f"L{linea}", "estacion": str(num), "linea_id": linea, "estacion_num": num,
+            "evento": "GOOD", "contador": contador, "timestamp": ts,
+            "created_at": ts + timedelta(milliseconds=5),
+        })
+        filas_c.append({
+            "linea_id": linea, "estacion_num": num, "evento": 1,
+            "contador": contador, "timestamp": ts,
+        })
+        n += 1
+        if len(filas_l) >= LOTE:
+            conn.execute(legacy.insert(), filas_l)
+            conn.execute(compacto.insert(), filas_c)
+            filas_l, filas_c = [], []
+    if filas_l:
+        conn.execute(legacy.insert(), filas_l)
+        conn.execute(compacto.insert(), filas_c)
+    return n
+
+
+def tamanos(conn, tabla: str) -> tuple:
+    """(bytes tabla, bytes índices)"""
+    if conn.dialect.name == "postgresql":
+        fila = conn.execute(text(
+            "SELECT pg_relation_size(:t), pg_indexes_size(:t)"
+        ), {"t": tabla}).one()
+        return int(fila[0]), int(fila[1])
+    # SQLite: páginas por objeto (requiere SQLITE_ENABLE_DBSTAT_VTAB)
+    indices = conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t"
+    ), {"t": tabla}).scalars().all()
+    paginas = dict(conn.execute(text(
+        "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"
+    )).all())
+    return int(paginas.get(tabla, 0)), int(sum(paginas.get(i, 0) for i in indices))
+
+
+def _mb(b: int) -> str:
+    return f"{b / 1024 / 1024:9.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamaño de eventos_uph: layout anterior vs compacto")
+    parser.add_argument("--url", default=os.getenv("UPH_DATABASE_URL"), help="URL de la BD (default UPH_DATABASE_URL)")
+    parser.add_argument("--por-hora", type=int, default=30, help="Piezas por hora por estación")
+    parser.add_argument("--dias", type=int, default=14)
+    args = parser.parse_args()
+    if not args.url:
+        print("ERROR: UPH_DATABASE_URL no configurado en .env (o usar --url)")
+        sys.exit(1)
+
+    engine = create_engine(args.url)
+    meta.drop_all(engine)
+    meta.create_all(engine)
+    try:
+        with engine.begin() as conn:
+            n = llenar(conn, args.por_hora, args.dias)
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("VACUUM ANALYZE bench_eventos_legacy"))
+                conn.execute(text("VACUUM ANALYZE bench_eventos_compacto"))
+            else:
+                conn.execute(text("VACUUM"))
+            print(f"\nDataset sintético: {n:,} eventos ({args.dias} días, {args.por_hora}/h por estación, "
+                  f"{len(LINEAS)}×{len(ESTACIONES)} estaciones) — {conn.dialect.name}\n")
+            print(f"{'layout':<12} {'tabla':>12} {'índices':>12} {'total':>12} {'B/fila':>8}")
+            resultados = {}
+            for nombre, tabla in (("anterior", legacy), ("compacto", compacto)):
+                t, i = tamanos(conn, tabla.name)
+                resultados[nombre] = t + i
+                print(f"{nombre:<12} {_mb(t)} {_mb(i)} {_mb(t + i)} {(t + i) / max(n, 1):8.1f}")
+            ahorro = 1 - resultados["compacto"] / max(resultados["anterior"], 1)
+            print(f"\nAhorro total: {ahorro:.0%}")
+    finally:
+        meta.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,14 @@
 Servidor UPH - escucha en 172.29.67.223:5000
 Solo recibe eventos de PCs de linea (sin internet, VLAN 66/67)
 Después de cada GOOD notifica a localhost:8000 para broadcast WebSocket.
+Los lotes del outbox de los clientes (/eventos/lote) notifican una vez por línea.
 """
 import uvicorn
 import httpx
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 import csv
@@ -16,10 +17,15 @@ from pathlib import Path
 
 load_dotenv()
 
-from app.database_uph import get_uph_db
-from app.models.uph_models import EventoUPH
+from app.database_uph import get_uph_db, uph_engine
+from app.models.uph_models import EventoUPH, verificar_layout_eventos
+from app.services.lineas_service import lineas_service, estacion_num
+from app.services.eventos_service import eventos_service, MAX_CANTIDAD
+from app.services.descanso_service import descanso_service, turno_id_actual
 from sqlalchemy.orm import Session
 
+verificar_layout_eventos(uph_engine)
+
 app = FastAPI(title="UPH Server", docs_url="/docs")
 
 app.add_middleware(
@@ -39,51 +45,109 @@ class EventoIn(BaseModel):
     evento: str
     contador: Optional[int] = None
     timestamp: Optional[str] = None
+    cantidad: int = Field(1, ge=1, le=MAX_CANTIDAD)   # piezas (rango contador_desde..contador)
+    contador_desde: Optional[int] = None
+
+
+class EventoLoteIn(EventoIn):
+    uid: str
+
+
+class LoteEventosIn(BaseModel):
+    eventos: List[EventoLoteIn] = Field(..., max_length=500)
 
 
-def _append_csv(linea, estacion, evento, contador, ts):
+def _append_csv(linea, estacion, evento, contador, ts, cantidad=1):
     fecha = ts.strftime("%Y%m%d")
     archivo = UPH_CSV_DIR / f"uph_backup_{fecha}.csv"
     escribir_header = not archivo.exists()
     with open(archivo, "a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         if escribir_header:
-            writer.writerow(["timestamp", "linea", "estacion", "evento", "contador"])
-        writer.writerow([ts.isoformat(), linea, estacion, evento, contador])
+            writer.writerow(["timestamp", "linea", "estacion", "evento", "contador", "cantidad"])
+        writer.writerow([ts.isoformat(), linea, estacion, evento, contador, cantidad])
 
 
 MAIN_APP_NOTIFY = "http://127.0.0.1:8000/api/uph/internal/notify"
 
 
+async def _notificar(linea, estacion, contador, ts, cantidad=1):
+    """Notificar al app principal para que haga broadcast WebSocket (fire & forget)"""
+    try:
+        async with httpx.AsyncClient(timeout=1.0) as client:
+            await client.post(MAIN_APP_NOTIFY, json={
+                "linea":    linea,
+                "estacion": estacion,
+                "contador": contador,
+                "cantidad": cantidad,
+                "ts":       ts.isoformat(),
+            })
+    except Exception:
+        pass  # No bloquear si el app principal no está disponible
+
+
 @app.post("/evento", status_code=201)
 @app.post("/api/uph/evento", status_code=201)
 async def recibir_evento(evento: EventoIn, db: Session = Depends(get_uph_db)):
     if evento.evento != "GOOD":
         return {"ok": False, "detalle": "Solo se registran GOOD"}
 
+    est_num = estacion_num(evento.estacion)
+    linea_id = lineas_service.resolver(db, evento.linea) if est_num is not None else None
+    if linea_id is None or est_num is None:
+        raise HTTPException(status_code=422, detail="Línea o estación no reconocida")
+
     ts = datetime.now(timezone.utc)
     registro = EventoUPH(
-        linea=evento.linea,
-        estacion=evento.estacion,
+        linea_id=linea_id,
+        estacion_num=est_num,
         evento=evento.evento,
         contador=evento.contador,
         timestamp=ts,
+        cantidad=evento.cantidad,
+        contador_desde=evento.contador_desde,
     )
     db.add(registro)
     db.commit()
-    _append_csv(evento.linea, evento.estacion, evento.evento, evento.contador, ts)
-    print(f"[{ts.strftime('%H:%M:%S')}] OK  {evento.linea} | {evento.estacion} | cnt={evento.contador}")
-
-    # Notificar al app principal para que haga broadcast WebSocket (fire & forget)
-    try:
-        async with httpx.AsyncClient(timeout=1.0) as client:
-            await client.post(MAIN_APP_NOTIFY)
-    except Exception:
-        pass  # No bloquear si el app principal no está disponible
+    _append_csv(evento.linea, evento.estacion, evento.evento, evento.contador, ts, evento.cantidad)
+    print(f"[{ts.strftime('%H:%M:%S')}] OK  {evento.linea} | {evento.estacion} | cnt={evento.contador}"
+          + (f" (+{evento.cantidad})" if evento.cantidad > 1 else ""))
 
+    await _notificar(evento.linea, evento.estacion, evento.contador, ts, evento.cantidad)
     return {"ok": True, "id": registro.id}
 
 
+@app.post("/eventos/lote")
+@app.post("/api/uph/eventos/lote")
+async def recibir_lote(lote: LoteEventosIn, db: Session = Depends(get_uph_db)):
+    """Lote del outbox del cliente OCR; idempotente (reenvíos → duplicados)."""
+    r = eventos_service.registrar_lote(db, lote.eventos)
+    for fila, e in r["nuevos"]:
+        _append_csv(e.linea, e.estacion, e.evento, e.contador, fila["timestamp"], e.cantidad)
+    if r["nuevos"] or r["duplicados"]:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] LOTE {len(r['nuevos'])} nuevos "
+              f"({sum(e.cantidad for _, e in r['nuevos'])} piezas), "
+              f"{len(r['duplicados'])} duplicados, {len(r['rechazados'])} rechazados")
+    for fila, e in r["ultimos"].values():
+        await _notificar(e.linea, e.estacion, e.contador, fila["timestamp"], e.cantidad)
+    return {
+        "ok": True,
+        "aceptados": r["aceptados"],
+        "duplicados": r["duplicados"],
+        "rechazados": r["rechazados"],
+    }
+
+
+@app.get("/ocr/descanso/{linea}")
+@app.get("/api/uph/ocr/descanso/{linea}")
+def estado_descanso_ocr(linea: str, db: Session = Depends(get_uph_db)):
+    """Descanso activo de la línea; el cliente OCR baja su frecuencia de muestreo."""
+    linea_id = lineas_service.id_linea(linea)   # solo lectura: nunca crea la línea
+    if linea_id is None:
+        raise HTTPException(status_code=404, detail="Línea no encontrada")
+    return {"linea": linea, **descanso_service.estado(db, linea_id, turno_id_actual())}
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -1,9 +1,11 @@
 """
 Configuración compartida para tests
 """
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -23,6 +25,46 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+class ContadorConsultas:
+    """Sentencias SQL emitidas mientras está registrado en los engines."""
+
+    def __init__(self):
+        self.sentencias = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.sentencias.append(statement)
+
+    @property
+    def total(self) -> int:
+        return len(self.sentencias)
+
+    def detalle(self) -> str:
+        return f"{self.total} consultas:\n" + "\n".join(self.sentencias)
+
+
+@pytest.fixture
+def contar_consultas():
+    """Contar consultas SQL de un bloque (BD principal de tests + engines extra).
+
+    Uso:
+        with contar_consultas(uph_engine) as n:
+            client.get(...)
+        assert n.total <= 5, n.detalle()
+    """
+    @contextmanager
+    def _contar(*engines):
+        contador = ContadorConsultas()
+        engines = (engine,) + engines
+        for e in engines:
+            event.listen(e, "before_cursor_execute", contador)
+        try:
+            yield contador
+        finally:
+            for e in engines:
+                event.remove(e, "before_cursor_execute", contador)
+    return _contar
+
+
 @pytest.fixture(scope="function")
 def db():
     """Crear base de datos de prueba para cada test"""
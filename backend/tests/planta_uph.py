@@ -0,0 +1,81 @@
+"""
+Planta UPH sintética compartida por tests/test_query_budget.py y benchmarks/.
+
+6 líneas × 8 estaciones, 3 turnos con operadores asignados hoy, plan activo,
+plan del día y `dias` de eventos GOOD. El reloj del router UPH se fija en un
+miércoles 10:00 (turno A activo, semana del ranking en curso) para que los
+resultados no dependan de la hora a la que se corre.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.models.uph_models import (
+    Linea, Turno, Operador, Asignacion, ModeloUPH, PlanLinea, PlanDiaLinea, EventoUPH,
+)
+from app.routers.uph import seed_lineas
+
+LINEAS = 6
+ESTACIONES = 8
+LOTE = 20000
+
+AHORA_LOCAL = datetime(2026, 10, 14, 10, 0)   # miércoles, turno A
+
+
+class Reloj(datetime):
+    """Sustituto de `datetime` en el router: now() devuelve AHORA_LOCAL."""
+    @classmethod
+    def now(cls, tz=None):
+        return AHORA_LOCAL.astimezone(tz) if tz else AHORA_LOCAL
+
+
+def sembrar_planta(db, dias: int, por_hora: int) -> int:
+    """Siembra la planta con `por_hora` piezas/h por estación; devuelve los eventos insertados."""
+    rnd = random.Random(42)
+    seed_lineas(db)
+    for nombre, inicio, fin, dias_turno in (("A", "06:00", "18:00", "Lunes-Sábado"),
+                                            ("B", "18:00", "06:00", "Lunes-Sábado"),
+                                            ("C", "08:00", "20:00", "Lunes-Viernes")):
+        db.add(Turno(nombre=nombre, hora_inicio=inicio, hora_fin=fin, dias=dias_turno))
+    modelos = [ModeloUPH(nombre=f"55U7{i}", uph_total=100 + 10 * i, uph_hi6=90, uph_hi2=80) for i in range(4)]
+    db.add_all(modelos)
+    db.commit()
+
+    hoy = AHORA_LOCAL.strftime("%Y-%m-%d")
+    ahora = AHORA_LOCAL.astimezone(timezone.utc)
+    lineas = db.query(Linea).order_by(Linea.id).all()[:LINEAS]
+    for turno in db.query(Turno).all():
+        for linea in lineas:
+            n = int(linea.nombre.split("-")[1])
+            for j in range(1, ESTACIONES + 1):
+                num = f"{turno.nombre}{n}{j:02d}"
+                db.add(Operador(num_empleado=num, nombre=f"Operador {num}", turno=turno.nombre))
+                db.add(Asignacion(num_empleado=num, estacion=f"{n}{j:02d}", linea_id=linea.id,
+                                  fecha=hoy, turno_id=turno.id, modelo_id=modelos[n % 4].id))
+    for linea in lineas:
+        n = int(linea.nombre.split("-")[1])
+        db.add(PlanLinea(linea_id=linea.id, modelo_id=modelos[n % 4].id, plan_total=800,
+                         fecha=hoy, activo=True, creado_en=ahora - timedelta(hours=3)))
+        for orden in range(2):
+            db.add(PlanDiaLinea(linea_id=linea.id, modelo_id=modelos[(n + orden) % 4].id,
+                                fecha=hoy, plan_piezas=400, orden=orden))
+    db.commit()
+
+    paso = 3600 / por_hora
+    inicio = ahora - timedelta(days=dias)
+    total, lote = 0, []
+    for k in range(int(dias * 86400 / paso)):
+        base = inicio + timedelta(seconds=k * paso)
+        for linea in lineas:
+            n = int(linea.nombre.split("-")[1])
+            for j in range(1, ESTACIONES + 1):
+                lote.append({"linea_id": linea.id, "estacion_num": n * 100 + j, "evento": "GOOD",
+                             "contador": k % 30 + 1, "timestamp": base + timedelta(seconds=rnd.uniform(0, paso))})
+        if len(lote) >= LOTE:
+            db.execute(EventoUPH.__table__.insert(), lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        db.execute(EventoUPH.__table__.insert(), lote)
+        total += len(lote)
+    db.commit()
+    return total
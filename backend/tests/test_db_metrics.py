@@ -0,0 +1,22 @@
+"""
+Tests de la instrumentación de consultas SQL por petición
+"""
+from app.auth import create_access_token
+from app.services.monitoring_service import instrumentar_engine, _operacion_tabla
+from tests.conftest import engine
+
+
+def test_operacion_tabla():
+    assert _operacion_tabla("SELECT a FROM eventos_uph WHERE x = 1") == ("SELECT", "eventos_uph")
+    assert _operacion_tabla('INSERT INTO "jigs" (a) VALUES (?)') == ("INSERT", "jigs")
+    assert _operacion_tabla("UPDATE lineas SET nombre = ?") == ("UPDATE", "lineas")
+
+
+def test_header_cuenta_consultas(client, test_user):
+    """Peticiones que tocan la BD reportan X-DB-Queries / X-DB-Time fuera de producción"""
+    instrumentar_engine(engine, "test")
+    token = create_access_token(data={"sub": test_user.usuario})
+    response = client.get("/api/jigs/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Queries"]) >= 1
+    assert response.headers["X-DB-Time"].endswith("ms")
@@ -0,0 +1,113 @@
+"""
+Tests del resolver de descansos (tablas por minuto de la semana y descansos manuales)
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+
+from app.auth import create_access_token
+from app.database_uph import UphBase, get_uph_db
+from app.models.uph_models import DescansoLinea, Linea
+from app.routers.uph import seed_lineas
+from app.services import descanso_service as modulo
+from app.services.descanso_service import descanso_service
+from app.services.lineas_service import lineas_service
+from app.services.version_service import VersionService
+from main import app
+import run_uph   # después de main: sus tablas ya existen
+
+# 2026-10-19 es lunes
+LUNES = datetime(2026, 10, 19)
+
+
+def test_descanso_fijo_turno_a():
+    """Turno A: 09:30-10:00 es descanso, 10:00 ya no"""
+    assert descanso_service.en_descanso_fijo(1, LUNES.replace(hour=9, minute=45))
+    assert not descanso_service.en_descanso_fijo(1, LUNES.replace(hour=10, minute=0))
+
+
+def test_descanso_fijo_turno_c_viernes_vs_finde():
+    """Turno C usa horario de viernes (= A) o de fin de semana según el día"""
+    viernes = datetime(2026, 10, 23, 14, 15)
+    sabado = datetime(2026, 10, 24, 14, 15)
+    assert descanso_service.en_descanso_fijo(3, viernes)
+    assert not descanso_service.en_descanso_fijo(3, sabado)
+    assert descanso_service.en_descanso_fijo(3, sabado.replace(hour=9, minute=10))
+
+
+def test_minutos_descanso_en_turno():
+    """Turno A completo (06:30-18:30) tiene 60 minutos de descanso fijo"""
+    desde = LUNES.replace(hour=6, minute=30)
+    hasta = LUNES.replace(hour=18, minute=30)
+    assert descanso_service.minutos_descanso(1, desde, hasta) == 60
+    assert descanso_service.minutos_descanso(1, desde, LUNES.replace(hour=9, minute=40)) == 10
+
+
+def test_descanso_manual_de_otro_proceso_sin_redis(monkeypatch):
+    """Sin Redis la versión no se comparte: otra instancia (run_uph.py) relee la BD
+    tras RECARGA_SIN_REDIS_SEG en lugar de quedarse con el estado del arranque"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    UphBase.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        linea = Linea(nombre="HI-6")
+        db.add(linea)
+        db.commit()
+        otro_proceso = modulo.DescansoService()
+        assert otro_proceso.manual_activo(db, linea.id) is None
+
+        descanso = DescansoLinea(linea_id=linea.id, inicio=datetime.now(timezone.utc), activo=True)
+        db.add(descanso)
+        db.commit()
+        monkeypatch.setattr(modulo, "RECARGA_SIN_REDIS_SEG", 0)
+        assert otro_proceso.manual_activo(db, linea.id) is not None
+
+        descanso.fin, descanso.activo = datetime.now(timezone.utc), False
+        db.commit()
+        assert otro_proceso.manual_activo(db, linea.id) is None
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_ocr_descanso_refleja_descanso_manual_de_la_app_principal(client, admin_user, tmp_path, monkeypatch):
+    """Descanso iniciado y terminado en la app principal; /ocr/descanso de run_uph.py
+    (otro proceso: instancia propia del servicio, sin Redis) lo ve empezar y acabar"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'uph.db'}", connect_args={"check_same_thread": False})
+    UphBase.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+
+    def override_get_uph_db():
+        sesion = Sesion()
+        try:
+            yield sesion
+        finally:
+            sesion.close()
+
+    app.dependency_overrides[get_uph_db] = override_get_uph_db
+    run_uph.app.dependency_overrides[get_uph_db] = override_get_uph_db
+    # Otro proceso sin Redis: su propia instancia y sus propios contadores de versión
+    monkeypatch.setattr(modulo, "version_service", VersionService())
+    monkeypatch.setattr(run_uph, "descanso_service", modulo.DescansoService())
+    monkeypatch.setattr(modulo, "RECARGA_SIN_REDIS_SEG", 0)
+    db = Sesion()
+    try:
+        seed_lineas(db)
+        ocr = TestClient(run_uph.app)
+        headers = {"Authorization": f"Bearer {create_access_token(data={'sub': admin_user.usuario})}"}
+        assert ocr.get("/ocr/descanso/L6").json()["tipo"] != "manual"
+
+        assert client.post("/api/uph/descanso/HI-6", headers=headers).status_code == 201
+        assert ocr.get("/ocr/descanso/L6").json()["tipo"] == "manual"
+
+        assert client.put("/api/uph/descanso/HI-6/fin", headers=headers).status_code == 200
+        assert ocr.get("/ocr/descanso/L6").json()["tipo"] != "manual"
+    finally:
+        run_uph.app.dependency_overrides.clear()
+        db.close()
+        engine.dispose()
+        lineas_service._cargado = False
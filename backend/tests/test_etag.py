@@ -0,0 +1,63 @@
+"""
+Tests de GET condicional (ETag / If-None-Match)
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from app.auth import create_access_token
+from app.models.models import Validacion
+from app.services.version_service import version_service, JIGS
+from app.tasks import cleanup_task
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def headers(test_user):
+    """Token emitido directamente (sin pasar por el login con rate limit)"""
+    token = create_access_token(data={"sub": test_user.usuario})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_get_jigs_emite_etag(client, headers):
+    """La lista de jigs devuelve ETag y Cache-Control: no-cache"""
+    response = client.get("/api/jigs/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_get_jigs_304_si_no_hay_cambios(client, headers):
+    """Con If-None-Match vigente se responde 304 sin cuerpo"""
+    etag = client.get("/api/jigs/", headers=headers).headers["etag"]
+
+    response = client.get("/api/jigs/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_get_jigs_etag_cambia_tras_escritura(client, headers):
+    """Un bump del dominio invalida el ETag anterior"""
+    etag = client.get("/api/jigs/", headers=headers).headers["etag"]
+
+    version_service.bump(JIGS)
+
+    response = client.get("/api/jigs/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("tarea", ["mark_no_validado_for_date", "cleanup_daily_validations"])
+def test_tarea_programada_invalida_etag_de_validaciones(client, db, test_user, headers, monkeypatch, tarea):
+    """Las tareas de limpieza escriben validaciones fuera de los routers: también hacen bump"""
+    db.add(Validacion(tecnico_id=test_user.id, turno="A", estado="OK", fecha=datetime.now()))
+    db.commit()
+    etag = client.get("/api/validations/", headers=headers).headers["etag"]
+
+    monkeypatch.setattr(cleanup_task, "SessionLocal", TestingSessionLocal)
+    assert getattr(cleanup_task, tarea)(datetime.now().date(), "test") == 1
+
+    response = client.get("/api/validations/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
@@ -0,0 +1,144 @@
+"""
+Tests de la hora de captura en lotes de eventos del outbox OCR
+"""
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database_uph import UphBase, get_uph_db
+from app.models.uph_models import EventoUPH, PIEZAS
+from app.routers import uph
+from app.routers.uph import seed_lineas
+from app.services.eventos_service import MAX_CANTIDAD, eventos_service, ts_cliente
+from app.services.lineas_service import lineas_service
+from main import app
+
+# El cliente OCR vive en la raíz del repositorio, fuera de backend/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from fase2_ocr_cliente import Enviador, Outbox  # noqa: E402
+
+AHORA = datetime(2026, 10, 14, 16, 0, tzinfo=timezone.utc)
+
+
+def test_ts_cliente_con_offset():
+    """ISO con offset (hora de la PC de línea) → UTC"""
+    assert ts_cliente("2026-10-14T09:30:00-06:00", AHORA) == datetime(2026, 10, 14, 15, 30, tzinfo=timezone.utc)
+    assert ts_cliente("2026-10-14T15:30:00Z", AHORA) == datetime(2026, 10, 14, 15, 30, tzinfo=timezone.utc)
+
+
+def test_ts_cliente_invalido_o_futuro():
+    """Sin hora, inválida o con el reloj adelantado → hora del servidor"""
+    assert ts_cliente(None, AHORA) == AHORA
+    assert ts_cliente("ayer", AHORA) == AHORA
+    futuro = (AHORA + timedelta(minutes=10)).isoformat()
+    assert ts_cliente(futuro, AHORA) == AHORA
+
+
+def _evento(uid, contador, cantidad=1, contador_desde=None, ts="2026-10-14T09:30:00-06:00"):
+    return SimpleNamespace(uid=uid, linea="L6", estacion="604", evento="GOOD", contador=contador,
+                           timestamp=ts, cantidad=cantidad, contador_desde=contador_desde)
+
+
+def test_lote_con_cantidad_suma_piezas():
+    """Un registro con cantidad > 1 cuenta todas sus piezas; el reenvío es duplicado"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    UphBase.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        seed_lineas(db)
+        lineas_service.cargar(db)
+        lote = [
+            _evento("a", 28),                                              # cliente viejo: 1 pieza
+            _evento("b", 1, cantidad=2, contador_desde=30, ts="2026-10-14T09:31:00-06:00"),   # AUTO-30 + 1
+        ]
+        r = eventos_service.registrar_lote(db, lote)
+        assert r["aceptados"] == ["a", "b"]
+        assert eventos_service.registrar_lote(db, lote)["duplicados"] == ["a", "b"]
+
+        assert db.query(EventoUPH).count() == 2
+        assert db.query(PIEZAS).scalar() == 3
+        fila = db.query(EventoUPH).filter(EventoUPH.contador == 1).one()
+        assert (fila.contador_desde, fila.cantidad) == (30, 2)
+    finally:
+        db.close()
+        lineas_service._cargado = False
+
+
+def _uph_db(tmp_path, monkeypatch):
+    """Base UPH en archivo con las líneas sembradas, servida a la app principal"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'uph.db'}")
+    UphBase.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    db = Sesion()
+    seed_lineas(db)
+
+    def override_get_uph_db():
+        sesion = Sesion()
+        try:
+            yield sesion
+        finally:
+            sesion.close()
+
+    app.dependency_overrides[get_uph_db] = override_get_uph_db
+    monkeypatch.setattr(uph, "UPH_CSV_DIR", tmp_path)
+    return engine, db
+
+
+def test_lote_http_rechazados_y_duplicados(client, tmp_path, monkeypatch):
+    """POST /eventos/lote: línea desconocida → rechazado con motivo, reenvío → duplicado,
+    más de 500 eventos → 422"""
+    engine, db = _uph_db(tmp_path, monkeypatch)
+    try:
+        lote = {"eventos": [
+            {"uid": "a", "linea": "L6", "estacion": "604", "evento": "GOOD", "contador": 5,
+             "timestamp": "2026-10-14T09:30:00-06:00"},
+            {"uid": "b", "linea": "L99", "estacion": "604", "evento": "GOOD", "contador": 6},
+        ]}
+        r = client.post("/api/uph/eventos/lote", json=lote).json()
+        assert (r["aceptados"], r["duplicados"], list(r["rechazados"])) == (["a"], [], ["b"])
+
+        r = client.post("/api/uph/eventos/lote", json=lote).json()
+        assert (r["aceptados"], r["duplicados"], list(r["rechazados"])) == ([], ["a"], ["b"])
+        assert db.query(EventoUPH).count() == 1
+
+        grande = {"eventos": [{**lote["eventos"][0], "uid": str(i)} for i in range(501)]}
+        assert client.post("/api/uph/eventos/lote", json=grande).status_code == 422
+    finally:
+        db.close()
+        engine.dispose()
+        lineas_service._cargado = False
+
+
+def test_enviador_aisla_eventos_invalidos(client, tmp_path, monkeypatch):
+    """Un 422 del lote no bloquea el outbox: se parte hasta aislar el evento
+    inválido, que queda rechazado; el resto se registra"""
+    engine, db = _uph_db(tmp_path, monkeypatch)
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    try:
+        outbox.encolar("L6", "604", 1)
+        outbox.encolar("L6", "604", 2)
+        outbox.encolar("L6", "604", 3, cantidad=MAX_CANTIDAD + 1, contador_desde=1)   # 422
+        outbox.encolar("L99", "604", 4)                                                 # línea desconocida
+        outbox.encolar("L6", "604", 5)
+
+        assert Enviador(outbox, "/api/uph", lote_max=5000).lote_max == Enviador.LOTE_MAX_SERVIDOR
+        enviador = Enviador(outbox, "/api/uph")
+        enviador._sesion = client
+        enviador._enviar(outbox.pendientes(enviador.lote_max))
+
+        assert outbox.profundidad() == 0
+        rechazados = outbox._db.execute("SELECT payload FROM outbox WHERE estado = 'rechazado'").fetchall()
+        assert sorted(json.loads(p)["contador"] for (p,) in rechazados) == [3, 4]
+        assert sorted(c for (c,) in db.query(EventoUPH.contador)) == [1, 2, 5]
+    finally:
+        outbox.cerrar()
+        db.close()
+        engine.dispose()
+        lineas_service._cargado = False
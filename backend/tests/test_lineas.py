@@ -0,0 +1,84 @@
+"""
+Tests de la resolución de alias de línea/estación para eventos UPH
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database_uph import UphBase, get_uph_db
+from app.models.uph_models import Linea
+from app.routers.uph import seed_lineas
+from app.services.lineas_service import lineas_service, numero_linea, nombre_evento, estacion_num
+from main import app
+
+
+def test_numero_linea_alias():
+    """L6, HI-6, hi6 y 6 son la misma línea; nombres libres no tienen número"""
+    assert {numero_linea(n) for n in ("L6", "HI-6", "hi6", " 6 ")} == {6}
+    assert numero_linea("L11") == 11
+    assert numero_linea("SMT") is None
+    assert numero_linea(None) is None
+
+
+def test_nombre_evento():
+    """Nombre BD → nombre que envía la PC de línea"""
+    assert nombre_evento("HI-6") == "L6"
+    assert nombre_evento("L6") == "L6"
+    assert nombre_evento("SMT") == "SMT"
+
+
+def test_estacion_num():
+    assert estacion_num("604") == 604
+    assert estacion_num(" 0604 ") == 604
+    assert estacion_num("A1") is None
+
+
+def test_resolver_solo_crea_lineas_legacy(tmp_path):
+    """Nombres desconocidos no crean líneas; L7–L11 sí, y su id queda en BD aunque
+    el llamador haga rollback"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'uph.db'}")
+    UphBase.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        seed_lineas(db)
+        total = db.query(Linea).count()
+        for nombre in ("604", "L99", "SMT"):
+            assert lineas_service.resolver(db, nombre) is None
+        assert db.query(Linea).count() == total
+
+        linea_id = lineas_service.resolver(db, "L7")
+        db.rollback()
+        assert db.get(Linea, linea_id).nombre == "HI-7"
+        assert lineas_service.resolver(db, "HI-7") == linea_id
+    finally:
+        db.close()
+        engine.dispose()
+        lineas_service._cargado = False
+
+
+def test_descanso_ocr_no_crea_lineas(client, tmp_path):
+    """/ocr/descanso es de solo lectura: una línea desconocida (aunque sea legacy)
+    da 404 y no se crea"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'uph.db'}")
+    UphBase.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    db = Sesion()
+
+    def override_get_uph_db():
+        sesion = Sesion()
+        try:
+            yield sesion
+        finally:
+            sesion.close()
+
+    app.dependency_overrides[get_uph_db] = override_get_uph_db
+    try:
+        seed_lineas(db)
+        total = db.query(Linea).count()
+        assert client.get("/api/uph/ocr/descanso/L6").status_code == 200
+        for nombre in ("L7", "L99"):
+            assert client.get(f"/api/uph/ocr/descanso/{nombre}").status_code == 404
+        assert db.query(Linea).count() == total
+    finally:
+        db.close()
+        engine.dispose()
+        lineas_service._cargado = False
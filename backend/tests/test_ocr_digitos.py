@@ -0,0 +1,37 @@
+"""
+Tests del reconocedor de dígitos por plantillas (ocr_digitos.py)
+"""
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# El reconocedor vive en la raíz del repositorio, fuera de backend/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ocr_digitos import DIGITOS, ReconocedorDigitos, segmentar  # noqa: E402
+
+
+def _pantalla(texto):
+    img = np.zeros((40, 30 * len(texto) + 10), np.uint8)
+    cv2.putText(img, texto, (5, 32), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 255, 2)
+    return img
+
+
+PLANTILLAS = {d: segmentar(_pantalla(d))[0] for d in DIGITOS}
+
+
+def test_lee_contador_con_plantillas():
+    texto, confianza = ReconocedorDigitos(PLANTILLAS).leer(_pantalla("1890"))
+    assert texto == "1890" and confianza > 0.9
+
+
+def test_glifo_ambiguo_no_da_confianza():
+    """Si la segunda plantilla casi empata con la mejor (8 vs 9 mal calibrados),
+    la correlación alta no basta: confianza 0 → Tesseract"""
+    plantillas = {**PLANTILLAS, "9": 0.97 * PLANTILLAS["8"] + 0.03 * PLANTILLAS["9"]}
+    assert ReconocedorDigitos(plantillas).leer(_pantalla("18"))[1] == 0.0
+
+    # Sin margen exigido se aceptaría la lectura con confianza ~1
+    assert ReconocedorDigitos(plantillas, margen_min=0.0).leer(_pantalla("18"))[1] > 0.9
@@ -0,0 +1,84 @@
+"""
+Tests del voto de lecturas del contador en el cliente OCR (fase2_ocr_cliente.py)
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+# El cliente OCR vive en la raíz del repositorio, fuera de backend/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from fase2_ocr_cliente import Capturador, Frame, ProcesadorOCR, VotoContador  # noqa: E402
+
+
+def _votar(*lecturas):
+    """Inicia el voto con la primera lectura y devuelve los eventos de las demás."""
+    voto = VotoContador()
+    voto.votar(lecturas[0])
+    eventos = [e for lectura in lecturas[1:] for e in voto.votar(lectura)[0]]
+    return voto, eventos
+
+
+def test_lectura_fantasma_se_descarta():
+    """17 → 11 → 18: el 11 queda DUDOSA y se descarta al llegar el 18"""
+    voto, eventos = _votar("17", "11", "18")
+    assert eventos == [(18, "ok")]
+    assert voto.descartadas == 1 and voto.pendiente is None
+
+
+def test_pieza_perdida_se_rellena():
+    """17 → 19 → 20: el 20 confirma el 19 y se rellena la pieza 18"""
+    voto, eventos = _votar("17", "19", "20")
+    assert eventos == [(18, "relleno"), (19, "ok"), (20, "ok")]
+    assert voto.rellenos == 1
+
+
+def test_reinicio_de_pallet():
+    """29 → 1 es plausible (30 no se muestra); 28 → 2 necesita confirmación y rellena 29 y 1"""
+    assert _votar("29", "1")[1] == [(1, "ok")]
+
+    voto, eventos = _votar("28", "2")
+    assert eventos == [] and voto.pendiente == 2
+    assert voto.votar("2")[0] == [(29, "relleno"), (1, "relleno"), (2, "ok")]
+
+
+def test_salto_confirmado_por_relectura():
+    """Cambio de modelo / reinicio manual: el salto se acepta al releer el mismo valor"""
+    voto, eventos = _votar("17", "5")
+    assert eventos == [] and voto.pendiente == 5
+    assert voto.votar("5")[0] == [(5, "salto")]
+    assert voto.saltos == 1 and voto.aceptado == 5
+
+
+def test_capturador_cuenta_relecturas():
+    """pedir_relecturas(n) habilita n capturas sin cambio de píxeles; no se acumulan"""
+    capturador = Capturador({}, None, None, None)
+    capturador.pedir_relecturas(2)
+    capturador.pedir_relecturas(1)
+    assert [capturador._tomar_relectura() for _ in range(3)] == [True, True, False]
+
+
+def test_procesador_pide_relecturas_con_pendiente():
+    """Con una lectura DUDOSA el procesador pide relecturas: la pantalla quieta no
+    genera frames y el pendiente nunca se votaría"""
+    pedidas = []
+    encolados = []
+    procesador = ProcesadorOCR(
+        cola=None,
+        lector=SimpleNamespace(contador=lambda img: img),
+        outbox=SimpleNamespace(encolar=lambda *a, **k: encolados.append((a, k)), profundidad=lambda: 0),
+        enviador=SimpleNamespace(avisar=lambda: None),
+        linea="L6", patron=None,
+        memo=SimpleNamespace(leer=lambda img, fn: "604"),
+        voto=VotoContador(),
+        pedir_relecturas=pedidas.append, relecturas=3,
+    )
+    ahora = datetime.now().astimezone()
+    for lectura in ("17", "5"):
+        procesador._procesar(Frame(ahora, lectura, None))
+    assert pedidas == [3]
+
+    procesador._procesar(Frame(ahora, "5", None))   # relectura: confirma el salto
+    assert pedidas == [3]
+    assert [k["cantidad"] for _, k in encolados] == [1]
@@ -0,0 +1,86 @@
+"""
+Tests de la carga del plan del día (POST /api/uph/plan/subir)
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.auth import create_access_token
+from app.database_uph import UphBase, get_uph_db
+from app.models.uph_models import Linea, ModeloUPH, PlanLinea, PlanDiaLinea
+from app.routers.uph import seed_lineas
+from main import app
+
+uph_engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+UphTestingSession = sessionmaker(autocommit=False, autoflush=False, bind=uph_engine)
+
+
+@pytest.fixture
+def uph_db(client):
+    """BD UPH en memoria con las líneas sembradas y un modelo existente."""
+    UphBase.metadata.create_all(bind=uph_engine)
+    db = UphTestingSession()
+    seed_lineas(db)
+    db.add(ModeloUPH(nombre="55U75QUF", uph_hi6=80, uph_total=80))
+    db.commit()
+
+    def override_get_uph_db():
+        sesion = UphTestingSession()
+        try:
+            yield sesion
+        finally:
+            sesion.close()
+
+    app.dependency_overrides[get_uph_db] = override_get_uph_db
+    try:
+        yield db
+    finally:
+        db.close()
+        UphBase.metadata.drop_all(bind=uph_engine)
+
+
+def test_plan_subir_modelos_nuevos_y_existentes(client, uph_db):
+    """Modelos existentes se actualizan, los nuevos se insertan y cada fila queda en PlanDiaLinea"""
+    filas = [
+        {"linea": "HI-6", "modelo": "55U75QUF", "uph_meta": "90", "plan_piezas": "400",
+         "plan_piezas_dia": "400", "plan_piezas_noche": "0"},
+        {"linea": "HI-6", "modelo": "65A6N", "modelo_interno": "65A6NUR", "uph_meta": "70",
+         "plan_piezas": "300", "plan_piezas_dia": "300", "plan_piezas_noche": "x"},
+    ]
+    response = client.post("/api/uph/plan/subir", json={"filas": filas, "turno": "AC"})
+    assert response.status_code == 200
+    datos = response.json()
+    assert datos["guardados"] == 2
+    assert {"precarga", "modelos", "plan_dia", "commit", "total"} <= set(datos["tiempos_ms"])
+
+    uph_db.expire_all()
+    modelos = {m.nombre: m for m in uph_db.query(ModeloUPH).all()}
+    assert len(modelos) == 2
+    assert modelos["55U75QUF"].uph_hi6 == 90
+    assert modelos["65A6N"].modelo_interno == "65A6NUR"
+
+    hi6 = uph_db.query(Linea).filter(Linea.nombre == "HI-6").one()
+    plan_dia = uph_db.query(PlanDiaLinea).filter(PlanDiaLinea.linea_id == hi6.id).order_by(PlanDiaLinea.orden).all()
+    assert [(p.modelo_id, p.orden, p.plan_piezas) for p in plan_dia] == [
+        (modelos["55U75QUF"].id, 0, 400),
+        (modelos["65A6N"].id, 1, 300),
+    ]
+    assert plan_dia[1].plan_piezas_noche is None   # "x" no es número
+
+    activo = uph_db.query(PlanLinea).filter(PlanLinea.linea_id == hi6.id, PlanLinea.activo == True).one()
+    assert activo.modelo_id == modelos["55U75QUF"].id
+
+
+def test_resumen_con_plan_recien_subido(client, uph_db, admin_user):
+    """resumen acepta el creado_en naive que SQLite devuelve para el plan activo"""
+    filas = [{"linea": "HI-6", "modelo": "55U75QUF", "uph_meta": "90", "plan_piezas": "400"}]
+    assert client.post("/api/uph/plan/subir", json={"filas": filas, "turno": "AC"}).status_code == 200
+
+    token = create_access_token(data={"sub": admin_user.usuario})
+    response = client.get("/api/uph/resumen", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
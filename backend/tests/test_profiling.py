@@ -0,0 +1,54 @@
+"""
+Tests del profiling bajo demanda (X-Profile: 1, solo admin)
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import database
+from app.auth import create_access_token
+from app.database import get_db
+from app.routers import admin
+from app.services import profiling_service as modulo
+from app.services.monitoring_service import init_monitoring, instrumentar_engine
+from app.services.profiling_service import init_profiling, profiling_service
+from tests.conftest import engine, TestingSessionLocal
+
+
+def _app_con_profiling(db, monkeypatch):
+    """App mínima con PROFILING_ENABLED: la de main.py ya se construyó sin profiling"""
+    monkeypatch.setattr(modulo, "PROFILING_ENABLED", True)
+    # _admin_del_token abre su propia sesión de la BD principal
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    instrumentar_engine(engine, "test")
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    init_profiling(app)
+    init_monitoring(app)
+    app.dependency_overrides[get_db] = lambda: db
+    return app
+
+
+def test_profiling_solo_para_admin(db, admin_user, test_user, monkeypatch):
+    """Sin rol admin la marca se ignora; un admin recibe X-Profile-Id y el perfil
+    queda listado con su ruta y su conteo de consultas"""
+    def auth(usuario):
+        return {"Authorization": f"Bearer {create_access_token(data={'sub': usuario.usuario})}"}
+
+    with TestClient(_app_con_profiling(db, monkeypatch)) as client:
+        antes = len(profiling_service.listar())
+        r = client.get(f"/api/admin/users/{test_user.id}", headers={**auth(test_user), "X-Profile": "1"})
+        assert r.status_code == 403
+        assert "X-Profile-Id" not in r.headers
+        assert len(profiling_service.listar()) == antes
+
+        r = client.get(f"/api/admin/users/{test_user.id}", headers={**auth(admin_user), "X-Profile": "1"})
+        assert r.status_code == 200
+        perfil_id = int(r.headers["X-Profile-Id"])
+
+        perfiles = client.get("/api/admin/profiles", headers=auth(admin_user))
+        perfil = next(p for p in perfiles.json() if p["id"] == perfil_id)
+        assert perfil["ruta"] == "/api/admin/users/{user_id}"
+        assert (perfil["usuario"], perfil["status"]) == ("admin", 200)
+        assert perfil["consultas"] >= 2   # usuario del token + técnico consultado
+        assert "html" not in perfil
@@ -0,0 +1,128 @@
+"""
+Presupuesto de consultas SQL para endpoints calientes.
+
+Siembra una planta realista (6 líneas × 8 estaciones, 3 turnos, una semana de
+eventos) y verifica que cada endpoint no supere un número máximo de
+consultas. Un `for` que consulte por estación/operador rompe el presupuesto
+aunque el resultado siga siendo correcto.
+
+Si un cambio legítimo sube el conteo, ajustar el presupuesto en el mismo PR.
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.auth import create_access_token
+from app.database_uph import UphBase, get_uph_db
+from app.models.models import Jig, Validacion, Adaptador, ConectorAdaptador
+from app.routers import uph
+from app.services.lineas_service import lineas_service
+from main import app
+from tests.planta_uph import Reloj, sembrar_planta
+
+DIAS_EVENTOS = 7
+EVENTOS_POR_HORA = 6   # uno cada 10 min por estación
+
+# Máximo de consultas por endpoint: el número que cada uno necesita
+# estructuralmente, sin holgura. Cualquier consulta dentro de un `for` lo rompe.
+PRESUPUESTOS = {
+    # líneas + asignaciones(operador, modelo) + planes + plan del día
+    # + piezas por estación (turno y hora en curso) + descansos activos
+    "/api/uph/dashboard/lineas-hoy": 7,
+    # usuario + líneas + asignaciones + planes + plan del día
+    # + piezas por línea (desde el plan y en la hora en curso)
+    "/api/uph/resumen": 7,
+    # líneas + asignaciones(modelo) + piezas por línea y slot
+    "/api/uph/tendencias": 3,
+    # asignaciones de la semana + piezas por asignación + operadores
+    "/api/uph/ranking/semanal": 3,
+    # asignaciones(línea) de la semana + piezas por asignación + operadores
+    "/api/uph/ranking-semanal": 3,
+    # usuario + count + página (técnico con joinedload)
+    "/api/jigs/": 3,
+    # usuario + count + página (jig con joinedload)
+    "/api/validations/": 3,
+    # usuario + count + página + conectores (selectin) + técnicos (selectin)
+    "/api/adaptadores/?include_tecnicos=true": 5,
+}
+
+uph_engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+UphTestingSession = sessionmaker(autocommit=False, autoflush=False, bind=uph_engine)
+
+
+@pytest.fixture(scope="module")
+def planta():
+    """Planta UPH sembrada una vez por módulo."""
+    UphBase.metadata.create_all(bind=uph_engine)
+    db = UphTestingSession()
+    try:
+        sembrar_planta(db, DIAS_EVENTOS, EVENTOS_POR_HORA)
+        yield db
+    finally:
+        db.close()
+        UphBase.metadata.drop_all(bind=uph_engine)
+        lineas_service._cargado = False   # los ids sembrados no existen fuera de este módulo
+
+
+@pytest.fixture
+def uph_client(client, planta, monkeypatch):
+    """Cliente con la BD UPH de tests, reloj fijo y tabla de alias apuntando a las líneas sembradas."""
+    def override_get_uph_db():
+        db = UphTestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_uph_db] = override_get_uph_db
+    monkeypatch.setattr(uph, "datetime", Reloj)
+    lineas_service.cargar(planta)
+    return client
+
+
+@pytest.fixture
+def datos_principales(db, admin_user):
+    """Jigs con validaciones y adaptadores con conectores en la BD principal."""
+    for i in range(40):
+        jig = Jig(codigo_qr=f"QR{i:04d}", numero_jig=f"J{i}", tipo="manual", modelo_actual=f"M{i % 5}",
+                  tecnico_ultima_validacion_id=admin_user.id)
+        db.add(jig)
+        db.flush()
+        for turno in "ABC":
+            db.add(Validacion(jig_id=jig.id, tecnico_id=admin_user.id, tecnico_asignado_id=admin_user.id,
+                              turno=turno, estado="OK"))
+    for i in range(30):
+        adaptador = Adaptador(codigo_qr=f"AD{i:04d}", numero_adaptador=f"A{i}", modelo_adaptador=f"MA{i % 3}")
+        adaptador.conectores = [
+            ConectorAdaptador(nombre_conector=f"ZH-{k}", tecnico_ultima_validacion_id=admin_user.id)
+            for k in range(3)
+        ]
+        db.add(adaptador)
+    db.commit()
+
+
+@pytest.fixture
+def headers(admin_user):
+    token = create_access_token(data={"sub": admin_user.usuario})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("ruta", [r for r in PRESUPUESTOS if r.startswith("/api/uph/")])
+def test_presupuesto_uph(uph_client, headers, contar_consultas, ruta):
+    with contar_consultas(uph_engine) as n:
+        response = uph_client.get(ruta, headers=headers)
+    assert response.status_code == 200, response.text
+    assert n.total <= PRESUPUESTOS[ruta], n.detalle()
+
+
+@pytest.mark.parametrize("ruta", [r for r in PRESUPUESTOS if not r.startswith("/api/uph/")])
+def test_presupuesto_principal(client, headers, datos_principales, contar_consultas, ruta):
+    with contar_consultas() as n:
+        response = client.get(ruta, headers=headers)
+    assert response.status_code == 200, response.text
+    assert n.total <= PRESUPUESTOS[ruta], n.detalle()
@@ -13,6 +13,7 @@ Controles:
   - Presiona 1/2/3 para elegir qué zona configurar
   - Presiona ENTER para guardar y salir
   - Presiona R para retomar screenshot
+  - Presiona D para calibrar dígitos (plantillas del contador/estación)
   - Presiona ESC para salir sin guardar
 """
 
@@ -27,6 +28,8 @@ import numpy as np
 import cv2
 from PIL import Image, ImageTk
 
+from ocr_digitos import DIGITOS, TAM_GLIFO, segmentar, decodificar, plantillas_a_config
+
 CONFIG_DEFAULT = "config_ocr.json"
 
 ZONAS_DEF = [
@@ -91,6 +94,8 @@ class ConfiguradorApp:
         self.linea        = tk.StringVar(value="L6")
         self.patron       = tk.StringVar(value=r"(\d{3})")
         self.intervalo    = tk.StringVar(value="0.3")
+        self._cfg_previa  = {}   # claves que este configurador no edita (umbral_cambio, lote_max...)
+        self.muestras_digitos = {}   # "0".."9" → vectores de glifo capturados
 
         self._cargar_config_existente()
         self._build_ui()
@@ -101,6 +106,7 @@ class ConfiguradorApp:
             try:
                 with open(self.config_path, encoding="utf-8") as f:
                     cfg = json.load(f)
+                self._cfg_previa = cfg
                 self.servidor_url.set(cfg.get("servidor_url", self.servidor_url.get()))
                 self.linea.set(cfg.get("linea", self.linea.get()))
                 self.patron.set(cfg.get("patron", self.patron.get()))
@@ -109,6 +115,9 @@ class ConfiguradorApp:
                     k = z["key"]
                     if k in cfg.get("zonas", {}):
                         self.zonas[k] = cfg["zonas"][k]
+                plantillas = cfg.get("plantillas_digitos") or {}
+                if tuple(plantillas.get("tam", TAM_GLIFO)) == TAM_GLIFO:
+                    self.muestras_digitos = {d: [decodificar(v)] for d, v in plantillas.get("digitos", {}).items()}
             except Exception:
                 pass
 
@@ -165,6 +174,14 @@ class ConfiguradorApp:
                      font=("Consolas", 9), insertbackground="#fff",
                      relief="flat").pack(fill=tk.X, pady=2)
 
+        # ── Plantillas de dígitos ────────────────────────────────────
+        tk.Label(left, text="\nPLANTILLAS DE DÍGITOS", bg="#1a1a2e",
+                 fg="#546E7A", font=("Consolas", 9)).pack(anchor="w")
+        self.digitos_lbl = tk.Label(left, text="", bg="#1a1a2e", fg="#37474F",
+                                    font=("Consolas", 8), anchor="w", justify="left")
+        self.digitos_lbl.pack(anchor="w")
+        self._actualizar_estado_digitos()
+
         # ── Botones ──────────────────────────────────────────────────
         tk.Label(left, text="", bg="#1a1a2e").pack(expand=True)
 
@@ -175,6 +192,10 @@ class ConfiguradorApp:
                   font=("Consolas", 9), relief="flat", cursor="hand2",
                   command=self._nuevo_screenshot).pack(fill=tk.X, pady=2)
 
+        tk.Button(btn_frame, text="🔢 Calibrar dígitos", bg="#0d2137", fg="#90CAF9",
+                  font=("Consolas", 9), relief="flat", cursor="hand2",
+                  command=self._calibrar_digitos).pack(fill=tk.X, pady=2)
+
         tk.Button(btn_frame, text="✅ Guardar config", bg="#003320", fg="#00FF88",
                   font=("Consolas", 10, "bold"), relief="flat", cursor="hand2",
                   command=self._guardar).pack(fill=tk.X, pady=4)
@@ -210,6 +231,7 @@ class ConfiguradorApp:
         self.root.bind("2", lambda e: self._set_zona_activa(1))
         self.root.bind("<Return>", lambda e: self._guardar())
         self.root.bind("r",        lambda e: self._nuevo_screenshot())
+        self.root.bind("d",        lambda e: self._calibrar_digitos())
         self.root.bind("0",        lambda e: self._reset_zoom())
 
         self._set_zona_activa(0)
@@ -370,6 +392,50 @@ class ConfiguradorApp:
         self.root.deiconify()
         self._actualizar_canvas()
 
+    def _actualizar_estado_digitos(self):
+        listos = "".join(d for d in DIGITOS if self.muestras_digitos.get(d))
+        faltan = "".join(d for d in DIGITOS if not self.muestras_digitos.get(d))
+        if not faltan:
+            self.digitos_lbl.config(text="✅ 0-9 calibrados", fg="#00FF88")
+        else:
+            self.digitos_lbl.config(
+                text=f"Listos: {listos or '-'}\nFaltan: {faltan}\n(D = calibrar con pantalla actual)",
+                fg="#90CAF9" if listos else "#37474F",
+            )
+
+    def _calibrar_digitos(self):
+        """Segmenta los dígitos de CONTADOR y ESTACION en el screenshot actual y
+        pide al usuario el número que se ve; cada glifo queda como muestra de su
+        dígito. Repetir con otros screenshots hasta cubrir 0-9."""
+        for z in ZONAS_DEF:
+            rel = self.zonas[z["key"]]
+            if rel is None:
+                continue
+            a = rel_to_abs(rel, self.sw, self.sh)
+            roi = self.img_rgb[a["top"]:a["top"] + a["height"], a["left"]:a["left"] + a["width"]]
+            glifos = segmentar(cv2.cvtColor(roi, cv2.COLOR_RGB2GRAY))
+            if not glifos:
+                continue
+            texto = simpledialog.askstring(
+                "Calibrar dígitos",
+                f"Zona {z['key'].upper()}: {len(glifos)} dígito(s) detectado(s).\n"
+                f"¿Qué número se ve en pantalla? (vacío = omitir)",
+                parent=self.root,
+            )
+            if not texto or not texto.strip():
+                continue
+            texto = texto.strip()
+            if not texto.isdigit() or len(texto) != len(glifos):
+                messagebox.showwarning(
+                    "Calibrar dígitos",
+                    f"'{texto}' no coincide con los {len(glifos)} dígitos detectados en {z['key'].upper()}.\n"
+                    "Ajusta la zona para que solo contenga el número.",
+                )
+                continue
+            for d, v in zip(texto, glifos):
+                self.muestras_digitos.setdefault(d, []).append(v)
+        self._actualizar_estado_digitos()
+
     def _guardar(self):
         sin_definir = [z["key"] for z in ZONAS_DEF if self.zonas[z["key"]] is None]
         if sin_definir:
@@ -385,6 +451,7 @@ class ConfiguradorApp:
             intervalo = 0.3
 
         config = {
+            **self._cfg_previa,
             "servidor_url":        self.servidor_url.get().strip(),
             "linea":               self.linea.get().strip(),
             "patron":              self.patron.get().strip(),
@@ -392,6 +459,15 @@ class ConfiguradorApp:
             "monitor":             {"width": self.sw, "height": self.sh},
             "zonas":               {k: v for k, v in self.zonas.items() if v is not None},
         }
+        if self.muestras_digitos:
+            config["plantillas_digitos"] = plantillas_a_config(self.muestras_digitos)
+            faltan = [d for d in DIGITOS if not self.muestras_digitos.get(d)]
+            if faltan:
+                messagebox.showwarning(
+                    "Plantillas incompletas",
+                    f"Faltan muestras de los dígitos: {', '.join(faltan)}.\n"
+                    "Sin los diez dígitos el cliente no usa plantillas (queda Tesseract).",
+                )
 
         with open(self.config_path, "w", encoding="utf-8") as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
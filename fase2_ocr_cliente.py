@@ -4,6 +4,13 @@ UPH FASE 2 - OCR Cliente
 Lee config_ocr.json (generado por configurador_zonas.py),
 adapta coordenadas al monitor actual y envía eventos al servidor.
 
+Cada pieza se guarda primero en un outbox SQLite local (outbox_uph.db junto al
+config) y un hilo aparte la envía en lotes a /eventos/lote con reintentos: la
+captura nunca espera a la red y un corte de red no pierde piezas.
+
+Captura, OCR y envío corren en hilos separados (ver PIPELINE); cada evento
+lleva la hora en que se capturó el frame.
+
 Uso:
   fase2_ocr_cliente.exe
   fase2_ocr_cliente.exe --config mi_config.json
@@ -16,15 +23,22 @@ import json
 import sys
 import os
 import argparse
-from collections import Counter
+import queue
+import random
+import socket
+import sqlite3
+import threading
+import uuid
+from collections import deque
 from datetime import datetime
 
 import requests
 import numpy as np
 import cv2
-import mss
 import pytesseract
 
+from ocr_digitos import ReconocedorDigitos
+
 # ─────────────────────────────────────────────────────────────────
 # TESSERACT - busca automáticamente si no está en PATH
 # ─────────────────────────────────────────────────────────────────
@@ -112,10 +126,30 @@ def resolver_zona(zona_rel, sw, sh):
 # PROCESAMIENTO DE IMAGEN
 # ─────────────────────────────────────────────────────────────────
 
+def caja_comun(zonas):
+    """Rectángulo mínimo que contiene todas las zonas."""
+    left   = min(z["left"] for z in zonas.values())
+    top    = min(z["top"] for z in zonas.values())
+    right  = max(z["left"] + z["width"] for z in zonas.values())
+    bottom = max(z["top"] + z["height"] for z in zonas.values())
+    return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+
+def capturar_rois(sct, zonas, caja=None):
+    """Un solo grab de la caja común a todas las zonas. Cada zona es una vista
+    (sin copia) del buffer de mss y solo esa vista se convierte a gris."""
+    caja = caja or caja_comun(zonas)
+    shot = sct.grab(caja)
+    bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+    rois = {}
+    for k, z in zonas.items():
+        y, x = z["top"] - caja["top"], z["left"] - caja["left"]
+        rois[k] = cv2.cvtColor(bgra[y:y + z["height"], x:x + z["width"]], cv2.COLOR_BGRA2GRAY)
+    return rois
+
+
 def capturar_roi(sct, zona):
-    img = sct.grab(zona)
-    arr = np.array(img)
-    return cv2.cvtColor(arr, cv2.COLOR_BGRA2GRAY)
+    return capturar_rois(sct, {"roi": zona}, zona)["roi"]
 
 
 def preprocesar_contador(img_gris):
@@ -156,44 +190,673 @@ def leer_estacion(img_gris, patron):
     return None
 
 
-def confirmar_contador(sct, zona, intentos=3, pausa=0.08):
-    lecturas = []
-    for _ in range(intentos):
-        img = capturar_roi(sct, zona)
-        val = leer_contador(img)
-        lecturas.append(val)
-        time.sleep(pausa)
-    validos = [v for v in lecturas if v is not None]
-    if not validos:
+class VotoContador:
+    """Filtro de plausibilidad + voto sobre las lecturas del contador.
+
+    El contador solo avanza +1 o se reinicia 29 → 1 (30 no se muestra). Una
+    lectura plausible respecto al último valor aceptado se acepta al momento.
+    Una implausible queda pendiente (DUDOSA) y se confirma si:
+      - aparece en `votos_min` de las últimas `ventana` lecturas decodificadas
+        desde el último valor aceptado (el capturador solo encola frames cuando
+        cambian los píxeles: mientras hay un pendiente, ProcesadorOCR le pide
+        relecturas de la pantalla para poder votar), o
+      - la siguiente lectura es plausible respecto a ella (p. ej. 17 → 19 → 20).
+    Se descarta si la siguiente lectura es plausible respecto al valor aceptado
+    (un 17 → 11 → 18 no genera el evento fantasma 11).
+
+    Al confirmar un salto se rellenan hasta `relleno_max` piezas intermedias
+    (la pieza 18 leída como 17 no se pierde); saltos mayores (cambio de modelo,
+    reinicio manual) se aceptan como una pieza y se marcan SALTO.
+    """
+
+    def __init__(self, ventana=3, votos_min=2, relleno_max=2, piezas_pallet=30):
+        self._lecturas = deque(maxlen=ventana)
+        self.votos_min = votos_min
+        self.relleno_max = relleno_max
+        self.piezas_pallet = piezas_pallet
+        self.aceptado = None    # último valor aceptado (int)
+        self.pendiente = None   # lectura implausible esperando confirmación
+        self.rellenos = 0
+        self.saltos = 0
+        self.descartadas = 0
+
+    def _siguiente(self, valor):
+        """Siguiente valor en pantalla: tras 29 viene 1 (el 30 no se muestra)."""
+        return 1 if valor >= self.piezas_pallet - 1 else valor + 1
+
+    def plausible(self, desde, valor):
+        return valor == desde + 1 or (valor == 1 and desde >= self.piezas_pallet - 1)
+
+    def _intermedios(self, desde, hasta):
+        """Valores que el contador recorrió entre `desde` y `hasta`, o None si
+        son más de `relleno_max`."""
+        valores, x = [], desde
+        while len(valores) <= self.relleno_max:
+            x = self._siguiente(x)
+            if x == hasta:
+                return valores
+            valores.append(x)
         return None
-    mas_comun, cuenta = Counter(validos).most_common(1)[0]
-    # "1" (reset de pallet) aceptar con 1 sola lectura
-    if mas_comun == "1":
-        return mas_comun
-    return mas_comun if cuenta >= 2 else None
+
+    def _confirmar(self):
+        """Aceptar el pendiente → eventos [(valor, tipo)], tipo "relleno" | "salto"."""
+        valor, desde = self.pendiente, self.aceptado
+        self.pendiente = None
+        self.aceptado = valor
+        self._lecturas.clear()
+        intermedios = self._intermedios(desde, valor)
+        if intermedios is None:
+            self.saltos += 1
+            return [(valor, "salto")]
+        self.rellenos += len(intermedios)
+        return [(v, "relleno") for v in intermedios] + [(valor, "ok")]
+
+    def votar(self, lectura):
+        """Lectura OCR (str o None) → (eventos [(valor, tipo)], aviso o None)."""
+        if lectura is None:
+            return [], None
+        valor = int(lectura)
+        self._lecturas.append(valor)
+        if self.aceptado is None:
+            # Lo que ya estaba en pantalla al arrancar no es una pieza nueva
+            self.aceptado = valor
+            self._lecturas.clear()
+            return [], f"INICIO contador en pantalla: {valor}"
+        if valor == self.aceptado:
+            return [], None
+
+        if self.plausible(self.aceptado, valor):
+            aviso = None
+            if self.pendiente is not None:
+                self.descartadas += 1
+                aviso = f"DESCARTADA cnt={self.pendiente} (lectura dudosa, siguió {self.aceptado} → {valor})"
+                self.pendiente = None
+            self.aceptado = valor
+            self._lecturas.clear()
+            return [(valor, "ok")], aviso
+
+        if self.pendiente is not None and self.plausible(self.pendiente, valor):
+            eventos = self._confirmar()
+            self.aceptado = valor
+            return eventos + [(valor, "ok")], None
+
+        if self._lecturas.count(valor) >= self.votos_min:
+            self.pendiente = valor
+            return self._confirmar(), None
+
+        self.pendiente = valor
+        return [], f"DUDOSA cnt={valor} (anterior {self.aceptado}) → esperando confirmación"
+
+    def resumen(self):
+        return f"rellenos {self.rellenos} | saltos {self.saltos} | descartadas {self.descartadas}"
+
+
+class LectorDigitos:
+    """Plantillas calibradas primero (< 1 ms por ROI); Tesseract solo si no hay
+    plantillas en config_ocr.json o la confianza queda bajo `confianza_min`."""
+
+    def __init__(self, reconocedor=None, confianza_min=0.8):
+        self.reconocedor = reconocedor
+        self.confianza_min = confianza_min
+        self.por_plantilla = 0
+        self.por_tesseract = 0
+
+    def _plantilla(self, img_gris):
+        if self.reconocedor is None:
+            return None
+        texto, confianza = self.reconocedor.leer(img_gris)
+        return texto if texto and confianza >= self.confianza_min else None
+
+    def contador(self, img_gris):
+        texto = self._plantilla(img_gris)
+        if texto:
+            self.por_plantilla += 1
+            return texto
+        self.por_tesseract += 1
+        return leer_contador(img_gris)
+
+    def estacion(self, img_gris, patron):
+        texto = self._plantilla(img_gris)
+        matches = re.findall(patron, texto) if texto else None
+        if matches:
+            self.por_plantilla += 1
+            return matches[0]
+        self.por_tesseract += 1
+        return leer_estacion(img_gris, patron)
+
+    def resumen(self):
+        return f"plantillas {self.por_plantilla} | tesseract {self.por_tesseract}"
+
+
+def mismo_contenido(a, b, umbral):
+    """Diferencia media absoluta por píxel < `umbral` (ROIs en gris, mismo tamaño)."""
+    return b is not None and a.shape == b.shape and cv2.absdiff(a, b).mean() < umbral
+
+
+class DetectorCambio:
+    """Compara el ROI crudo (gris) contra el último frame que pasó por OCR.
+    Diferencia media absoluta por píxel < `umbral` → mismo contenido, no hace
+    falta Tesseract. Entre piezas casi todos los frames son iguales."""
+
+    def __init__(self, umbral=2.0):
+        self.umbral = umbral
+        self._ultimo = None
+        self.decodificados = 0
+        self.omitidos = 0
+
+    def cambio(self, img_gris):
+        """True si el frame debe pasar por OCR (y queda como referencia)."""
+        if mismo_contenido(img_gris, self._ultimo, self.umbral):
+            self.omitidos += 1
+            return False
+        self._ultimo = img_gris.copy()
+        self.decodificados += 1
+        return True
+
+    def fijar(self, img_gris):
+        """Tomar como referencia el frame ya estable (después del render)."""
+        self._ultimo = img_gris.copy()
+
+    def resumen(self):
+        total = self.decodificados + self.omitidos
+        pct = 100.0 * self.omitidos / total if total else 0.0
+        return f"{total} frames | OCR {self.decodificados} | omitidos {self.omitidos} ({pct:.1f}%)"
+
+
+class MemoEstacion:
+    """La estación solo cambia cuando el operador se mueve: mientras el ROI de
+    estación sea igual al de la última lectura buena se reusa esa lectura.
+    Se vuelve a leer al cambiar el ROI o cada `verificar_cada` segundos."""
+
+    def __init__(self, umbral=2.0, verificar_cada=60.0):
+        self.umbral = umbral
+        self.verificar_cada = verificar_cada
+        self._ref = None
+        self._estacion = None
+        self._leida_en = 0.0
+        self.leidas = 0
+        self.reusadas = 0
+
+    def leer(self, img_gris, leer_fn):
+        ahora = time.monotonic()
+        if ahora - self._leida_en < self.verificar_cada and mismo_contenido(img_gris, self._ref, self.umbral):
+            self.reusadas += 1
+            return self._estacion
+        estacion = leer_fn(img_gris)
+        self.leidas += 1
+        # Solo memorizar lecturas buenas: un SIN MATCH se reintenta en la siguiente pieza
+        self._ref = img_gris.copy() if estacion else None
+        self._estacion = estacion
+        self._leida_en = ahora
+        return estacion
+
+    def resumen(self):
+        return f"estación leída {self.leidas} | reusada {self.reusadas}"
 
 
 # ─────────────────────────────────────────────────────────────────
-# ENVÍO AL SERVIDOR
+# OUTBOX LOCAL + ENVÍO AL SERVIDOR
 # ─────────────────────────────────────────────────────────────────
 
-def enviar_servidor(url, linea, estacion, contador_val):
-    try:
-        requests.post(
-            f"{url}/evento",
-            json={
-                "linea":     linea,
-                "estacion":  estacion,
-                "evento":    "GOOD",
-                "contador":  contador_val,
-                "timestamp": datetime.now().isoformat(),
-            },
-            timeout=2,
-        )
-    except Exception:
-        pass
+OUTBOX_DEFAULT = "outbox_uph.db"
+
+
+class Outbox:
+    """Cola durable de eventos (SQLite). `encolar` solo escribe en disco local;
+    el evento sale de la tabla cuando el servidor lo confirma."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")   # sobrevivir a un apagón
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid       TEXT UNIQUE NOT NULL,
+                payload   TEXT NOT NULL,
+                creado    TEXT NOT NULL,
+                intentos  INTEGER NOT NULL DEFAULT 0,
+                estado    TEXT NOT NULL DEFAULT 'pendiente'   -- pendiente | rechazado
+            )
+        """)
+        self._prefijo = socket.gethostname()
+
+    def encolar(self, linea, estacion, contador_val, ts=None, cantidad=1, contador_desde=None):
+        """Un registro por pieza, o `cantidad` piezas con contadores
+        contador_desde..contador_val (mismo frame)."""
+        # Hora de captura del frame (con zona horaria), no la de envío
+        ahora = ts or datetime.now().astimezone()
+        uid = f"{self._prefijo}-{uuid.uuid4().hex}"
+        evento = {
+            "uid":       uid,
+            "linea":     linea,
+            "estacion":  estacion,
+            "evento":    "GOOD",
+            "contador":  contador_val,
+            "timestamp": ahora.isoformat(),
+        }
+        if cantidad > 1:
+            evento["cantidad"] = cantidad
+            evento["contador_desde"] = contador_desde
+        payload = json.dumps(evento)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (uid, payload, creado) VALUES (?, ?, ?)",
+                (uid, payload, ahora.isoformat()),
+            )
+
+    def pendientes(self, limite):
+        with self._lock:
+            filas = self._db.execute(
+                "SELECT payload FROM outbox WHERE estado = 'pendiente' ORDER BY id LIMIT ?",
+                (limite,),
+            ).fetchall()
+        return [json.loads(p) for (p,) in filas]
+
+    def confirmar(self, uids):
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE uid = ?", [(u,) for u in uids])
+
+    def rechazar(self, uids):
+        """El servidor no los acepta (línea/estación desconocida): apartarlos
+        sin borrarlos, para revisión, y no reintentarlos en bucle."""
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET estado = 'rechazado' WHERE uid = ?", [(u,) for u in uids])
+
+    def sumar_intento(self, uids):
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET intentos = intentos + 1 WHERE uid = ?", [(u,) for u in uids])
+
+    def profundidad(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE estado = 'pendiente'").fetchone()[0]
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+
+class Enviador(threading.Thread):
+    """Vacía el outbox en lotes a {url}/eventos/lote con conexión keep-alive.
+    Sin red: backoff exponencial con jitter (1 s → 30 s) sin tocar la captura.
+    Un 422 del lote (algún evento no pasa la validación del servidor) no se
+    reintenta: el lote se parte en mitades hasta aislar los eventos inválidos,
+    que quedan `rechazado`."""
+
+    BACKOFF_MIN = 1.0
+    BACKOFF_MAX = 30.0
+    LOTE_MAX_SERVIDOR = 500   # LoteEventosIn: eventos max_length=500
+
+    def __init__(self, outbox, url, lote_max=100, timeout=5, piezas_pallet=30):
+        super().__init__(daemon=True, name="enviador-uph")
+        self.outbox = outbox
+        self.url = url.rstrip("/")
+        self.lote_max = max(1, min(lote_max, self.LOTE_MAX_SERVIDOR))
+        self.timeout = timeout
+        self.piezas_pallet = piezas_pallet
+        self.conectado = True
+        self._sesion = requests.Session()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._por_lote = True     # servidor viejo sin /eventos/lote → /evento uno a uno
+
+    def avisar(self):
+        self._despertar.set()
+
+    def detener(self, espera=3.0):
+        """Último intento de vaciar la cola (máx. `espera` s) y terminar."""
+        self._detener.set()
+        self._despertar.set()
+        self.join(espera)
+
+    def run(self):
+        backoff = self.BACKOFF_MIN
+        while True:
+            lote = self.outbox.pendientes(self.lote_max)
+            if not lote:
+                if self._detener.is_set():
+                    return
+                self._despertar.wait(1.0)
+                self._despertar.clear()
+                continue
+            try:
+                self._enviar(lote)
+            except Exception as e:
+                self.outbox.sumar_intento([ev["uid"] for ev in lote])
+                if self.conectado:
+                    self.conectado = False
+                    print(f"[RED] Sin conexión con el servidor ({type(e).__name__}); "
+                          f"encolando localmente ({self.outbox.profundidad()} pendientes)")
+                if self._detener.is_set():
+                    return
+                self._despertar.wait(backoff * random.uniform(0.5, 1.0))
+                self._despertar.clear()
+                backoff = min(backoff * 2, self.BACKOFF_MAX)
+                continue
+            if not self.conectado:
+                self.conectado = True
+                print(f"[RED] Conexión recuperada ({self.outbox.profundidad()} pendientes)")
+            backoff = self.BACKOFF_MIN
+
+    def _enviar(self, lote):
+        if self._por_lote:
+            if self._enviar_lote(lote):
+                return
+            self._por_lote = False
+            print("[RED] Servidor sin /eventos/lote; enviando evento por evento")
+        for ev in lote:
+            ok = True
+            for pieza in expandir(ev, self.piezas_pallet):
+                r = self._sesion.post(f"{self.url}/evento", json=pieza, timeout=self.timeout)
+                if r.status_code == 422:   # línea/estación no reconocida: no reintentar
+                    ok = False
+                    continue
+                r.raise_for_status()
+                ok = ok and r.json().get("ok")
+            if ok:
+                self.outbox.confirmar([ev["uid"]])
+            else:
+                self.outbox.rechazar([ev["uid"]])
+
+
+    def _enviar_lote(self, lote):
+        """POST /eventos/lote. False si el servidor no conoce el endpoint (404)."""
+        r = self._sesion.post(f"{self.url}/eventos/lote", json={"eventos": lote}, timeout=self.timeout)
+        if r.status_code == 404:
+            return False
+        if r.status_code == 422:
+            # Validación del lote completo: con un solo evento, el culpable es él
+            if len(lote) == 1:
+                self._rechazar({lote[0]["uid"]: "payload inválido (422)"})
+                return True
+            mitad = len(lote) // 2
+            return self._enviar_lote(lote[:mitad]) and self._enviar_lote(lote[mitad:])
+        r.raise_for_status()
+        res = r.json()
+        self.outbox.confirmar(res.get("aceptados", []) + res.get("duplicados", []))
+        self._rechazar(res.get("rechazados", {}))
+        return True
+
+    def _rechazar(self, rechazados):
+        if rechazados:
+            self.outbox.rechazar(list(rechazados))
+            for uid, motivo in rechazados.items():
+                print(f"[RED] Evento rechazado {uid}: {motivo}")
+
+
+def expandir(ev, piezas_pallet=30):
+    """Registro con `cantidad` > 1 → un evento por pieza, para servidores que
+    solo conocen /evento (contadores desde contador_desde, con vuelta al pallet)."""
+    cantidad = ev.get("cantidad", 1)
+    if cantidad <= 1:
+        return [ev]
+    base = {k: v for k, v in ev.items() if k not in ("cantidad", "contador_desde")}
+    desde = ev.get("contador_desde")
+    piezas = []
+    for i in range(cantidad):
+        contador = ev["contador"] if desde is None or i == cantidad - 1 else (desde - 1 + i) % piezas_pallet + 1
+        piezas.append({**base, "contador": contador})
+    return piezas
 
 
+# ─────────────────────────────────────────────────────────────────
+# PIPELINE: CAPTURA → OCR → OUTBOX
+# ─────────────────────────────────────────────────────────────────
+#
+#   Capturador ──(cola de frames)──► ProcesadorOCR ──► Outbox ──► Enviador
+#
+# La captura solo hace grabs y compara píxeles, así que su ciclo no depende de
+# Tesseract ni de la red: una secuencia rápida 28→29→1 queda en la cola aunque
+# el OCR vaya atrasado. El OCR es un solo hilo para conservar el orden de los
+# frames (la lógica de contador anterior / AUTO-30 depende de él).
+
+class Frame:
+    __slots__ = ("ts", "cnt", "est")
+
+    def __init__(self, ts, cnt, est):
+        self.ts  = ts     # hora de captura (datetime con zona)
+        self.cnt = cnt    # ROI contador (gris)
+        self.est = est    # ROI estación (gris)
+
+
+class IntervaloAdaptativo:
+    """Intervalo de muestreo del contador según el ritmo de la línea.
+
+    - Justo después de un cambio de píxeles: `minimo` durante `rapido_s`
+      (secuencias rápidas como 28 → 29 → 1).
+    - Línea corriendo: ~1/10 del tiempo entre piezas aprendido (EWMA), nunca
+      más lento que `normal` (intervalo_segundos): no agrega latencia.
+    - En descanso (publicado por el servidor) o sin cambios por `inactivo_s`
+      (o 3 ciclos si el ciclo es más largo): sube ×1.5 por muestra hasta `maximo`.
+    Cualquier cambio de píxeles vuelve de inmediato a `minimo`.
+    """
+
+    def __init__(self, normal=0.3, minimo=0.1, maximo=2.0, inactivo_s=120, rapido_s=1.0):
+        self.normal = normal
+        self.minimo = min(minimo, normal)
+        self.maximo = max(maximo, normal)
+        self.inactivo_s = inactivo_s
+        self.rapido_s = rapido_s
+        self.ciclo = None          # segundos entre piezas (EWMA)
+        self.en_descanso = False   # lo actualiza ConsultaDescanso
+        self.actual = normal
+        self._ultimo_cambio = time.monotonic()
+
+    def siguiente(self, cambio):
+        """Segundos hasta la próxima muestra; `cambio` = esta muestra cambió."""
+        ahora = time.monotonic()
+        inactivo = max(self.inactivo_s, 3 * self.ciclo) if self.ciclo else self.inactivo_s
+        if cambio:
+            # Cambios separados por más de `rapido_s` cuentan como pieza (no re-renders)
+            dt = ahora - self._ultimo_cambio
+            if self.rapido_s < dt < inactivo:
+                self.ciclo = dt if self.ciclo is None else 0.8 * self.ciclo + 0.2 * dt
+            self._ultimo_cambio = ahora
+
+        quieto = ahora - self._ultimo_cambio
+        if quieto < self.rapido_s:
+            self.actual = self.minimo
+        elif self.en_descanso or quieto >= inactivo:
+            self.actual = min(self.maximo, max(self.actual, self.normal) * 1.5)
+        else:
+            base = self.ciclo / 10 if self.ciclo else self.normal
+            self.actual = min(self.normal, max(self.minimo, base))
+        return self.actual
+
+    def resumen(self):
+        ciclo = f"{self.ciclo:.1f}s" if self.ciclo else "?"
+        return f"intervalo {self.actual:.2f}s | ciclo ~{ciclo}" + (" | descanso" if self.en_descanso else "")
+
+
+class ConsultaDescanso(threading.Thread):
+    """Pregunta al servidor cada `cada` s si la línea está en descanso
+    (GET {url}/ocr/descanso/{linea}). Sin respuesta se asume que no: solo
+    queda la regla de inactividad."""
+
+    def __init__(self, url, linea, ritmo, cada=30):
+        super().__init__(daemon=True, name="descanso-uph")
+        self.url = url.rstrip("/")
+        self.linea = linea
+        self.ritmo = ritmo
+        self.cada = cada
+
+    def run(self):
+        sesion = requests.Session()
+        while True:
+            try:
+                r = sesion.get(f"{self.url}/ocr/descanso/{self.linea}", timeout=5)
+                en_descanso = r.ok and bool(r.json().get("en_descanso"))
+            except Exception:
+                en_descanso = False
+            if en_descanso != self.ritmo.en_descanso:
+                print(f"[DESCANSO] {'inicio → muestreo lento' if en_descanso else 'fin → muestreo normal'}")
+            self.ritmo.en_descanso = en_descanso
+            time.sleep(self.cada)
+
+
+class Capturador(threading.Thread):
+    """Muestrea el contador al ritmo de `ritmo` (grab solo de su zona); cuando
+    los píxeles cambian espera a que termine el render, toma contador + estación
+    en un solo grab y encola el frame. `pedir_relecturas(n)` encola además `n`
+    frames aunque la pantalla no cambie (voto de una lectura dudosa)."""
+
+    def __init__(self, zonas_rel, cola, detector, ritmo, espera_render=0.12):
+        super().__init__(daemon=True, name="captura-uph")
+        self.zonas_rel = zonas_rel
+        self.cola = cola
+        self.detector = detector
+        self.ritmo = ritmo
+        self.espera_render = espera_render
+        self.listo = threading.Event()
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._relecturas = 0
+
+    def detener(self):
+        self._detener.set()
+        self.join(2.0)
+
+    def pedir_relecturas(self, n):
+        """Releer la pantalla `n` veces (cada `espera_render`) aunque no cambie."""
+        with self._lock:
+            self._relecturas = max(self._relecturas, n)
+
+    def _tomar_relectura(self):
+        with self._lock:
+            if self._relecturas <= 0:
+                return False
+            self._relecturas -= 1
+            return True
+
+    def run(self):
+        # mss por hilo: los handles de captura de Windows no se comparten entre hilos
+        import mss
+        with mss.mss() as sct:
+            mon = sct.monitors[1]
+            sw, sh = mon["width"], mon["height"]
+            zonas = {k: resolver_zona(v, sw, sh) for k, v in self.zonas_rel.items()}
+            caja  = caja_comun(zonas)
+
+            print(f"\n  Monitor: {sw}×{sh}")
+            for k, z in zonas.items():
+                print(f"  {k:20s}: top={z['top']} left={z['left']} {z['width']}×{z['height']}")
+            self.listo.set()
+
+            while not self._detener.is_set():
+                cambio = False
+                try:
+                    img_cnt = capturar_roi(sct, zonas["contador"])
+                    cambio = self.detector.cambio(img_cnt)
+                    if cambio or self._tomar_relectura():
+                        ts = datetime.now().astimezone()
+                        # Esperar render para estabilidad y tomar ambos ROIs del mismo instante
+                        if cambio:
+                            self._detener.wait(self.espera_render)
+                        rois = capturar_rois(sct, zonas, caja)
+                        img_cnt, img_est = rois["contador"], rois["estacion"]
+                        self.detector.fijar(img_cnt)
+                        self.cola.put(Frame(ts, img_cnt, img_est))
+                except Exception as e:
+                    print(f"[ERROR] captura: {e}")
+                espera = self.ritmo.siguiente(cambio)
+                self._detener.wait(self.espera_render if self._relecturas else espera)
+        self.cola.put(None)   # fin de la captura
+
+
+class ProcesadorOCR(threading.Thread):
+    """Lee contador y estación de cada frame y encola los eventos en el outbox.
+    Con `agrupar`, las piezas de un mismo frame y estación (relleno, AUTO-30 + 1)
+    van en un solo registro con `cantidad`."""
+
+    def __init__(self, cola, lector, outbox, enviador, linea, patron, memo, voto, debug=False, agrupar=True,
+                 pedir_relecturas=None, relecturas=3):
+        super().__init__(daemon=True, name="ocr-uph")
+        self.agrupar = agrupar
+        self.pedir_relecturas = pedir_relecturas
+        self.relecturas = relecturas
+        self.cola = cola
+        self.lector = lector
+        self.memo = memo
+        self.voto = voto
+        self.outbox = outbox
+        self.enviador = enviador
+        self.linea = linea
+        self.patron = patron
+        self.debug = debug
+        self.ultima_estacion = None
+
+    def run(self):
+        while True:
+            frame = self.cola.get()
+            if frame is None:
+                return
+            try:
+                self._procesar(frame)
+            except Exception as e:
+                print(f"[ERROR] {e}")
+
+    def _procesar(self, frame):
+        anterior = self.voto.aceptado
+        eventos, aviso = self.voto.votar(self.lector.contador(frame.cnt))
+        if self.voto.pendiente is not None and self.pedir_relecturas:
+            # Pantalla quieta → sin frames nuevos: releer para confirmar o descartar
+            self.pedir_relecturas(self.relecturas)
+        ts = frame.ts.strftime("%H:%M:%S")
+        if aviso:
+            print(f"[{ts}] {aviso}")
+        if not eventos:
+            return
+
+        estacion = self.memo.leer(frame.est, lambda img: self.lector.estacion(img, self.patron))
+        atraso = (datetime.now().astimezone() - frame.ts).total_seconds()
+
+        piezas = []   # (estacion, contador) en orden
+        for contador_actual, tipo in eventos:
+            # ── Auto-completar pallet: 29 → 1 (reset sin mostrar 30) ─
+            if contador_actual == 1 and anterior == 29:
+                est = self.ultima_estacion
+                if est:
+                    print(f"[{ts}] AUTO-30 → estacion={est} | cnt=30")
+                    piezas.append((est, 30))
+                else:
+                    print(f"[{ts}] AUTO-30 (sin estacion) | cnt=30")
+            anterior = contador_actual
+
+            etiqueta = {"ok": "OK  ", "relleno": "RELLENO", "salto": "SALTO"}[tipo]
+            if estacion:
+                piezas.append((estacion, contador_actual))
+                print(f"[{ts}] {etiqueta} est={estacion} | cnt={contador_actual} | cola={self.outbox.profundidad()}"
+                      + (f" | atraso={atraso:.1f}s" if atraso >= 1 else ""))
+            else:
+                print(f"[{ts}] SIN MATCH | cnt={contador_actual}")
+
+        if piezas:
+            self._encolar(piezas, frame.ts)
+
+        if estacion:
+            self.ultima_estacion = estacion
+        elif self.debug:
+            tag = frame.ts.strftime("%H%M%S_%f")
+            cv2.imwrite(f"debug_est_{tag}.png", frame.est)
+            cv2.imwrite(f"debug_cnt_{tag}.png", frame.cnt)
+
+    def _encolar(self, piezas, ts):
+        """Un registro por pieza o, con `agrupar`, uno por tramo consecutivo de
+        la misma estación (contador_desde..contador, cantidad)."""
+        tramos = []
+        for est, contador in piezas:
+            if self.agrupar and tramos and tramos[-1][0] == est:
+                tramos[-1][1].append(contador)
+            else:
+                tramos.append((est, [contador]))
+        for est, contadores in tramos:
+            self.outbox.encolar(self.linea, est, contadores[-1], ts=ts,
+                                cantidad=len(contadores), contador_desde=contadores[0])
+        self.enviador.avisar()
+        if len(tramos) < len(piezas):
+            print(f"[{ts.strftime('%H:%M:%S')}] {len(piezas)} piezas en {len(tramos)} registro(s) | "
+                  f"cola={self.outbox.profundidad()}")
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -204,6 +867,7 @@ def main():
     parser = argparse.ArgumentParser(description="UPH OCR Cliente")
     parser.add_argument("--config", default=CONFIG_DEFAULT)
     parser.add_argument("--debug",  action="store_true", help="Guarda imágenes de debug")
+    parser.add_argument("--outbox", default=None, help=f"Cola local de eventos (default: {OUTBOX_DEFAULT} junto al config)")
     args = parser.parse_args()
 
     cfg = cargar_config(args.config)
@@ -212,7 +876,15 @@ def main():
     linea        = cfg["linea"]
     patron       = cfg["patron"]
     intervalo    = cfg.get("intervalo_segundos", 0.3)
+    umbral       = cfg.get("umbral_cambio", 2.0)   # diferencia media de gris (0-255)
+    lector       = LectorDigitos(ReconocedorDigitos.desde_config(cfg), cfg.get("confianza_plantillas", 0.8))
     debug        = args.debug
+    outbox_path  = args.outbox or os.path.join(os.path.dirname(os.path.abspath(args.config)), OUTBOX_DEFAULT)
+
+    outbox   = Outbox(outbox_path)
+    enviador = Enviador(outbox, servidor_url, lote_max=cfg.get("lote_max", 100),
+                        piezas_pallet=cfg.get("piezas_pallet", 30))
+    enviador.start()
 
     print("=" * 60)
     print("  UPH OCR CLIENTE")
@@ -221,79 +893,58 @@ def main():
     print(f"  Servidor: {servidor_url}")
     print(f"  Línea:    {linea}")
     print(f"  Patrón:   {patron} (estacion)")
-    print(f"  Intervalo:{intervalo}s")
+    print(f"  Intervalo:{cfg.get('intervalo_min', 0.1)}-{intervalo}s (corriendo), hasta {cfg.get('intervalo_max', 2.0)}s en descanso/inactiva")
+    if lector.reconocedor:
+        print(f"  OCR:      plantillas {''.join(lector.reconocedor.etiquetas)} + Tesseract de respaldo")
+    else:
+        print("  OCR:      Tesseract (sin plantillas; calibrar con configurador_zonas)")
+    print(f"  Outbox:   {outbox_path} ({outbox.profundidad()} pendientes)")
     print("=" * 60)
 
-    with mss.mss() as sct:
-        mon = sct.monitors[1]
-        sw, sh = mon["width"], mon["height"]
-
-        # Resolver zonas al monitor actual
-        zonas_rel = cfg["zonas"]
-        zonas = {k: resolver_zona(v, sw, sh) for k, v in zonas_rel.items()}
+    # Cola acotada: si el OCR se atrasa demasiado la captura espera (no descarta piezas)
+    cola       = queue.Queue(maxsize=cfg.get("cola_frames", 64))
+    detector   = DetectorCambio(umbral)
+    ritmo      = IntervaloAdaptativo(intervalo, cfg.get("intervalo_min", 0.1), cfg.get("intervalo_max", 2.0),
+                                     cfg.get("inactivo_segundos", 120))
+    capturador = Capturador(cfg["zonas"], cola, detector, ritmo, cfg.get("espera_render", 0.12))
+    memo       = MemoEstacion(umbral, cfg.get("verificar_estacion_s", 60))
+    voto       = VotoContador(cfg.get("voto_ventana", 3), cfg.get("voto_min", 2),
+                              cfg.get("relleno_max", 2), cfg.get("piezas_pallet", 30))
+    # agrupar_piezas: false mientras el servidor no conozca `cantidad` (lo contaría como 1)
+    procesador = ProcesadorOCR(cola, lector, outbox, enviador, linea, patron, memo, voto, debug,
+                               agrupar=cfg.get("agrupar_piezas", True),
+                               pedir_relecturas=capturador.pedir_relecturas,
+                               relecturas=cfg.get("voto_relecturas", 3))
+    capturador.start()
+    procesador.start()
+    if cfg.get("consultar_descanso_s", 30):
+        ConsultaDescanso(servidor_url, linea, ritmo, cfg.get("consultar_descanso_s", 30)).start()
+
+    def _stats():
+        print(f"[STATS] {detector.resumen()} | {lector.resumen()} | {memo.resumen()} | {voto.resumen()} | {ritmo.resumen()} | frames en cola {cola.qsize()}")
 
-        print(f"\n  Monitor: {sw}×{sh}")
-        for k, z in zonas.items():
-            print(f"  {k:20s}: top={z['top']} left={z['left']} {z['width']}×{z['height']}")
+    try:
+        capturador.listo.wait(5)
         print("\n[INICIO] Monitoreando. Ctrl+C para detener.\n")
-
-        contador_anterior = None
-        ultima_estacion   = None
-
-        while True:
-            try:
-                # ── Lectura del contador ──────────────────────────────────
-                img_cnt = capturar_roi(sct, zonas["contador"])
-                contador_actual = leer_contador(img_cnt)
-
-                if contador_actual is None:
-                    time.sleep(intervalo)
-                    continue
-
-                if contador_actual == contador_anterior:
-                    time.sleep(intervalo)
-                    continue
-
-                # ── Auto-completar pallet: 29 → 1 (reset sin mostrar 30) ─
-                if contador_actual == "1" and contador_anterior == "29":
-                    ts = datetime.now().strftime("%H:%M:%S")
-                    est = ultima_estacion
-                    if est:
-                        print(f"[{ts}] AUTO-30 → estacion={est} | cnt=30")
-                        enviar_servidor(servidor_url, linea, est, 30)
-                    else:
-                        print(f"[{ts}] AUTO-30 (sin estacion) | cnt=30")
-
-                # Esperar render para estabilidad
-                time.sleep(0.12)
-
-                # Capturar estación (frame fresco)
-                img_est = capturar_roi(sct, zonas["estacion"])
-
-                # OCR estación
-                estacion = leer_estacion(img_est, patron)
-                ts = datetime.now().strftime("%H:%M:%S")
-
-                if estacion:
-                    print(f"[{ts}] OK   est={estacion} | cnt={contador_actual}")
-                    enviar_servidor(servidor_url, linea, estacion, int(contador_actual))
-                    ultima_estacion = estacion
-                else:
-                    print(f"[{ts}] SIN MATCH | cnt={contador_actual}")
-                    if debug:
-                        tag = ts.replace(":", "")
-                        cv2.imwrite(f"debug_est_{tag}.png", img_est)
-                        cv2.imwrite(f"debug_cnt_{tag}.png", img_cnt)
-
-                contador_anterior = contador_actual
-                time.sleep(intervalo)
-
-            except KeyboardInterrupt:
-                print("\n[FIN] Monitoreo detenido.")
-                break
-            except Exception as e:
-                print(f"[ERROR] {e}")
-                time.sleep(intervalo)
+        ultimo_resumen = time.monotonic()
+        while capturador.is_alive():
+            time.sleep(1)
+            if time.monotonic() - ultimo_resumen >= 300:
+                _stats()
+                ultimo_resumen = time.monotonic()
+    except KeyboardInterrupt:
+        print("\n[FIN] Monitoreo detenido.")
+
+    capturador.detener()
+    procesador.join(5.0)   # terminar los frames ya capturados
+    _stats()
+
+    enviador.detener()
+    pendientes = outbox.profundidad()
+    if pendientes:
+        print(f"[FIN] {pendientes} eventos quedan en {outbox_path}; se envían al volver a iniciar.")
+    if not enviador.is_alive():
+        outbox.cerrar()
 
 
 if __name__ == "__main__":
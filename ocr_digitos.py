@@ -0,0 +1,124 @@
+"""
+UPH OCR - Reconocedor de dígitos por plantillas
+===============================================
+El contador y la estación del MES usan siempre la misma fuente: en lugar de
+lanzar Tesseract en cada lectura, se segmentan los dígitos del ROI y cada uno
+se compara contra plantillas calibradas (correlación normalizada con NumPy).
+
+Las plantillas se capturan una vez con configurador_zonas.py y se guardan en
+config_ocr.json bajo "plantillas_digitos". Si la confianza es baja el cliente
+vuelve a Tesseract.
+"""
+
+import base64
+
+import numpy as np
+import cv2
+
+# Tamaño normalizado de cada glifo (ancho, alto)
+TAM_GLIFO = (16, 24)
+DIGITOS = "0123456789"
+# Ventaja mínima de la mejor plantilla sobre la segunda (8/9/6/0 se parecen mucho)
+MARGEN_MIN = 0.05
+
+
+def binarizar(img_gris):
+    """Otsu con los dígitos en blanco sin importar la polaridad de la pantalla
+    (los dígitos ocupan menos área que el fondo)."""
+    _, bin_ = cv2.threshold(img_gris, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(bin_) > bin_.size // 2:
+        bin_ = cv2.bitwise_not(bin_)
+    return bin_
+
+
+def segmentar(img_gris):
+    """Glifos del ROI de izquierda a derecha, cada uno como vector float32
+    normalizado (media 0, norma 1) de TAM_GLIFO."""
+    bin_ = binarizar(img_gris)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(bin_, connectivity=8)
+    if n <= 1:
+        return []
+    comps = stats[1:]
+    alto_max = comps[:, cv2.CC_STAT_HEIGHT].max()
+    # Solo componentes con altura de dígito (descarta ruido, puntos y bordes)
+    comps = comps[comps[:, cv2.CC_STAT_HEIGHT] >= 0.5 * alto_max]
+    comps = comps[np.argsort(comps[:, cv2.CC_STAT_LEFT])]
+
+    # Unir piezas del mismo glifo que se traslapan en X (dígitos partidos)
+    cajas = []
+    for x, y, w, h, _ in comps:
+        if cajas and x < cajas[-1][0] + cajas[-1][2] * 0.5 + 1 and x >= cajas[-1][0]:
+            cx, cy, cw, ch = cajas[-1]
+            x2, y2 = max(cx + cw, x + w), max(cy + ch, y + h)
+            cajas[-1] = [min(cx, x), min(cy, y), x2 - min(cx, x), y2 - min(cy, y)]
+        else:
+            cajas.append([x, y, w, h])
+
+    glifos = []
+    for x, y, w, h in cajas:
+        recorte = bin_[y:y + h, x:x + w]
+        glifos.append(_vector(cv2.resize(recorte, TAM_GLIFO, interpolation=cv2.INTER_AREA)))
+    return glifos
+
+
+def _vector(glifo):
+    v = glifo.astype(np.float32).ravel()
+    v -= v.mean()
+    norma = np.linalg.norm(v)
+    return v / norma if norma else v
+
+
+class ReconocedorDigitos:
+    """Clasificador de glifos por correlación contra una plantilla por dígito."""
+
+    def __init__(self, plantillas, margen_min=MARGEN_MIN):
+        """`plantillas`: {"0": vector, ...} con vectores de `segmentar`."""
+        self.margen_min = margen_min
+        self.etiquetas = sorted(plantillas)
+        self._matriz = np.stack([_vector(np.asarray(plantillas[d], dtype=np.float32))
+                                 for d in self.etiquetas])   # (n_digitos, ancho*alto)
+
+    def leer(self, img_gris):
+        """(texto, confianza). Confianza = peor correlación entre los glifos; un
+        glifo cuya mejor plantilla no le gana a la segunda por `margen_min` es
+        ambiguo y deja la confianza en 0 (el cliente vuelve a Tesseract)."""
+        glifos = segmentar(img_gris)
+        if not glifos:
+            return None, 0.0
+        scores = np.stack(glifos) @ self._matriz.T          # (n_glifos, n_digitos)
+        mejores = scores.argmax(axis=1)
+        texto = "".join(self.etiquetas[i] for i in mejores)
+        orden = np.sort(scores, axis=1)
+        mejor, segunda = orden[:, -1], orden[:, -2]
+        confianza = np.where(mejor - segunda >= self.margen_min, mejor, 0.0)
+        return texto, float(confianza.min())
+
+    @classmethod
+    def desde_config(cls, cfg):
+        """Reconocedor de config_ocr.json, o None si no hay plantillas calibradas
+        para los diez dígitos (con alguno faltante leería mal ese dígito)."""
+        datos = cfg.get("plantillas_digitos")
+        if not datos or not set(DIGITOS) <= set(datos.get("digitos") or ()):
+            return None
+        if tuple(datos.get("tam", TAM_GLIFO)) != TAM_GLIFO:
+            return None
+        return cls({d: decodificar(v) for d, v in datos["digitos"].items()},
+                   cfg.get("margen_plantillas", MARGEN_MIN))
+
+
+def codificar(vector):
+    """Plantilla → texto para JSON (float16 en base64, ~0.5 KB por dígito)."""
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode("ascii")
+
+
+def decodificar(texto):
+    return np.frombuffer(base64.b64decode(texto), dtype=np.float16).astype(np.float32)
+
+
+def plantillas_a_config(muestras):
+    """{"0": [vectores...]} → bloque "plantillas_digitos" de config_ocr.json
+    (promedio de las muestras de cada dígito)."""
+    return {
+        "tam": list(TAM_GLIFO),
+        "digitos": {d: codificar(_vector(np.mean(vs, axis=0))) for d, vs in sorted(muestras.items()) if vs},
+    }
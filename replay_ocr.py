@@ -0,0 +1,271 @@
+"""
+UPH OCR - Replay offline
+========================
+Corre ROIs grabados (PNG) por las mismas funciones de reconocimiento del
+cliente OCR (fase2_ocr_cliente.py) y del agente FCT (fct_agent.ocr_numero),
+sin mss ni pantalla. Reporta latencia por imagen, exactitud por variante de
+preprocesamiento y tablas de confusión por dígito. Sirve para evaluar en una
+máquina Linux un cambio de umbrales antes de llevarlo a las PCs de línea.
+
+Imágenes:
+  - debug_cnt_*.png / debug_est_*.png   (fase2_ocr_cliente.exe --debug)
+  - zona_pass_*.png                     (fct_agent.py --debug → debug_zonas/)
+  - Muestras etiquetadas: etiquetas.csv en la carpeta, columnas
+    archivo,tipo,esperado   (tipo = contador | estacion | fct)
+    Sin etiqueta solo se reporta latencia y lectura.
+
+Uso:
+  python replay_ocr.py muestras/
+  python replay_ocr.py muestras/ --config config_ocr.json --tipo contador
+  python replay_ocr.py muestras/ --csv resultados.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+import cv2
+import pytesseract
+
+import fase2_ocr_cliente as cliente
+from ocr_digitos import ReconocedorDigitos
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "fct_agent"))
+import fct_agent  # noqa: E402
+
+# fct_agent fija la ruta de Windows; fuera de Windows usar el tesseract del PATH
+if not os.path.exists(pytesseract.pytesseract.tesseract_cmd):
+    pytesseract.pytesseract.tesseract_cmd = cliente._tess or "tesseract"
+
+TIPOS = ("contador", "estacion", "fct")
+
+
+# ─────────────────────────────────────────────────────────────────
+# VARIANTES
+# ─────────────────────────────────────────────────────────────────
+
+def _tesseract_digitos(img_gris, escala, blur):
+    """leer_contador con escala/blur alternativos (mismo whitelist y psm)."""
+    h, w = img_gris.shape
+    img = cv2.resize(img_gris, (w * escala, h * escala), interpolation=cv2.INTER_CUBIC)
+    if blur:
+        img = cv2.GaussianBlur(img, (3, 3), 0)
+    _, bin_ = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    bin_ = cv2.dilate(bin_, np.ones((2, 2), np.uint8), iterations=1)
+    texto = pytesseract.image_to_string(bin_, config="--psm 8 --oem 3 -c tessedit_char_whitelist=0123456789").strip()
+    return texto if texto.isdigit() else None
+
+
+def _plantilla(reconocedor, confianza_min):
+    def leer(img_gris):
+        texto, confianza = reconocedor.leer(img_gris)
+        return texto if texto and confianza >= confianza_min else None
+    return leer
+
+
+def variantes(tipo, cfg):
+    """{nombre: función(img) → lectura}. "actual" es lo que corre en producción."""
+    patron = cfg.get("patron", r"(\d{3})")
+    reconocedor = ReconocedorDigitos.desde_config(cfg)
+    confianza = cfg.get("confianza_plantillas", 0.8)
+
+    if tipo == "contador":
+        v = {
+            "actual":       cliente.leer_contador,
+            "x3":           lambda g: _tesseract_digitos(g, 3, True),
+            "x4_sin_blur":  lambda g: _tesseract_digitos(g, 4, False),
+        }
+        if reconocedor:
+            v["plantillas"] = _plantilla(reconocedor, confianza)
+            v["plantillas+tess"] = cliente.LectorDigitos(reconocedor, confianza).contador
+        return v
+
+    if tipo == "estacion":
+        v = {"actual": lambda g: cliente.leer_estacion(g, patron)}
+        if reconocedor:
+            leer = _plantilla(reconocedor, confianza)
+            lector = cliente.LectorDigitos(reconocedor, confianza)
+            v["plantillas"] = lambda g: next(iter(re.findall(patron, leer(g) or "")), None)
+            v["plantillas+tess"] = lambda g: lector.estacion(g, patron)
+        return v
+
+    v = {"actual": lambda bgr: fct_agent.limpiar_numero(fct_agent.ocr_numero(bgr))}
+    for nombre, metodo in fct_agent.METODOS_OCR:
+        v[nombre] = lambda bgr, m=(nombre, metodo): fct_agent.limpiar_numero(fct_agent.ocr_numero(bgr, metodos=[m]))
+    return v
+
+
+# ─────────────────────────────────────────────────────────────────
+# MUESTRAS
+# ─────────────────────────────────────────────────────────────────
+
+def tipo_por_nombre(archivo):
+    nombre = os.path.basename(archivo).lower()
+    if "cnt" in nombre or "contador" in nombre:
+        return "contador"
+    if "est" in nombre:
+        return "estacion"
+    if "pass" in nombre or nombre.startswith("fct"):
+        return "fct"
+    return None
+
+
+def cargar_muestras(carpeta):
+    """[(ruta, tipo, esperado|None)] de los PNG de la carpeta (recursivo)."""
+    etiquetas = {}
+    ruta_csv = os.path.join(carpeta, "etiquetas.csv")
+    if os.path.exists(ruta_csv):
+        with open(ruta_csv, encoding="utf-8") as f:
+            for fila in csv.DictReader(f):
+                etiquetas[os.path.normpath(fila["archivo"])] = (fila.get("tipo") or None, fila.get("esperado") or None)
+
+    muestras = []
+    for raiz, _, archivos in os.walk(carpeta):
+        for a in sorted(archivos):
+            if not a.lower().endswith(".png"):
+                continue
+            ruta = os.path.join(raiz, a)
+            rel = os.path.normpath(os.path.relpath(ruta, carpeta))
+            tipo, esperado = etiquetas.get(rel, (None, None))
+            tipo = tipo or tipo_por_nombre(a)
+            if tipo in TIPOS:
+                muestras.append((ruta, tipo, esperado))
+    return muestras
+
+
+def acierto(tipo, leido, esperado):
+    if leido is None:
+        return False
+    if tipo == "fct":
+        try:
+            return abs(float(leido) - float(esperado)) < 0.05
+        except ValueError:
+            return False
+    return str(leido) == esperado
+
+
+# ─────────────────────────────────────────────────────────────────
+# REPORTE
+# ─────────────────────────────────────────────────────────────────
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    return float(np.percentile(valores, p))
+
+
+def tabla_confusion(pares):
+    """Confusión por carácter (esperado × leído) para lecturas de igual
+    longitud; "∅" = sin lectura o longitud distinta."""
+    conteo = Counter()
+    for esperado, leido in pares:
+        leido = "" if leido is None else str(leido)
+        if len(leido) == len(esperado):
+            conteo.update(zip(esperado, leido))
+        else:
+            conteo.update((e, "∅") for e in esperado)
+    filas = sorted({e for e, _ in conteo})
+    cols = sorted({l for _, l in conteo} - {"∅"}) + ["∅"]
+    lineas = ["      " + " ".join(f"{c:>4}" for c in cols)]
+    for e in filas:
+        lineas.append(f"  {e:>3} " + " ".join(f"{conteo[(e, c)] or '.':>4}" for c in cols))
+    return "\n".join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay offline de OCR (contador / estación / FCT)")
+    parser.add_argument("carpeta", help="Carpeta con PNGs (y opcional etiquetas.csv)")
+    parser.add_argument("--config", default=None, help="config_ocr.json (patrón y plantillas de dígitos)")
+    parser.add_argument("--tipo", choices=TIPOS, default=None, help="Solo este tipo de ROI")
+    parser.add_argument("--variante", action="append", default=None, help="Solo estas variantes (repetible)")
+    parser.add_argument("--csv", default=None, help="Guardar resultado por imagen y variante")
+    args = parser.parse_args()
+
+    cfg = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            cfg = json.load(f)
+
+    muestras = [m for m in cargar_muestras(args.carpeta) if not args.tipo or m[1] == args.tipo]
+    if not muestras:
+        print(f"[ERROR] Sin PNGs reconocibles en {args.carpeta}")
+        sys.exit(1)
+
+    por_tipo = defaultdict(list)
+    for m in muestras:
+        por_tipo[m[1]].append(m)
+
+    filas_csv = []
+    print("=" * 72)
+    print(f"  REPLAY OCR — {len(muestras)} imágenes en {args.carpeta}")
+    print(f"  Tesseract: {pytesseract.pytesseract.tesseract_cmd}")
+    print("=" * 72)
+
+    for tipo, lista in por_tipo.items():
+        etiquetadas = sum(1 for m in lista if m[2] is not None)
+        print(f"\n── {tipo.upper()}: {len(lista)} imágenes ({etiquetadas} etiquetadas) " + "─" * 20)
+        print(f"  {'variante':18s} {'leídas':>8s} {'exactitud':>12s} {'p50 ms':>8s} {'p95 ms':>8s} {'max ms':>8s}")
+
+        confusiones = {}
+        for nombre, fn in variantes(tipo, cfg).items():
+            if args.variante and nombre not in args.variante:
+                continue
+            latencias, leidas, aciertos, pares = [], 0, 0, []
+            error = None
+            for ruta, _, esperado in lista:
+                img = cv2.imread(ruta, cv2.IMREAD_COLOR if tipo == "fct" else cv2.IMREAD_GRAYSCALE)
+                if img is None:
+                    continue
+                inicio = time.perf_counter()
+                try:
+                    leido = fn(img)
+                except pytesseract.TesseractNotFoundError:
+                    error = "Tesseract no instalado"
+                    break
+                ms = (time.perf_counter() - inicio) * 1000
+                latencias.append(ms)
+                leidas += leido is not None
+                if esperado is not None:
+                    ok = acierto(tipo, leido, esperado)
+                    aciertos += ok
+                    pares.append((esperado, leido))
+                filas_csv.append({
+                    "archivo": ruta, "tipo": tipo, "variante": nombre, "esperado": esperado,
+                    "leido": leido, "acierto": acierto(tipo, leido, esperado) if esperado is not None else "",
+                    "ms": round(ms, 3),
+                })
+            if error:
+                print(f"  {nombre:18s} {'— ' + error}")
+                continue
+            exactitud = f"{aciertos}/{len(pares)} {100 * aciertos / len(pares):3.0f}%" if pares else "-"
+            print(f"  {nombre:18s} {leidas:>8d} {exactitud:>12s} {percentil(latencias, 50):8.2f} "
+                  f"{percentil(latencias, 95):8.2f} {max(latencias, default=0):8.2f}")
+            if pares and aciertos < len(pares):
+                confusiones[nombre] = pares
+
+        for nombre, pares in confusiones.items():
+            if tipo == "fct":
+                errores = Counter((e, l) for e, l in pares if not acierto(tipo, l, e))
+                print(f"\n  Errores [{nombre}] (esperado → leído, veces):")
+                for (e, l), n in errores.most_common(10):
+                    print(f"    {e} → {l}  ×{n}")
+            else:
+                print(f"\n  Confusión por dígito [{nombre}] (filas = esperado, columnas = leído):")
+                print(tabla_confusion(pares))
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["archivo", "tipo", "variante", "esperado", "leido", "acierto", "ms"])
+            writer.writeheader()
+            writer.writerows(filas_csv)
+        print(f"\n  Resultado por imagen: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()